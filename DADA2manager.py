@@ -9,51 +9,118 @@ Christoph Schmid.
 import tkinter as tk
 import tkinter.filedialog as fd
 import tkinter.messagebox
+import tkinter.ttk as ttk
 from pubsub import pub
 import os
+import math
 from pathlib import Path
-from inspect import currentframe, getframeinfo
-from distutils.version import LooseVersion
+from functools import partial
 import subprocess as sp
-import csv
-import re
+import queue
+import threading
+import backends
+import environment
+import jobQueue
+import pipeline
+import trimming
+import validation
 
 
 
-class sample(object):
-    """This class is a data class to hold file references to
-    forward and reverse sequence FASTQ files"""
+def summaryText(outDir):
+    """Returns a short text summary of the results in an output directory"""
+    import results
+    try:
+        summary = results.projectResults(outDir).summary()
+    except (OSError, ValueError):
+        return ""
+    return "\n".join(str(key) + ": " + str(value) for key, value in summary.items())
 
-    def __init__(self, name, forward, reverse, currPath):
-        """Constructor for Sample Class"""
-        self.name = str(name)
-        currPath = os.path.normpath(currPath)
-        if (os.path.isfile(os.path.join(currPath, forward)) &
-                os.path.isfile(os.path.join(currPath, reverse))):
-            self.forwardPath = os.path.join(currPath, forward)
-            self.reversePath = os.path.join(currPath, reverse)
-        else:
-            raise FileNotFoundError
 
-    def __repr__(self):
-        return self.name
+class progressWindow(tk.Toplevel):
+
+    def __init__(self, title):
+        """Constructor Progress Frame"""
+        tk.Toplevel.__init__(self)
+
+        self.title(title)
+        self.protocol('WM_DELETE_WINDOW', self.iconify)
+        self.tracker = pipeline.progressTracker()
+        self.events = queue.Queue()
+
+        self.initUI()
+
+    def initUI(self):
+        self.Frame = tk.Frame(self)
+        self.Frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.stepLabel = tk.Label(self.Frame, text="Starting ...", font="Helvetica 12 bold")
+        self.progressBar = ttk.Progressbar(self.Frame, orient=tk.HORIZONTAL, length=400, mode='determinate',
+                                           maximum=1.0)
+        self.rateLabel = tk.Label(self.Frame, text="", font="Helvetica 10")
+        self.logLabel = tk.Label(self.Frame, text="", font="Helvetica 10", anchor=tk.W, width=60)
+
+        self.stepLabel.pack(fill=tk.X, pady=5)
+        self.progressBar.pack(fill=tk.X, pady=5)
+        self.rateLabel.pack(fill=tk.X, pady=5)
+        self.logLabel.pack(fill=tk.X, pady=5)
+
+    def showProgress(self, status):
+        self.stepLabel.configure(text="{}: {} ({} of {})".format(status['stage'], status['step'],
+                                                               status['i'], status['n']))
+        self.progressBar.configure(value=status['fraction'])
+        rate = "" if status['readsPerSec'] is None else "{:,.0f} reads/s   ".format(status['readsPerSec'])
+        eta = "" if status['eta'] is None else "remaining: {}".format(formatSeconds(status['eta']))
+        self.rateLabel.configure(text=rate + "elapsed: " + formatSeconds(status['elapsed']) + "   " + eta)
+
+    def poll(self, onSuccess, onError):
+        """Shows the events of the running stage, calls onSuccess or onError when it is done"""
+        while not self.events.empty():
+            event = self.events.get()
+            if event['event'] == 'progress':
+                self.showProgress(self.tracker.update(event))
+            elif event['event'] == 'log':
+                self.logLabel.configure(text=event['line'][-80:])
+            elif event['event'] == 'done':
+                self.destroy()
+                onSuccess()
+                return
+            elif event['event'] == 'error':
+                self.destroy()
+                if event.get('message'):
+                    tk.messagebox.showerror(title="Stage could not be run", message=event['message'])
+                onError()
+                return
+        self.after(200, self.poll, onSuccess, onError)
+
 
-    def __str__(self):
-        return self.name
+def formatSeconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "{:d}:{:02d}:{:02d}".format(hours, minutes, seconds)
 
-    def __eq__(self, other):
-        """Override the default Equals behavior"""
-        if (isinstance(other, self.__class__)):
-            return self.name == other.name
-        elif (isinstance(other, str)):
-            return self.name == other
-        return NotImplemented
 
-    def __ne__(self, other):
-        """Define a non-equality test"""
-        if isinstance(other, self.__class__):
-            return not self.__eq__(other)
-        return NotImplemented
+def runStage(buildCommand, outDir, onSuccess, onError, requested=0):
+    """Runs a stage in a background thread and shows its progress. The command line
+    buildCommand(threads) is built once the stage got its cores from the shared budget
+    (or its batch backend, see backends.py), the stage is recorded in the run ledger
+    of the output directory"""
+    window = progressWindow("Running " + pipeline.stageName(buildCommand(threads=0)))
+
+    def worker():
+        try:
+            backends.dispatch(buildCommand, pipeline.ledgerPath(outDir), onEvent=window.events.put,
+                              requested=requested)
+        except (sp.CalledProcessError, OSError):
+            window.events.put({'event': 'error'})
+        except Exception as e:
+            # e.g. an invalid backends.json, the window must not wait for the stage forever
+            window.events.put({'event': 'error', 'message': '{}: {}'.format(type(e).__name__, e)})
+        else:
+            window.events.put({'event': 'done'})
+
+    threading.Thread(target=worker, daemon=True).start()
+    window.poll(onSuccess, onError)
 
 
 class selectFile(tk.Toplevel):
@@ -87,6 +154,16 @@ class selectFile(tk.Toplevel):
         self.plotEntry = tk.Entry(self.headFrame, textvariable=self.entryVal, validate="key",
                                   validatecommand=(self.register(self.onValidate), '%d', '%S'))
         self.plotEntry.pack(side=tk.LEFT, padx=10, pady=5, fill=tk.BOTH, expand=False)
+        # check button for plotting random subsets of the reads
+        self.subsetVar = tk.IntVar()
+        self.subsetVar.set(0)
+        self.subsetCB = tk.Checkbutton(self.headFrame, text="plot random reads (indexed)", var=self.subsetVar)
+        self.subsetCB.pack(side=tk.LEFT, padx=10, pady=5)
+        # check button for checking the FASTQ pairs before anything is run
+        self.validateVar = tk.IntVar()
+        self.validateVar.set(1)
+        self.validateCB = tk.Checkbutton(self.headFrame, text="check FASTQ pairs first", var=self.validateVar)
+        self.validateCB.pack(side=tk.LEFT, padx=10, pady=5)
 
         # BOTTOM FRAME with list boxes
         self.bottomFrame = tk.Frame(self)
@@ -133,19 +210,8 @@ class selectFile(tk.Toplevel):
         self.selDir = fd.askdirectory(mustexist=True)
 
         # list files in selected directories
-        files = []
-        for dirpath, dirnames, filenames in os.walk(self.selDir):
-            files.extend(filenames)
-            break
-        samplesF = sorted(list(filter(lambda x: 'pair1' in x, files)))
-        samplesR = sorted(list(filter(lambda x: 'pair2' in x, files)))
-        sampleNames = [i.split('_')[0] for i in samplesF]
-        sampleNames = sorted(list(set(sampleNames)))
-
         self.boxAll.delete(0, tk.END)
-
-        for name, fw, rv in zip(sampleNames, samplesF, samplesR):
-            self.sampleList.append(sample(name, fw, rv, self.selDir))
+        self.sampleList = pipeline.discoverSamples(self.selDir)
 
         for i in self.sampleList:
             self.boxAll.insert(tk.END, i)
@@ -226,45 +292,254 @@ class selectFile(tk.Toplevel):
             return
 
         # write input file for R script 'input.R'
-        if not os.path.isdir(self.outDir):
-            os.mkdir(self.outDir)
-        inputFilePath = os.path.join(self.outDir, "inputPaths.txt")
-        inputFile = open(inputFilePath, 'w')
-
-        for i in selected:
-            for j in self.sampleList:
-                if j == i:
-                    print(j.forwardPath, file=inputFile)
-                    print(j.reversePath, file=inputFile)
-                    break
+        samples = [j for j in self.sampleList if j.name in selected]
+        inputFilePath = pipeline.writeInputFile(samples, self.outDir)
+
+        # all pairs are streamed and checked first if requested, damaged samples stop the run
+        for idx in range(self.boxSel.size()):
+            self.boxSel.itemconfig(idx, fg="black")
+        if self.validateVar.get() == 1:
+            if os.path.isfile(os.path.join(self.outDir, validation.REPORT_NAME)):
+                os.remove(os.path.join(self.outDir, validation.REPORT_NAME))
+            runStage(partial(pipeline.validateCommand, self.scriptPath, inputFilePath, self.outDir), self.outDir,
+                     onSuccess=lambda: self.runPlots(samples, inputFilePath),
+                     onError=self.showValidation)
+        else:
+            self.runPlots(samples, inputFilePath)
 
-        inputFile.close()
+    def showValidation(self):
+        """Marks the samples which failed the check in red and lists their problems"""
+        try:
+            report = validation.readReport(self.outDir)
+        except (OSError, ValueError):
+            report = {}
+        failed = {name: problems for name, (reads, problems) in report.items() if problems}
+        if not failed:
+            tk.messagebox.showerror(title="Error in calling script",
+                                    message="Execution of script validation.py failed")
+            return
+        for idx, name in enumerate(self.boxSel.get(0, tk.END)):
+            if name in failed:
+                self.boxSel.itemconfig(idx, fg="red")
+        tk.messagebox.showerror(title="FASTQ check failed",
+                                message="Please fix or deselect these samples:\n\n" +
+                                        "\n".join(name + ": " + "; ".join(problems)
+                                                   for name, problems in sorted(failed.items())))
+
+    def runPlots(self, samples, inputFilePath):
+        # random reads of the plotted samples are drawn through their FASTQ index first if requested
+        if self.subsetVar.get() == 1:
+            subsets = os.path.join(self.outDir, "qualitySubsets")
+            files = [f for j in pipeline.plottedSamples(samples, self.plotEntry.get())
+                     for f in (j.forwardPath, j.reversePath)]
+            runStage(partial(pipeline.subsampleCommand, self.scriptPath, files, subsets, reads=pipeline.PROFILE_READS),
+                     self.outDir,
+                     onSuccess=lambda: self.runInput(inputFilePath, subsets),
+                     onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                             message="Execution of script fastqIndex.py failed"))
+        else:
+            self.runInput(inputFilePath, "")
 
+    def runInput(self, inputFilePath, subsets):
         # producing command line to run R Script
+        commandLine = pipeline.inputCommand(self.scriptPath, self.version[0], inputFilePath,
+                                            self.outDir, self.plotEntry.get(), subsets=subsets)
+
+        # run the R script in the background and show its progress
+        runStage(lambda threads: commandLine, self.outDir,
+                 onSuccess=lambda: tk.messagebox.showinfo(title="input.R",
+                                                          message="Execution of input.R finished"),
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling R Script",
+                                                         message="Execution of R Script input.R failed"),
+                 requested=1)
+
+
+class trimReads(tk.Toplevel):
+
+    def __init__(self, version, scriptPath):
+        """Constructor Primer Trimming Frame"""
+        tk.Toplevel.__init__(self)
+
+        self.version = version
+        self.scriptPath = scriptPath
+        self.title('Primer trimming of sequence reads (V. ' + self.version[0] + ')')
+        self.protocol('WM_DELETE_WINDOW', self.onClose)
+        self.forwardReadsPaths = ""
+        self.reverseReadsPaths = ""
+        self.outDir = ""
+
+        self.initUI()
+
+    def initUI(self):
+        # HEAD FRAME with path files and primers
+        self.Frame = tk.Frame(self)
+        self.Frame.grid()
+
+        self.primerLabel = tk.Label(self.Frame, text="primer (5'-3'):", font="Helvetica 12 bold")
+        self.pathLabel = tk.Label(self.Frame, text="Path files in:", font="Helvetica 12 bold")
+        self.labelFBtn = tk.Label(self.Frame, text="Forward reads: ", font="Helvetica 12 bold")
+        self.labelRBtn = tk.Label(self.Frame, text="Reverse reads: ", font="Helvetica 12 bold")
+        self.fileBtnF = tk.Button(self.Frame, text='Select file ...', command=self.chooseForward)
+        self.fileBtnR = tk.Button(self.Frame, text='Select file ...', command=self.chooseReverse)
+        self.labelFpath = tk.Label(self.Frame, text="Select foward path!")
+        self.labelRpath = tk.Label(self.Frame, text="Select reverse path!")
+
+        self.primerFVar = tk.StringVar()
+        self.primerFVar.set("")
+        self.primerRVar = tk.StringVar()
+        self.primerRVar.set("")
+        self.primerFEntry = tk.Entry(self.Frame, textvariable=self.primerFVar, width=30, validate="key",
+                                     validatecommand=(self.register(self.onValidatePrimer), '%d', '%S'))
+        self.primerREntry = tk.Entry(self.Frame, textvariable=self.primerRVar, width=30, validate="key",
+                                     validatecommand=(self.register(self.onValidatePrimer), '%d', '%S'),
+                                     state=tk.DISABLED)
+
+        self.primerLabel.grid(row=0, column=2)
+        self.pathLabel.grid(row=0, column=3, columnspan=5)
+        self.labelFBtn.grid(row=1, column=0, padx=10, pady=5, sticky=tk.E)
+        self.labelRBtn.grid(row=2, column=0, padx=10, pady=5, sticky=tk.E)
+        self.fileBtnF.grid(row=1, column=1, padx=10, pady=5)
+        self.fileBtnR.grid(row=2, column=1, padx=10, pady=5)
+        self.primerFEntry.grid(row=1, column=2, padx=5)
+        self.primerREntry.grid(row=2, column=2, padx=5)
+        self.labelFpath.grid(row=1, column=3, columnspan=5, padx=10)
+        self.labelRpath.grid(row=2, column=3, columnspan=5, padx=10)
+
+        # -----------------
+        # separating line 1
+        self.line1 = tk.Canvas(self.Frame, width=800, height=10)
+        self.line1.grid(row=3, columnspan=8, sticky=tk.W + tk.E)
+
+        self.line1.create_line(0, 5, 2000, 5, fill="black", width=2)
 
-        process = "Rscript"
-        pathToScript = self.scriptPath + "/input.R"
-        inputArg = inputFilePath
-        outputArg = self.outDir
-        plotArg = self.plotEntry.get()
-
-        commandLine = [process, pathToScript,
-                       "-i", inputArg,
-                       "-o", outputArg,
-                       "-p", plotArg,
-                       "-V", self.version[0],
-                       "--path", self.scriptPath
-                       ]
-
-        # run the R script
+        # mismatch setting and check buttons
+        self.mismatchLabel = tk.Label(self.Frame, text="mismatches (% of primer length):", font="Helvetica 12")
+        self.mismatchVar = tk.StringVar()
+        self.mismatchVar.set("10")
+        self.mismatchEntry = tk.Entry(self.Frame, textvariable=self.mismatchVar, width=8, validate="key",
+                                      validatecommand=(self.register(self.onValidate), '%d', '%S'))
+        self.discardVar = tk.IntVar()
+        self.discardVar.set(1)
+        self.readThroughVar = tk.IntVar()
+        self.readThroughVar.set(0)
+        self.discardCB = tk.Checkbutton(self.Frame, text="discard reads without primer", var=self.discardVar)
+        self.readThroughCB = tk.Checkbutton(self.Frame, text="cut read-through into opposite primer",
+                                            var=self.readThroughVar, state=tk.DISABLED)
+
+        self.mismatchLabel.grid(row=4, column=1, padx=5, pady=10)
+        self.mismatchEntry.grid(row=4, column=2, padx=5, pady=10, sticky=tk.W)
+        self.discardCB.grid(row=5, column=1)
+        self.readThroughCB.grid(row=5, column=2)
+
+        # -----------------
+        # separating line 2
+        self.line2 = tk.Canvas(self.Frame, width=800, height=10)
+        self.line2.grid(row=6, columnspan=8, sticky=tk.E + tk.W)
+
+        self.line2.create_line(0, 5, 2000, 5, fill="black", width=2)
+
+        # output directory and run button
+        self.btnOutDir = tk.Button(self.Frame, text="Select output folder ...",
+                                   command=self.chooseOutDir)
+        self.outDirLabel = tk.Label(self.Frame, text=self.outDir)
+        self.btnRun = tk.Button(self.Frame, text="RUN", command=self.runTrimScript)
+
+        self.btnOutDir.grid(row=7, column=0, padx=10, pady=10)
+        self.outDirLabel.grid(row=7, column=1, columnspan=5)
+        self.btnRun.grid(row=7, column=6, padx=10, pady=10, columnspan=2, sticky=tk.E + tk.W)
+
+        # info about the inputs
+        self.infoLabel = tk.Label(self.Frame, text="INFO: path files are written by the file selection, "
+                                                   "trimmed reads are listed in trimmedFilesF/R.txt for filtering",
+                                  font="Helvetica 10", fg="red", relief=tk.GROOVE)
+        self.infoLabel.grid(row=8, column=0, columnspan=8)
+
+    def chooseOutDir(self):
+        self.outDir = fd.askdirectory()
+        self.outDirLabel.configure(text=self.outDir)
+
+    def chooseForward(self):
+        self.forwardReadsPaths = fd.askopenfilename()
+        fwdPath = ".../" + "/".join(Path(self.forwardReadsPaths).parts[-3:-1])
+        self.labelFpath.configure(text=fwdPath)
+
+    def chooseReverse(self):
+        self.reverseReadsPaths = fd.askopenfilename()
+        revPath = ".../" + "/".join(Path(self.reverseReadsPaths).parts[-3:-1])
+        self.primerREntry.configure(state=tk.NORMAL)
+        self.readThroughCB.configure(state=tk.NORMAL)
+        self.labelRpath.configure(text=revPath)
+
+    def onValidate(self, d, S):
+        if int(d) != 1: return True
         try:
-            sp.check_call(commandLine, )
-        except sp.CalledProcessError:
-            tk.messagebox.showerror(title="Error in calling R Script",
-                                    message="Execution of R Script input.R failed")
+            int(S)
+        except ValueError:
+            self.bell()
+            return False
         else:
-            tk.messagebox.showinfo(title="input.R",
-                                   message="Execution of input.R finished")
+            return True
+
+    def onValidatePrimer(self, d, S):
+        if int(d) != 1: return True
+        if all(x in "ACGTURYSWKMBDHVN" for x in S.upper()):
+            return True
+        self.bell()
+        return False
+
+    def runTrimScript(self):
+        # check if all necessary inputs were made
+        if self.forwardReadsPaths == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Forward read path file missing!")
+            return
+
+        if self.primerFEntry.get() == "" or (self.reverseReadsPaths != "" and self.primerREntry.get() == ""):
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Primer sequences incomplete!")
+            return
+
+        if self.outDir == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Output directory missing!")
+            return
+
+        if self.mismatchEntry.get() == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Setting for primer mismatches missing!")
+            return
+
+        # producing command line to run the script
+        buildCommand = partial(pipeline.trimCommand, self.scriptPath,
+                               forward=self.forwardReadsPaths,
+                               reverse=self.reverseReadsPaths,
+                               outDir=self.outDir,
+                               primerF=self.primerFEntry.get().upper(),
+                               primerR=self.primerREntry.get().upper(),
+                               errorRate=int(self.mismatchEntry.get()) / 100,
+                               discardUntrimmed=self.discardVar.get() == 1,
+                               readThrough=self.readThroughVar.get() == 1 and self.reverseReadsPaths != "")
+
+        # run the script in the background and show its progress
+        runStage(buildCommand, self.outDir,
+                 onSuccess=lambda: tk.messagebox.showinfo(title="trimming.py",
+                                                          message="Primer trimming finished.\n\n" +
+                                                                  self.summary()),
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                         message="Execution of script trimming.py failed"))
+
+    def summary(self):
+        """Read counts of the trim summary as text"""
+        try:
+            totals = trimming.readSummary(self.outDir)
+        except (OSError, ValueError):
+            return ""
+        return "\n".join(str(key) + ": " + str(value) for key, value in totals.items())
+
+    def onClose(self):
+        """destructor"""
+        pub.sendMessage('subWindowClosed')
+        self.destroy()
 
 
 class filterReads(tk.Toplevel):
@@ -392,11 +667,19 @@ class filterReads(tk.Toplevel):
         self.compressVar.set(1)
         self.verboseVar = tk.IntVar()
         self.verboseVar.set(1)
+        self.derepVar = tk.IntVar()
+        self.derepVar.set(0)
+        self.keepFilteredVar = tk.IntVar()
+        self.keepFilteredVar.set(0)
         self.compressCB = tk.Checkbutton(self.Frame, text="compress filtered FASTQs", var=self.compressVar)
         self.verboseCB = tk.Checkbutton(self.Frame, text="verbose output", var=self.verboseVar)
+        self.derepCB = tk.Checkbutton(self.Frame, text="dereplicate after filtering", var=self.derepVar)
+        self.keepFilteredCB = tk.Checkbutton(self.Frame, text="keep filtered FASTQs", var=self.keepFilteredVar)
 
         self.compressCB.grid(row=6, column=2)
         self.verboseCB.grid(row=6, column=3)
+        self.derepCB.grid(row=6, column=4)
+        self.keepFilteredCB.grid(row=6, column=5)
 
         # -----------------
         # separating line 2
@@ -476,52 +759,31 @@ class filterReads(tk.Toplevel):
             return
 
         # producing command line to run R Script
-
-        process = "Rscript"
-        pathToScript = self.scriptPath + "/filtering.R"
-        fArg = self.forwardReadsPaths
-        rArg = self.reverseReadsPaths
-        truncLfwdArg = self.truncEntryLfwd.get()
-        truncLrevArg = self.truncEntryLrev.get()
-        xArg = self.truncEntryRfwd.get()
-        yArg = self.truncEntryRrev.get()
-        oArg = self.outDir
-        minFArg = self.minLenFEntry.get()
-        minRArg = self.minLenREntry.get()
-        maxFArg = self.maxLenFEntry.get()
-        maxRArg = self.maxLenREntry.get()
-        eArg = self.maxErrorEntry.get()
-        qArg = self.minQualEntry.get()
-
-        commandLine = [process, pathToScript,
-                       "-f", fArg,
-                       "--truncLfwd", truncLfwdArg,
-                       "--truncLrev", truncLrevArg,
-                       "-x", xArg,
-                       "-y", yArg,
-                       "-o", oArg,
-                       "-q", qArg,
-                       "-V", self.version[0],
-                       "--path", self.scriptPath]
-
-        if not rArg == "": commandLine.append('-r'), commandLine.append(rArg)
-        if not eArg == "": commandLine.append("-e"), commandLine.append(eArg)
-        if not minFArg == "": commandLine.append("--minLenF"), commandLine.append(minFArg)
-        if not minRArg == "": commandLine.append("--minLenR"), commandLine.append(minRArg)
-        if not maxFArg == "": commandLine.append("--maxLenF"), commandLine.append(maxFArg)
-        if not maxRArg == "": commandLine.append("--maxLenR"), commandLine.append(maxRArg)
-        if not self.compressVar.get() == 1: commandLine.append("-c")
-        if not self.verboseVar.get() == 1: commandLine.append("-v")
-
-        # run the R script
-        try:
-            sp.check_call(commandLine)
-        except sp.CalledProcessError:
-            tk.messagebox.showerror(title="Error in calling R Script",
-                                    message="Execution of R Script filtering.R failed")
-        else:
-            tk.messagebox.showinfo(title="filtering.R",
-                                   message="Execution of filtering.R finished")
+        buildCommand = partial(pipeline.filterCommand, self.scriptPath, self.version[0],
+                               forward=self.forwardReadsPaths,
+                               reverse=self.reverseReadsPaths,
+                               outDir=self.outDir,
+                               truncLfwd=self.truncEntryLfwd.get(),
+                               truncLrev=self.truncEntryLrev.get(),
+                               truncRfwd=self.truncEntryRfwd.get(),
+                               truncRrev=self.truncEntryRrev.get(),
+                               minLenF=self.minLenFEntry.get(),
+                               minLenR=self.minLenREntry.get(),
+                               maxLenF=self.maxLenFEntry.get(),
+                               maxLenR=self.maxLenREntry.get(),
+                               maxError=self.maxErrorEntry.get(),
+                               quality=self.minQualEntry.get(),
+                               compress=self.compressVar.get() == 1,
+                               verbose=self.verboseVar.get() == 1,
+                               derep=self.derepVar.get() == 1,
+                               keepFiltered=self.keepFilteredVar.get() == 1)
+
+        # run the R script in the background and show its progress
+        runStage(buildCommand, self.outDir,
+                 onSuccess=lambda: tk.messagebox.showinfo(title="filtering.R",
+                                                          message="Execution of filtering.R finished"),
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling R Script",
+                                                         message="Execution of R Script filtering.R failed"))
 
     def onClose(self):
         """destructor"""
@@ -555,7 +817,8 @@ class denoiseReads(tk.Toplevel):
                                      command=self.selFiltered, font="Helvetica 12")
         self.outpathBtn = tk.Button(self.Frame, text="Select output folder ...",
                                     command=self.selOutDir, font="Helvetica 12")
-        self.labelFiltPath = tk.Label(self.Frame, text="Select directory of filtered fastqs", font="Helvetica 10")
+        self.labelFiltPath = tk.Label(self.Frame, text="Select directory of filtered fastqs or dereplicated samples",
+                                      font="Helvetica 10")
         self.labelOutpath = tk.Label(self.Frame, text="Select output directory", font="Helvetica 10")
 
         # label for plot number entry
@@ -574,7 +837,7 @@ class denoiseReads(tk.Toplevel):
         # entry for number of produced plots
         self.poolEntry = tk.Entry(self.Frame, textvariable=self.poolingVar, validate="key",
                                   validatecommand=(self.register(self.onValidate), '%d', '%S'),
-                                  state=tk.DISABLED if LooseVersion(self.version[0]) < LooseVersion("1.8.0") else tk.NORMAL)
+                                  state=tk.DISABLED if environment.versionKey(self.version[0]) < (1, 8, 0) else tk.NORMAL)
 
         # Check buttons for binary options
 
@@ -590,6 +853,18 @@ class denoiseReads(tk.Toplevel):
         self.chimeraVar.set(0)
         self.chimeraCB = tk.Checkbutton(self.Frame, text="override chimera removal", var=self.chimeraVar,
                                         font="Helvetica 10")
+        self.sparseVar = tk.IntVar()
+        self.sparseVar.set(0)
+        self.sparseCB = tk.Checkbutton(self.Frame, text="sparse sequence table", var=self.sparseVar,
+                                       font="Helvetica 10")
+        self.derepVar = tk.IntVar()
+        self.derepVar.set(0)
+        self.derepCB = tk.Checkbutton(self.Frame, text="dereplicate in parallel first", var=self.derepVar,
+                                      font="Helvetica 10")
+        self.errorSubsetVar = tk.IntVar()
+        self.errorSubsetVar.set(0)
+        self.errorSubsetCB = tk.Checkbutton(self.Frame, text="learn errors from random reads", var=self.errorSubsetVar,
+                                            font="Helvetica 10")
 
         # run button
         self.runBtn = tk.Button(self.Frame, text="RUN", command=self.runDenoiseScript, font="Helvetica 12")
@@ -613,9 +888,12 @@ class denoiseReads(tk.Toplevel):
         self.concatCB.grid(row=5, column=1, pady=10, padx=5)
         self.seqtabCB.grid(row=5, column=2, pady=10, padx=5)
         self.chimeraCB.grid(row=5, column=3, pady=10, padx=5)
+        self.sparseCB.grid(row=6, column=1, pady=10, padx=5)
+        self.derepCB.grid(row=6, column=2, pady=10, padx=5)
+        self.errorSubsetCB.grid(row=6, column=3, pady=10, padx=5)
 
         # run button
-        self.runBtn.grid(row=6, column=3, pady=10, padx=5)
+        self.runBtn.grid(row=7, column=3, pady=10, padx=5)
 
     def selFiltered(self):
         self.filtered = fd.askdirectory()
@@ -642,36 +920,52 @@ class denoiseReads(tk.Toplevel):
                                    message="Number of error plots missing!")
             return
 
-        # producing command line to run R Script
-
-        process = "Rscript"
-        pathToScript = self.scriptPath + "/inference.R"
-        fArg = self.filtered
-        oArg = self.outDir
-        pArg = self.plotVar.get()
-
-        commandLine = [process, pathToScript,
-                       "-f", fArg,
-                       "-p", pArg,
-                       "-o", oArg,
-                       "-V", self.version[0],
-                       "--pool", self.poolingVar.get(),
-                       "--path", self.scriptPath
-                       ]
-
-        if self.seqtabVar.get() == 1: commandLine.append("--seqtab")
-        if self.chimeraVar.get() == 1: commandLine.append("--chimera")
-        if self.concatVar.get() == 1: commandLine.append("--concat")
-
-        # run the R script
-        try:
-            sp.check_call(commandLine)
-        except sp.CalledProcessError:
-            tk.messagebox.showerror(title="Error in calling script",
-                                    message="Execution of script inference.R failed")
+        # filtered FASTQs are dereplicated by derep.py before denoising if requested
+        derep = self.filtered if pipeline.isDerepFolder(self.filtered) else ""
+        if derep == "" and self.derepVar.get() == 1:
+            runStage(partial(pipeline.derepCommand, self.scriptPath, self.filtered, self.outDir), self.outDir,
+                     onSuccess=lambda: self.runErrorSubsets(os.path.join(self.outDir, "derep")),
+                     onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                             message="Execution of script derep.py failed"))
         else:
-            tk.messagebox.showinfo(title="inference.R",
-                                   message="Denoising of sequence reads successful.")
+            self.runErrorSubsets(derep)
+
+    def runErrorSubsets(self, derep):
+        # random reads of all filtered FASTQs are drawn through their index to learn the errors from if requested
+        files = pipeline.fastqFiles(self.filtered)
+        if self.errorSubsetVar.get() != 1 or not files:
+            self.runInference(derep, "")
+            return
+
+        subsets = os.path.join(self.outDir, "errorSubsets")
+        forward = sum('_F_' in os.path.basename(x) for x in files)
+        runStage(partial(pipeline.subsampleCommand, self.scriptPath, files, subsets,
+                         bases=math.ceil(pipeline.ERROR_BASES / max(1, forward))), self.outDir,
+                 onSuccess=lambda: self.runInference(derep, subsets),
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                         message="Execution of script fastqIndex.py failed"))
+
+    def runInference(self, derep, errorSubsets):
+        # producing command line to run R Script
+        buildCommand = partial(pipeline.denoiseCommand, self.scriptPath, self.version[0],
+                               filtered=self.filtered,
+                               derep=derep,
+                               errorSubsets=errorSubsets,
+                               outDir=self.outDir,
+                               plots=self.plotVar.get(),
+                               pool=self.poolingVar.get(),
+                               seqtab=self.seqtabVar.get() == 1,
+                               chimera=self.chimeraVar.get() == 1,
+                               concat=self.concatVar.get() == 1,
+                               sparse=self.sparseVar.get() == 1)
+
+        # run the R script in the background and show its progress
+        runStage(buildCommand, self.outDir,
+                 onSuccess=lambda: tk.messagebox.showinfo(title="inference.R",
+                                                          message="Denoising of sequence reads successful.\n\n" +
+                                                                  summaryText(self.outDir)),
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                         message="Execution of script inference.R failed"))
 
     def onValidate(self, d, S):
         if int(d) != 1: return True
@@ -689,120 +983,73 @@ class denoiseReads(tk.Toplevel):
         self.destroy()
 
 
-class taxonomyReads(tk.Toplevel):
+class chimeraReads(tk.Toplevel):
 
     def __init__(self, version, scriptPath):
-        """Constructor Select Files Frame"""
+        """Constructor Chimera Removal Frame"""
         tk.Toplevel.__init__(self)
 
         self.version = version
         self.scriptPath = scriptPath
-
-        # set default values for supported databases
-        self.silva = False
-        self.rdp = False
-        self.gg = False
-        self.unite = False
-        # check installation folder for databases
-        self.checkDatabases()
-
-        self.DATABASES_implemented = [
-            ("SILVA", "silva", self.silva),
-            ("RDP", "rdp", self.rdp),
-            ("Green Genes", "gg", self.gg),
-            ("UNITE (ITS)", "unite", self.unite)
-        ]
-
-        self.title('Taxonomic assignments (V. ' + self.version[0] + ')')
+        self.title('Removal of chimeric sequences (V. ' + self.version[0] + ')')
         self.protocol('WM_DELETE_WINDOW', self.onClose)
         self.input = ""
         self.outDir = ""
 
         self.initUI()
 
-        # if no installations were found: close window with error message
-        if not any([self.silva, self.rdp, self.gg, self.unite]):
-            tk.messagebox.showerror(title="No databases installed",
-                                    message="No databases were found.\n" +
-                                            "Check the documentation for how " +
-                                            "to install databases.")
-            self.onClose()
-
     def initUI(self):
-        # HEAD FRAME with button and plot entry
+        # Frame with file selection and chimera settings
         self.Frame = tk.Frame(self)
         self.Frame.grid()
 
         # file selection buttons
-        self.inputBtn = tk.Button(self.Frame, text="Select input file ...",
+        self.inputBtn = tk.Button(self.Frame, text="Select raw sequence table ...",
                                   command=self.selInput, font="Helvetica 12")
         self.outpathBtn = tk.Button(self.Frame, text="Select output folder ...",
                                     command=self.selOutDir, font="Helvetica 12")
-        self.labelInput = tk.Label(self.Frame, text="Select input file before continuing", font="Helvetica 10")
-        self.labelOutpath = tk.Label(self.Frame, text="Select output directory before continuing", font="Helvetica 10")
-
-        # data base selection
-        self.labelDB = tk.Label(self.Frame, text="Database to use:", font="Helvetica 12 underline")
-
-        DATABASES_used = []
-        for (text, db, installed) in self.DATABASES_implemented:
-            if installed:
-                DATABASES_used.append((text, db))
-
-        self.dbVar = tk.StringVar()
-        self.dbVar.set("silva")
-
-        for idx, (text, db) in enumerate(DATABASES_used):
-            rb = tk.Radiobutton(self.Frame, text=text, variable=self.dbVar,
-                                value=db, indicatoron=1)
-            rb.grid(row=idx + 4, column=1, pady=10, padx=5, sticky=tk.W + tk.E)
-
-        # Check buttons for binary options
-        self.psVar = tk.IntVar()
-        self.psVar.set(1)
-        self.psCB = tk.Checkbutton(self.Frame, text="save data as phyloseq", var=self.psVar,
-                                   font="Helvetica 10")
+        self.labelInput = tk.Label(self.Frame, text="Select seqTabRaw.RData before continuing", font="Helvetica 10")
+        self.labelOutpath = tk.Label(self.Frame, text="Select output directory before continuing",
+                                     font="Helvetica 10")
+
+        # settings for chimera detection
+        self.threadsVar = tk.StringVar()
+        self.threadsVar.set("0")
+        self.threadsLabel = tk.Label(self.Frame, text="Samples checked in parallel: (0 = all cores)",
+                                     font="Helvetica 12")
+        self.threadsEntry = tk.Entry(self.Frame, textvariable=self.threadsVar, validate="key",
+                                     validatecommand=(self.register(self.onValidate), '%d', '%S'))
+        self.fractionVar = tk.StringVar()
+        self.fractionVar.set("0.9")
+        self.fractionLabel = tk.Label(self.Frame, text="Minimum fraction of samples flagged:", font="Helvetica 12")
+        self.fractionEntry = tk.Entry(self.Frame, textvariable=self.fractionVar)
+        self.foldVar = tk.StringVar()
+        self.foldVar.set("1.5")
+        self.foldLabel = tk.Label(self.Frame, text="Minimum fold abundance of parents:", font="Helvetica 12")
+        self.foldEntry = tk.Entry(self.Frame, textvariable=self.foldVar)
+
+        self.restartVar = tk.IntVar()
+        self.restartVar.set(0)
+        self.restartCB = tk.Checkbutton(self.Frame, text="discard results of interrupted runs",
+                                        var=self.restartVar, font="Helvetica 10")
 
         # run button
-        self.runBtn = tk.Button(self.Frame, text="RUN", command=self.runTaxonomyScript, font="Helvetica 12")
+        self.runBtn = tk.Button(self.Frame, text="RUN", command=self.runChimeraScript, font="Helvetica 12")
 
         # place elements on Frame
-        # buttons
         self.inputBtn.grid(row=1, column=1, pady=10, padx=5)
         self.outpathBtn.grid(row=2, column=1, pady=10, padx=5)
         self.labelInput.grid(row=1, column=2, padx=5)
         self.labelOutpath.grid(row=2, column=2, padx=5)
-
-        # database label
-        self.labelDB.grid(row=3, column=1, pady=10, padx=5)
-
-        # checkbuttons
-        self.psCB.grid(row=5, column=2, pady=10, padx=5)
-
-        # run button
+        self.threadsLabel.grid(row=3, column=1, pady=10, padx=5)
+        self.threadsEntry.grid(row=3, column=2, pady=10, padx=5)
+        self.fractionLabel.grid(row=4, column=1, pady=10, padx=5)
+        self.fractionEntry.grid(row=4, column=2, pady=10, padx=5)
+        self.foldLabel.grid(row=5, column=1, pady=10, padx=5)
+        self.foldEntry.grid(row=5, column=2, pady=10, padx=5)
+        self.restartCB.grid(row=6, column=1, pady=10, padx=5)
         self.runBtn.grid(row=7, column=2, pady=10, padx=5)
 
-    def checkDatabases(self):
-        """Checks if database folders exist and if they contain ANY files"""
-
-        genus = "train_set"
-        species = "species"
-        unite = "general_release"
-
-        self.silva = os.path.exists(self.scriptPath + '/taxonomy/silva') and any(
-            [genus in file for file in os.listdir(self.scriptPath + '/taxonomy/silva')]) and any(
-            [species in file for file in os.listdir(self.scriptPath + '/taxonomy/silva')])
-
-        self.rdp = os.path.exists(self.scriptPath + '/taxonomy/rdp') and any(
-            [genus in file for file in os.listdir(self.scriptPath + '/taxonomy/rdp')]) and any(
-            [species in file for file in os.listdir(self.scriptPath + '/taxonomy/rdp')])
-
-        self.gg = os.path.exists(self.scriptPath + '/taxonomy/gg') and any(
-            [genus in file for file in os.listdir(self.scriptPath + '/taxonomy/gg')])
-
-        self.unite = os.path.exists(self.scriptPath + '/taxonomy/unite') and any(
-            [unite in file for file in os.listdir(self.scriptPath + '/taxonomy/unite')])
-
     def selInput(self):
         self.input = fd.askopenfilename()
         self.labelInput.configure(text=self.input)
@@ -811,11 +1058,11 @@ class taxonomyReads(tk.Toplevel):
         self.outDir = fd.askdirectory()
         self.labelOutpath.configure(text=self.outDir)
 
-    def runTaxonomyScript(self):
+    def runChimeraScript(self):
         # check if all necessary inputs were made
         if self.input == "":
             tk.messagebox.showinfo(title="Data missing",
-                                   message="Input file missing!")
+                                   message="Raw sequence table missing!")
             return
 
         if self.outDir == "":
@@ -823,33 +1070,40 @@ class taxonomyReads(tk.Toplevel):
                                    message="Output directory missing!")
             return
 
-        # producing command line to run R Script
-
-        process = "Rscript"
-        pathToScript = self.scriptPath + "/taxonomy.R"
-        iArg = self.input
-        oArg = self.outDir
-        dArg = self.dbVar.get()
-
-        commandLine = [process, pathToScript,
-                       "-i", iArg,
-                       "-o", oArg,
-                       "-d", dArg,
-                       "-V", self.version[0],
-                       "--path", self.scriptPath
-                       ]
+        try:
+            float(self.fractionVar.get())
+            float(self.foldVar.get())
+        except ValueError:
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Chimera settings must be numbers!")
+            return
 
-        if not self.psVar.get() == 1: commandLine.append("--noPS")
+        # producing command line to run R Script
+        buildCommand = partial(pipeline.chimeraCommand, self.scriptPath, self.version[0],
+                               inputFile=self.input,
+                               outDir=self.outDir,
+                               minSampleFraction=self.fractionVar.get(),
+                               minFoldParentOverAbundance=self.foldVar.get(),
+                               restart=self.restartVar.get() == 1)
+
+        # run the R script in the background and show its progress
+        runStage(buildCommand, self.outDir, requested=int(self.threadsVar.get() or 0),
+                 onSuccess=lambda: tk.messagebox.showinfo(title="chimera.R",
+                                                          message="Removal of chimeric sequences successful.\n\n" +
+                                                                  summaryText(self.outDir)),
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                         message="Execution of script chimera.R failed.\n" +
+                                                                 "Rerunning it resumes from the last checked samples."))
 
-        # run the R script
+    def onValidate(self, d, S):
+        if int(d) != 1: return True
         try:
-            sp.check_call(commandLine)
-        except sp.CalledProcessError:
-            tk.messagebox.showerror(title="Error in calling script",
-                                    message="Execution of script taxonomy.R failed")
+            int(S)
+        except ValueError:
+            self.bell()
+            return False
         else:
-            tk.messagebox.showinfo(title="taxonomy.R",
-                                   message="Assignment of taxonomy to ASVs successful.")
+            return True
 
     def onClose(self):
         """destructor"""
@@ -857,196 +1111,1127 @@ class taxonomyReads(tk.Toplevel):
         self.destroy()
 
 
-# class phyloTree(tk.Toplevel):
-#     def __init__(self, scriptPath):
-#         """Constructor Select Files Frame"""
-#         tk.Toplevel.__init__(self)
-#
-#         self.scriptPath = scriptPath
-#         self.title('Calculation of phylogenetic tree')
-#         self.protocol('WM_DELETE_WINDOW', self.onClose)
-#         self.input = ""
-#         self.outDir = ""
-#
-#         self.initUI()
-#
-#     def initUI(self):
-#         # HEAD FRAME with button and plot entry
-#         self.Frame = tk.Frame(self)
-#         self.Frame.grid()
-#
-#         # file selection buttons
-#         self.inputBtn = tk.Button(self.Frame, text="Select input FASTA file ...",
-#                                   command=self.selInput, font="Helvetica 12")
-#         self.outpathBtn = tk.Button(self.Frame, text="Select output folder ...",
-#                                     command=self.selOutDir, font="Helvetica 12")
-#         self.labelInput = tk.Label(self.Frame, text="Select input FASTA before continuing", font="Helvetica 10")
-#         self.labelOutpath = tk.Label(self.Frame, text="Select output directory before continuing", font="Helvetica 10")
-#
-#         # run button
-#         self.runBtn = tk.Button(self.Frame, text="RUN", command=self.runPhylotreeScript, font="Helvetica 12")
-#
-#         # place elements on Frame
-#         # buttons
-#         self.inputBtn.grid(row=1, column=1, pady=10, padx=5)
-#         self.outpathBtn.grid(row=2, column=1, pady=10, padx=5)
-#         self.labelInput.grid(row=1, column=2, padx=5)
-#         self.labelOutpath.grid(row=2, column=2, padx=5)
-#
-#         # run button
-#         self.runBtn.grid(row=3, column=2, pady=10, padx=5)
-#
-#     def selInput(self):
-#         self.input = fd.askopenfilename()
-#         self.labelInput.configure(text=self.input)
-#
-#     def selOutDir(self):
-#         self.outDir = fd.askdirectory()
-#         self.labelOutpath.configure(text=self.outDir)
-#
-#     def runPhylotreeScript(self):
-#         # check if all necessary inputs were made
-#         if self.input == "":
-#             tk.messagebox.showinfo(title="Data missing",
-#                                    message="Input FASTA missing!")
-#             return
-#
-#         if self.outDir == "":
-#             tk.messagebox.showinfo(title="Data missing",
-#                                    message="Output directory missing!")
-#             return
-#
-#         # producing command line to run R Script
-#
-#         process = "Rscript"
-#         pathToScript = self.scriptPath + "/phylotree.R"
-#         iArg = self.input
-#         oArg = self.outDir
-#
-#         commandLine = [process, pathToScript,
-#                        "-i", iArg,
-#                        "-o", oArg]
-#
-#         # run the R script
-#         try:
-#             sp.check_call(commandLine)
-#         except sp.CalledProcessError:
-#             tk.messagebox.showerror(title="Error in calling script",
-#                                     message="Execution of script phylotree.R failed")
-#         else:
-#             tk.messagebox.showinfo(title="phylotree.R",
-#                                    message="Upload to server successful")
-#
-#     def onClose(self):
-#         """destructor"""
-#         pub.sendMessage('subWindowClosed')
-#         self.destroy()
+class mergeTables(tk.Toplevel):
 
+    def __init__(self, version, scriptPath):
+        """Constructor Merge Tables Frame"""
+        tk.Toplevel.__init__(self)
 
-class mainFrame(tk.Frame):
+        self.version = version
+        self.scriptPath = scriptPath
+        self.title('Merging of sequence tables (V. ' + self.version[0] + ')')
+        self.protocol('WM_DELETE_WINDOW', self.onClose)
+        self.outDir = ""
 
-    def __init__(self, parent):
-        """Constructor Main Frame"""
-        super().__init__()
+        self.initUI()
 
-        self.root = parent
+    def initUI(self):
+        # Frame with table list and merge settings
+        self.Frame = tk.Frame(self)
+        self.Frame.grid()
 
-        self.versionFile = self.getScriptDirectory() + '/versionsDADA2.txt'
-        self.checkVersionFile()
+        # list of sequence tables of the runs
+        self.tableBox = tk.Listbox(self.Frame, selectmode=tk.EXTENDED, width=80, height=10)
+        self.addBtn = tk.Button(self.Frame, text="Add sequence tables ...", command=self.addTables,
+                                font="Helvetica 12")
+        self.removeBtn = tk.Button(self.Frame, text="Remove selected", command=self.removeTables,
+                                   font="Helvetica 12")
+        self.outpathBtn = tk.Button(self.Frame, text="Select output folder ...",
+                                    command=self.selOutDir, font="Helvetica 12")
+        self.labelOutpath = tk.Label(self.Frame, text="Select output directory before continuing",
+                                     font="Helvetica 10")
+
+        # settings for merging
+        self.repeatsVar = tk.StringVar()
+        self.repeatsVar.set("error")
+        self.repeatsLabel = tk.Label(self.Frame, text="Samples found in several tables:", font="Helvetica 12")
+        self.repeatsDD = tk.OptionMenu(self.Frame, self.repeatsVar, "error", "sum", "rename")
+        self.threadsVar = tk.StringVar()
+        self.threadsVar.set("0")
+        self.threadsLabel = tk.Label(self.Frame, text="Samples checked for chimeras in parallel: (0 = all cores)",
+                                     font="Helvetica 12")
+        self.threadsEntry = tk.Entry(self.Frame, textvariable=self.threadsVar, validate="key",
+                                     validatecommand=(self.register(self.onValidate), '%d', '%S'))
+        self.chimeraVar = tk.IntVar()
+        self.chimeraVar.set(0)
+        self.chimeraCB = tk.Checkbutton(self.Frame, text="remove chimeras from the merged table",
+                                        var=self.chimeraVar, font="Helvetica 10")
+        self.sparseVar = tk.IntVar()
+        self.sparseVar.set(0)
+        self.sparseCB = tk.Checkbutton(self.Frame, text="sparse sequence table", var=self.sparseVar,
+                                       font="Helvetica 10")
 
-        self.initUI()
+        # run button
+        self.runBtn = tk.Button(self.Frame, text="RUN", command=self.runMergeScript, font="Helvetica 12")
 
-        pub.subscribe(self.listener, 'subWindowClosed')
+        # place elements on Frame
+        self.tableBox.grid(row=1, column=1, columnspan=2, pady=10, padx=5)
+        self.addBtn.grid(row=2, column=1, pady=5, padx=5)
+        self.removeBtn.grid(row=2, column=2, pady=5, padx=5)
+        self.outpathBtn.grid(row=3, column=1, pady=10, padx=5)
+        self.labelOutpath.grid(row=3, column=2, padx=5)
+        self.repeatsLabel.grid(row=4, column=1, pady=10, padx=5)
+        self.repeatsDD.grid(row=4, column=2, pady=10, padx=5)
+        self.threadsLabel.grid(row=5, column=1, pady=10, padx=5)
+        self.threadsEntry.grid(row=5, column=2, pady=10, padx=5)
+        self.chimeraCB.grid(row=6, column=1, pady=10, padx=5)
+        self.sparseCB.grid(row=6, column=2, pady=10, padx=5)
+        self.runBtn.grid(row=7, column=2, pady=10, padx=5)
 
-    def initUI(self):
-        self.root.title('DADA2 startup')
+    def addTables(self):
+        tables = fd.askopenfilenames(title="Sequence tables (seqTabClean.RData)",
+                                     filetypes=[("RData files", "*.RData"), ("All files", "*")])
+        present = self.tableBox.get(0, tk.END)
+        for table in tables:
+            if table not in present:
+                self.tableBox.insert(tk.END, table)
+
+    def removeTables(self):
+        for idx in sorted(self.tableBox.curselection(), reverse=True):
+            self.tableBox.delete(idx)
+
+    def selOutDir(self):
+        self.outDir = fd.askdirectory()
+        self.labelOutpath.configure(text=self.outDir)
+
+    def runMergeScript(self):
+        # check if all necessary inputs were made
+        tables = list(self.tableBox.get(0, tk.END))
+        if len(tables) < 2:
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="At least two sequence tables are needed!")
+            return
+
+        if self.outDir == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Output directory missing!")
+            return
+
+        # producing command line to run R Script
+        buildCommand = partial(pipeline.mergeCommand, self.scriptPath, self.version[0],
+                               inputFile=pipeline.writeTableList(tables, self.outDir),
+                               outDir=self.outDir,
+                               repeats=self.repeatsVar.get(),
+                               chimera=self.chimeraVar.get() == 1,
+                               sparse=self.sparseVar.get() == 1)
+
+        # run the R script in the background and show its progress
+        runStage(buildCommand, self.outDir, requested=int(self.threadsVar.get() or 0),
+                 onSuccess=lambda: tk.messagebox.showinfo(title="mergeTables.R",
+                                                          message="Merging of sequence tables successful.\n\n" +
+                                                                  summaryText(self.outDir)),
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                         message="Execution of script mergeTables.R failed"))
+
+    def onValidate(self, d, S):
+        if int(d) != 1: return True
+        try:
+            int(S)
+        except ValueError:
+            self.bell()
+            return False
+        else:
+            return True
+
+    def onClose(self):
+        """destructor"""
+        pub.sendMessage('subWindowClosed')
+        self.destroy()
+
+
+class taxonomyReads(tk.Toplevel):
+
+    def __init__(self, version, scriptPath):
+        """Constructor Select Files Frame"""
+        tk.Toplevel.__init__(self)
+
+        self.version = version
+        self.scriptPath = scriptPath
+
+        # set default values for supported databases
+        self.silva = False
+        self.rdp = False
+        self.gg = False
+        self.unite = False
+        # check installation folder for databases
+        self.checkDatabases()
+
+        self.DATABASES_implemented = [
+            ("SILVA", "silva", self.silva),
+            ("RDP", "rdp", self.rdp),
+            ("Green Genes", "gg", self.gg),
+            ("UNITE (ITS)", "unite", self.unite)
+        ]
+
+        self.title('Taxonomic assignments (V. ' + self.version[0] + ')')
+        self.protocol('WM_DELETE_WINDOW', self.onClose)
+        self.input = ""
+        self.outDir = ""
+
+        self.initUI()
+
+        # if no installations were found: close window with error message
+        if not any([self.silva, self.rdp, self.gg, self.unite]):
+            tk.messagebox.showerror(title="No databases installed",
+                                    message="No databases were found.\n" +
+                                            "Check the documentation for how " +
+                                            "to install databases.")
+            self.onClose()
+
+    def initUI(self):
+        # HEAD FRAME with button and plot entry
+        self.Frame = tk.Frame(self)
+        self.Frame.grid()
+
+        # file selection buttons
+        self.inputBtn = tk.Button(self.Frame, text="Select input file ...",
+                                  command=self.selInput, font="Helvetica 12")
+        self.outpathBtn = tk.Button(self.Frame, text="Select output folder ...",
+                                    command=self.selOutDir, font="Helvetica 12")
+        self.labelInput = tk.Label(self.Frame, text="Select input file before continuing", font="Helvetica 10")
+        self.labelOutpath = tk.Label(self.Frame, text="Select output directory before continuing", font="Helvetica 10")
+
+        # data base selection
+        self.labelDB = tk.Label(self.Frame, text="Database to use:", font="Helvetica 12 underline")
+
+        DATABASES_used = []
+        for (text, db, installed) in self.DATABASES_implemented:
+            if installed:
+                DATABASES_used.append((text, db))
+
+        self.dbVar = tk.StringVar()
+        self.dbVar.set("silva")
+
+        for idx, (text, db) in enumerate(DATABASES_used):
+            rb = tk.Radiobutton(self.Frame, text=text, variable=self.dbVar,
+                                value=db, indicatoron=1)
+            rb.grid(row=idx + 4, column=1, pady=10, padx=5, sticky=tk.W + tk.E)
+
+        # Check buttons for binary options
+        self.psVar = tk.IntVar()
+        self.psVar.set(1)
+        self.psCB = tk.Checkbutton(self.Frame, text="save data as phyloseq", var=self.psVar,
+                                   font="Helvetica 10")
+
+        # run button
+        self.runBtn = tk.Button(self.Frame, text="RUN", command=self.runTaxonomyScript, font="Helvetica 12")
+
+        # place elements on Frame
+        # buttons
+        self.inputBtn.grid(row=1, column=1, pady=10, padx=5)
+        self.outpathBtn.grid(row=2, column=1, pady=10, padx=5)
+        self.labelInput.grid(row=1, column=2, padx=5)
+        self.labelOutpath.grid(row=2, column=2, padx=5)
+
+        # database label
+        self.labelDB.grid(row=3, column=1, pady=10, padx=5)
+
+        # checkbuttons
+        self.psCB.grid(row=5, column=2, pady=10, padx=5)
+
+        # run button
+        self.runBtn.grid(row=7, column=2, pady=10, padx=5)
+
+    def checkDatabases(self):
+        """Checks if database folders exist and if they contain the necessary files,
+        using the cached environment profile if it is still valid"""
+        profile = environment.loadProfile(self.scriptPath)
+        installed = profile['databases'] if profile else environment.checkDatabases(self.scriptPath)
+
+        self.silva = installed['silva']
+        self.rdp = installed['rdp']
+        self.gg = installed['gg']
+        self.unite = installed['unite']
+
+    def selInput(self):
+        self.input = fd.askopenfilename()
+        self.labelInput.configure(text=self.input)
+
+    def selOutDir(self):
+        self.outDir = fd.askdirectory()
+        self.labelOutpath.configure(text=self.outDir)
+
+    def runTaxonomyScript(self):
+        # check if all necessary inputs were made
+        if self.input == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Input file missing!")
+            return
+
+        if self.outDir == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Output directory missing!")
+            return
+
+        # producing command line to run R Script
+        buildCommand = partial(pipeline.taxonomyCommand, self.scriptPath, self.version[0],
+                               inputFile=self.input,
+                               outDir=self.outDir,
+                               database=self.dbVar.get(),
+                               phyloseq=self.psVar.get() == 1)
+
+        # run the R script in the background and show its progress
+        runStage(buildCommand, self.outDir,
+                 onSuccess=lambda: tk.messagebox.showinfo(title="taxonomy.R",
+                                                          message="Assignment of taxonomy to ASVs successful."),
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                         message="Execution of script taxonomy.R failed"))
+
+    def onClose(self):
+        """destructor"""
+        pub.sendMessage('subWindowClosed')
+        self.destroy()
+
+
+class resultsBrowser(tk.Toplevel):
+
+    PAGE_ASVS = 100
+    PAGE_SAMPLES = 20
+
+    def __init__(self, scriptPath):
+        """Constructor Results Browser Frame"""
+        tk.Toplevel.__init__(self)
+
+        self.scriptPath = scriptPath
+        self.title('Browse results')
+        self.protocol('WM_DELETE_WINDOW', self.onClose)
+        self.outDir = ""
+        self.results = None
+        self.table = None
+        self.taxonomy = {}
+        self.asvOrder = []
+        self.sampleOrder = []
+        self.asvPage = 0
+        self.samplePage = 0
+
+        self.initUI()
+
+    def initUI(self):
+        # HEAD FRAME with folder selection, sorting and filter settings
+        self.headFrame = tk.Frame(self)
+        self.headFrame.pack(side=tk.TOP, fill=tk.X)
+
+        self.outDirBtn = tk.Button(self.headFrame, text="Select output folder ...",
+                                   command=self.selOutDir, font="Helvetica 12")
+        self.labelOutpath = tk.Label(self.headFrame, text="Select output directory of a denoising run",
+                                     font="Helvetica 10")
+
+        self.sortAsvVar = tk.StringVar()
+        self.sortAsvVar.set("total reads")
+        self.sortAsvLabel = tk.Label(self.headFrame, text="Sort ASVs by:", font="Helvetica 10")
+        self.sortAsvDD = tk.OptionMenu(self.headFrame, self.sortAsvVar, "total reads", "prevalence", "ASV ID",
+                                       command=lambda x: self.sortTable())
+        self.sortSampleVar = tk.StringVar()
+        self.sortSampleVar.set("name")
+        self.sortSampleLabel = tk.Label(self.headFrame, text="Sort samples by:", font="Helvetica 10")
+        self.sortSampleDD = tk.OptionMenu(self.headFrame, self.sortSampleVar, "name", "total reads",
+                                          command=lambda x: self.sortTable())
+
+        self.filterVar = tk.StringVar()
+        self.filterLabel = tk.Label(self.headFrame, text="Taxon filter:", font="Helvetica 10")
+        self.filterEntry = tk.Entry(self.headFrame, textvariable=self.filterVar)
+        self.filterEntry.bind('<Return>', lambda event: self.sortTable())
+        self.filterBtn = tk.Button(self.headFrame, text="Apply", command=self.sortTable)
+
+        self.outDirBtn.grid(row=0, column=0, padx=10, pady=5)
+        self.labelOutpath.grid(row=0, column=1, columnspan=5, padx=5, sticky=tk.W)
+        self.sortAsvLabel.grid(row=1, column=0, padx=5, sticky=tk.E)
+        self.sortAsvDD.grid(row=1, column=1, padx=5, sticky=tk.W)
+        self.sortSampleLabel.grid(row=1, column=2, padx=5, sticky=tk.E)
+        self.sortSampleDD.grid(row=1, column=3, padx=5, sticky=tk.W)
+        self.filterLabel.grid(row=1, column=4, padx=5, sticky=tk.E)
+        self.filterEntry.grid(row=1, column=5, padx=5)
+        self.filterBtn.grid(row=1, column=6, padx=5)
+
+        # NOTEBOOK with sequence table and read report
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        self.tableFrame = tk.Frame(self.notebook)
+        self.tableView = ttk.Treeview(self.tableFrame, show='headings')
+        self.tableScroll = tk.Scrollbar(self.tableFrame, orient=tk.VERTICAL, command=self.tableView.yview)
+        self.tableView.configure(yscrollcommand=self.tableScroll.set)
+        self.tableScroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tableView.pack(fill=tk.BOTH, expand=True)
+
+        self.reportFrame = tk.Frame(self.notebook)
+        self.reportView = ttk.Treeview(self.reportFrame, show='headings')
+        self.reportScroll = tk.Scrollbar(self.reportFrame, orient=tk.VERTICAL, command=self.reportView.yview)
+        self.reportView.configure(yscrollcommand=self.reportScroll.set)
+        self.reportScroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.reportView.pack(fill=tk.BOTH, expand=True)
+
+        self.notebook.add(self.tableFrame, text="Sequence table")
+        self.notebook.add(self.reportFrame, text="Read report")
+
+        # PAGE FRAME with navigation through ASVs and samples
+        self.pageFrame = tk.Frame(self)
+        self.pageFrame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.prevAsvBtn = tk.Button(self.pageFrame, text="< ASVs", command=lambda: self.turnPage(-1, 0))
+        self.nextAsvBtn = tk.Button(self.pageFrame, text="ASVs >", command=lambda: self.turnPage(1, 0))
+        self.prevSampleBtn = tk.Button(self.pageFrame, text="< samples", command=lambda: self.turnPage(0, -1))
+        self.nextSampleBtn = tk.Button(self.pageFrame, text="samples >", command=lambda: self.turnPage(0, 1))
+        self.pageLabel = tk.Label(self.pageFrame, text="", font="Helvetica 10")
+
+        self.prevAsvBtn.pack(side=tk.LEFT, padx=5, pady=5)
+        self.nextAsvBtn.pack(side=tk.LEFT, padx=5, pady=5)
+        self.pageLabel.pack(side=tk.LEFT, padx=10, pady=5)
+        self.nextSampleBtn.pack(side=tk.RIGHT, padx=5, pady=5)
+        self.prevSampleBtn.pack(side=tk.RIGHT, padx=5, pady=5)
+
+    def selOutDir(self):
+        self.outDir = fd.askdirectory()
+        if self.outDir == "":
+            return
+        self.labelOutpath.configure(text=self.outDir)
+        self.loadResults()
+
+    def loadResults(self):
+        """Opens the results in the output directory, the sequence table stays memory-mapped"""
+        import results
+        if self.table is not None:
+            self.table.close()
+            self.table = None
+
+        self.results = results.projectResults(self.outDir)
+        if not self.results.hasSeqTable():
+            tk.messagebox.showerror(title="No results found",
+                                    message="No sparse sequence table (seqTabClean_counts.mtx) " +
+                                            "was found in the selected directory.")
+            return
+
+        try:
+            self.table = self.results.seqTable
+            self.asvTotals = self.table.asvTotals()
+            self.asvPrevalence = self.table.asvPrevalence()
+            self.sampleTotals = self.table.sampleTotals()
+        except (OSError, ValueError) as e:
+            self.table = None
+            tk.messagebox.showerror(title="Error reading results", message=str(e))
+            return
+
+        try:
+            ranks, self.taxonomy = self.results.taxonomy()
+        except OSError:
+            self.taxonomy = {}
+
+        self.showReadReport()
+        self.sortTable()
+
+    def sortTable(self):
+        """Orders ASVs and samples and applies the taxon filter, then shows the first page"""
+        if self.table is None:
+            return
+
+        nSamples, nAsvs = self.table.shape
+        asvIds = self.table.asvIds
+        asvs = range(nAsvs)
+
+        # filter ASVs by any rank of their taxonomy
+        taxon = self.filterVar.get().strip().lower()
+        if taxon:
+            asvs = [j for j in asvs if any(taxon in rank.lower() for rank in self.taxonomy.get(asvIds[j], []))]
+
+        sortBy = self.sortAsvVar.get()
+        if sortBy == "total reads":
+            self.asvOrder = sorted(asvs, key=lambda j: self.asvTotals[j], reverse=True)
+        elif sortBy == "prevalence":
+            self.asvOrder = sorted(asvs, key=lambda j: self.asvPrevalence[j], reverse=True)
+        else:
+            self.asvOrder = list(asvs)
+
+        if self.sortSampleVar.get() == "total reads":
+            self.sampleOrder = sorted(range(nSamples), key=lambda i: self.sampleTotals[i], reverse=True)
+        else:
+            samples = self.table.samples
+            self.sampleOrder = sorted(range(nSamples), key=lambda i: samples[i])
+
+        self.asvPage = 0
+        self.samplePage = 0
+        self.showPage()
+
+    def turnPage(self, asvStep, sampleStep):
+        nAsvPages = max(1, -(-len(self.asvOrder) // self.PAGE_ASVS))
+        nSamplePages = max(1, -(-len(self.sampleOrder) // self.PAGE_SAMPLES))
+        self.asvPage = min(max(self.asvPage + asvStep, 0), nAsvPages - 1)
+        self.samplePage = min(max(self.samplePage + sampleStep, 0), nSamplePages - 1)
+        self.showPage()
+
+    def showPage(self):
+        """Fills the table view with the current page, only the shown ASVs are read from the table"""
+        if self.table is None:
+            return
+
+        asvIds = self.table.asvIds
+        samples = self.table.samples
+        pageAsvs = self.asvOrder[self.asvPage * self.PAGE_ASVS:(self.asvPage + 1) * self.PAGE_ASVS]
+        pageSamples = self.sampleOrder[self.samplePage * self.PAGE_SAMPLES:
+                                       (self.samplePage + 1) * self.PAGE_SAMPLES]
+
+        columns = ["ASV", "total", "prevalence", "taxonomy"] + [samples[i] for i in pageSamples]
+        self.tableView.delete(*self.tableView.get_children())
+        self.tableView.configure(columns=[str(i) for i in range(len(columns))])
+        for idx, name in enumerate(columns):
+            self.tableView.heading(str(idx), text=name)
+            self.tableView.column(str(idx), width=250 if name == "taxonomy" else 80, stretch=False)
+
+        for j in pageAsvs:
+            counts = self.table.asvCounts(j)
+            taxa = [rank for rank in self.taxonomy.get(asvIds[j], []) if rank not in ("", "NA")]
+            row = [asvIds[j], self.asvTotals[j], self.asvPrevalence[j], "; ".join(taxa[-2:])]
+            row += [counts.get(i, 0) for i in pageSamples]
+            self.tableView.insert('', tk.END, values=row)
+
+        self.pageLabel.configure(
+            text="ASVs {}-{} of {}, samples {}-{} of {}".format(
+                self.asvPage * self.PAGE_ASVS + min(1, len(pageAsvs)),
+                self.asvPage * self.PAGE_ASVS + len(pageAsvs), len(self.asvOrder),
+                self.samplePage * self.PAGE_SAMPLES + min(1, len(pageSamples)),
+                self.samplePage * self.PAGE_SAMPLES + len(pageSamples), len(self.sampleOrder)))
+
+    def showReadReport(self):
+        """Fills the read report view from readReport.txt"""
+        self.reportView.delete(*self.reportView.get_children())
+        try:
+            header, report = self.results.readReport()
+        except (OSError, ValueError):
+            return
+
+        columns = ["sample"] + header
+        self.reportView.configure(columns=[str(i) for i in range(len(columns))])
+        for idx, name in enumerate(columns):
+            self.reportView.heading(str(idx), text=name)
+            self.reportView.column(str(idx), width=100)
+        for name, counts in report.items():
+            self.reportView.insert('', tk.END, values=[name] + ["NA" if x is None else x for x in counts])
+
+    def onClose(self):
+        """destructor"""
+        if self.table is not None:
+            self.table.close()
+        pub.sendMessage('subWindowClosed')
+        self.destroy()
+
+
+class jobQueueWindow(tk.Toplevel):
+
+    COLUMNS = ("job", "name", "version", "status", "stages")
+
+    def __init__(self, version, scriptPath, queue, workers):
+        """Constructor Job Queue Frame"""
+        tk.Toplevel.__init__(self)
+
+        self.version = version
+        self.scriptPath = scriptPath
+        self.queue = queue
+        self.workers = workers
+        self.title('Job queue (V. ' + self.version[0] + ')')
+        self.protocol('WM_DELETE_WINDOW', self.onClose)
+
+        self.initUI()
+        self.refresh()
+
+    def initUI(self):
+        # HEAD FRAME with settings for new jobs
+        self.headFrame = tk.Frame(self)
+        self.headFrame.pack(side=tk.TOP, fill=tk.X)
+
+        self.truncFVar = tk.StringVar()
+        self.truncFVar.set("240")
+        self.truncRVar = tk.StringVar()
+        self.truncRVar.set("200")
+        self.maxErrorVar = tk.StringVar()
+        self.maxErrorVar.set("2")
+        self.poolVar = tk.StringVar()
+        self.poolVar.set("0")
+        self.dbVar = tk.StringVar()
+        self.dbVar.set("silva")
+        self.sparseVar = tk.IntVar()
+        self.sparseVar.set(0)
+        self.chimeraVar = tk.IntVar()
+        self.chimeraVar.set(0)
+        self.taxonomyVar = tk.IntVar()
+        self.taxonomyVar.set(1)
+        self.derepVar = tk.IntVar()
+        self.derepVar.set(0)
+        self.treeVar = tk.IntVar()
+        self.treeVar.set(0)
+        self.primerFVar = tk.StringVar()
+        self.primerFVar.set("")
+        self.primerRVar = tk.StringVar()
+        self.primerRVar.set("")
+
+        self.labelSettings = tk.Label(self.headFrame, text="Settings for new jobs:", font="Helvetica 12 underline")
+        settings = [("Truncate forward at:", self.truncFVar), ("Truncate reverse at:", self.truncRVar),
+                    ("Max. expected errors:", self.maxErrorVar), ("Pseudo-pooling prevalence:", self.poolVar)]
+        for idx, (text, var) in enumerate(settings):
+            tk.Label(self.headFrame, text=text, font="Helvetica 10").grid(row=1 + idx // 2, column=2 * (idx % 2),
+                                                                          padx=5, sticky=tk.E)
+            tk.Entry(self.headFrame, textvariable=var, width=8, validate="key",
+                     validatecommand=(self.register(self.onValidate), '%d', '%S')).grid(
+                row=1 + idx // 2, column=2 * (idx % 2) + 1, padx=5, sticky=tk.W)
+        self.dbLabel = tk.Label(self.headFrame, text="Database:", font="Helvetica 10")
+        self.dbDD = tk.OptionMenu(self.headFrame, self.dbVar, "silva", "rdp", "gg", "unite")
+        # primers are trimmed before filtering if a forward primer is given
+        self.primerLabel = tk.Label(self.headFrame, text="Primers (forward, reverse):", font="Helvetica 10")
+        self.primerFEntry = tk.Entry(self.headFrame, textvariable=self.primerFVar, width=24, validate="key",
+                                     validatecommand=(self.register(self.onValidatePrimer), '%d', '%S'))
+        self.primerREntry = tk.Entry(self.headFrame, textvariable=self.primerRVar, width=24, validate="key",
+                                     validatecommand=(self.register(self.onValidatePrimer), '%d', '%S'))
+        self.sparseCB = tk.Checkbutton(self.headFrame, text="sparse sequence tables", var=self.sparseVar,
+                                       font="Helvetica 10")
+        self.chimeraCB = tk.Checkbutton(self.headFrame, text="separate chimera stage", var=self.chimeraVar,
+                                        font="Helvetica 10")
+        self.taxonomyCB = tk.Checkbutton(self.headFrame, text="taxonomic annotation", var=self.taxonomyVar,
+                                         font="Helvetica 10")
+        self.derepCB = tk.Checkbutton(self.headFrame, text="dereplicate after filtering", var=self.derepVar,
+                                      font="Helvetica 10")
+        self.treeCB = tk.Checkbutton(self.headFrame, text="phylogenetic tree", var=self.treeVar,
+                                     font="Helvetica 10")
+        self.addBtn = tk.Button(self.headFrame, text="Add project ...", command=self.addJob, font="Helvetica 12")
+
+        self.labelSettings.grid(row=0, column=0, columnspan=2, padx=5, pady=5, sticky=tk.W)
+        self.dbLabel.grid(row=3, column=0, padx=5, sticky=tk.E)
+        self.dbDD.grid(row=3, column=1, padx=5, sticky=tk.W)
+        self.sparseCB.grid(row=1, column=4, padx=5, sticky=tk.W)
+        self.chimeraCB.grid(row=2, column=4, padx=5, sticky=tk.W)
+        self.taxonomyCB.grid(row=3, column=4, padx=5, sticky=tk.W)
+        self.derepCB.grid(row=0, column=4, padx=5, sticky=tk.W)
+        self.treeCB.grid(row=3, column=5, padx=5, sticky=tk.W)
+        self.primerLabel.grid(row=4, column=0, padx=5, sticky=tk.E)
+        self.primerFEntry.grid(row=4, column=1, columnspan=2, padx=5, sticky=tk.W)
+        self.primerREntry.grid(row=4, column=3, columnspan=2, padx=5, sticky=tk.W)
+        self.addBtn.grid(row=4, column=5, padx=10, pady=5)
+
+        # JOB LIST with the status of each job and its stages
+        self.jobFrame = tk.Frame(self)
+        self.jobFrame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        self.jobView = ttk.Treeview(self.jobFrame, columns=self.COLUMNS, show='headings', selectmode=tk.BROWSE)
+        for column, width in zip(self.COLUMNS, (50, 150, 70, 80, 500)):
+            self.jobView.heading(column, text=column)
+            self.jobView.column(column, width=width, stretch=column == "stages")
+        self.jobScroll = tk.Scrollbar(self.jobFrame, orient=tk.VERTICAL, command=self.jobView.yview)
+        self.jobView.configure(yscrollcommand=self.jobScroll.set)
+        self.jobScroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.jobView.pack(fill=tk.BOTH, expand=True)
+
+        # BOTTOM FRAME with job actions and workers
+        self.bottomFrame = tk.Frame(self)
+        self.bottomFrame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.cancelBtn = tk.Button(self.bottomFrame, text="Cancel", command=lambda: self.jobAction(self.queue.cancel))
+        self.retryBtn = tk.Button(self.bottomFrame, text="Retry", command=lambda: self.jobAction(self.queue.retry))
+        self.removeBtn = tk.Button(self.bottomFrame, text="Remove", command=lambda: self.jobAction(self.queue.remove))
+        self.workersVar = tk.StringVar()
+        self.workersVar.set(str(self.workers.workers))
+        self.workersLabel = tk.Label(self.bottomFrame, text="Parallel jobs:", font="Helvetica 10")
+        self.workersSB = tk.Spinbox(self.bottomFrame, from_=1, to=max(1, os.cpu_count() or 1),
+                                    textvariable=self.workersVar, width=4)
+        self.workerBtn = tk.Button(self.bottomFrame, text="", command=self.toggleWorkers, font="Helvetica 12")
+
+        self.cancelBtn.pack(side=tk.LEFT, padx=5, pady=5)
+        self.retryBtn.pack(side=tk.LEFT, padx=5, pady=5)
+        self.removeBtn.pack(side=tk.LEFT, padx=5, pady=5)
+        self.workerBtn.pack(side=tk.RIGHT, padx=10, pady=5)
+        self.workersSB.pack(side=tk.RIGHT, padx=5, pady=5)
+        self.workersLabel.pack(side=tk.RIGHT, padx=5, pady=5)
+
+    def onValidate(self, d, S):
+        if int(d) != 1: return True
+        try:
+            int(S)
+        except ValueError:
+            self.bell()
+            return False
+        else:
+            return True
+
+    def onValidatePrimer(self, d, S):
+        if int(d) != 1: return True
+        if all(x in "ACGTURYSWKMBDHVN" for x in S.upper()):
+            return True
+        self.bell()
+        return False
+
+    def addJob(self):
+        """Queues a pipeline run of a folder of paired FASTQ files with the current settings"""
+        inputDir = fd.askdirectory(title="Folder with paired FASTQ files")
+        if inputDir == "":
+            return
+        outDir = fd.askdirectory(title="Output folder")
+        if outDir == "":
+            return
+        if not pipeline.discoverSamples(inputDir):
+            tk.messagebox.showerror(title="No samples found",
+                                    message="No paired FASTQ files (pair1 / pair2) were found in\n" + inputDir)
+            return
+
+        stages = ['input', 'filtering', 'inference']
+        if self.primerFVar.get() != "": stages.append('trimming')
+        if self.chimeraVar.get() == 1: stages.append('chimera')
+        if self.taxonomyVar.get() == 1: stages.append('taxonomy')
+        if self.treeVar.get() == 1: stages.append('tree')
+        settings = {
+            'filtering': {'truncRfwd': self.truncFVar.get() or "0", 'truncRrev': self.truncRVar.get() or "0",
+                          'maxError': self.maxErrorVar.get(), 'derep': self.derepVar.get() == 1},
+            'inference': {'pool': self.poolVar.get() or "0", 'sparse': self.sparseVar.get() == 1},
+            'taxonomy': {'database': self.dbVar.get()},
+            'trimming': {'primerF': self.primerFVar.get().upper(), 'primerR': self.primerRVar.get().upper()},
+        }
+        self.queue.add(inputDir, outDir, self.version[0], settings, stages)
+        self.refresh(repeat=False)
+
+    def selectedJob(self):
+        selection = self.jobView.selection()
+        return int(selection[0]) if selection else None
+
+    def jobAction(self, action):
+        jobId = self.selectedJob()
+        if jobId is not None:
+            action(jobId)
+            self.refresh(repeat=False)
+
+    def toggleWorkers(self):
+        """Starts the workers or lets them stop after their current job"""
+        if self.workers.running() and not self.workers.stopping.is_set():
+            self.workers.stop()
+        else:
+            self.workers.workers = int(self.workersVar.get() or 1)
+            self.workers.start()
+        self.refresh(repeat=False)
+
+    def refresh(self, repeat=True):
+        """Shows the current state of all jobs, repeated every second while the window is open"""
+        selected = self.selectedJob()
+        self.jobView.delete(*self.jobView.get_children())
+        for job in self.queue.jobs():
+            self.jobView.insert('', tk.END, iid=str(job['id']),
+                                values=(job['id'], job['name'], job['version'], job['status'],
+                                        jobQueue.stageSummary(job)))
+        if selected is not None and self.jobView.exists(str(selected)):
+            self.jobView.selection_set(str(selected))
+
+        if self.workers.running() and self.workers.stopping.is_set():
+            self.workerBtn.configure(text="Stopping ...")
+        elif self.workers.running():
+            self.workerBtn.configure(text="Stop workers")
+        else:
+            self.workerBtn.configure(text="Start workers")
+        if repeat:
+            self.after(1000, self.refresh)
+
+    def onClose(self):
+        """destructor, the workers keep running in the background"""
+        pub.sendMessage('subWindowClosed')
+        self.destroy()
+
+
+class phyloTree(tk.Toplevel):
+    def __init__(self, scriptPath):
+        """Constructor Phylogenetic Tree Frame"""
+        tk.Toplevel.__init__(self)
+
+        self.scriptPath = scriptPath
+        self.title('Calculation of phylogenetic tree')
+        self.protocol('WM_DELETE_WINDOW', self.onClose)
+        self.input = ""
+        self.outDir = ""
+
+        self.initUI()
+
+    def initUI(self):
+        # HEAD FRAME with button and plot entry
+        self.Frame = tk.Frame(self)
+        self.Frame.grid()
+
+        # file selection buttons
+        self.inputBtn = tk.Button(self.Frame, text="Select sequence table ...",
+                                  command=self.selInput, font="Helvetica 12")
+        self.outpathBtn = tk.Button(self.Frame, text="Select output folder ...",
+                                    command=self.selOutDir, font="Helvetica 12")
+        self.labelInput = tk.Label(self.Frame, text="Select seqTabClean.RData before continuing", font="Helvetica 10")
+        self.labelOutpath = tk.Label(self.Frame, text="Select output directory (e.g. of the taxonomy) before continuing",
+                                     font="Helvetica 10")
+
+        # tree settings, FastTree is used if it is installed
+        self.methodVar = tk.StringVar()
+        self.methodVar.set("auto")
+        self.methodLabel = tk.Label(self.Frame, text="Tree method (auto: FastTree if installed):", font="Helvetica 12")
+        self.methodDD = tk.OptionMenu(self.Frame, self.methodVar, "auto", "fasttree", "nj")
+        self.threadsVar = tk.StringVar()
+        self.threadsVar.set("0")
+        self.threadsLabel = tk.Label(self.Frame, text="Threads for alignment and tree: (0 = all cores)",
+                                     font="Helvetica 12")
+        self.threadsEntry = tk.Entry(self.Frame, textvariable=self.threadsVar, validate="key",
+                                     validatecommand=(self.register(self.onValidate), '%d', '%S'))
+        self.refineVar = tk.IntVar()
+        self.refineVar.set(0)
+        self.refineCB = tk.Checkbutton(self.Frame, text="refine alignment (slow for many ASVs)", var=self.refineVar,
+                                       font="Helvetica 10")
+
+        # run button
+        self.runBtn = tk.Button(self.Frame, text="RUN", command=self.runPhylotreeScript, font="Helvetica 12")
+
+        # place elements on Frame
+        # buttons
+        self.inputBtn.grid(row=1, column=1, pady=10, padx=5)
+        self.outpathBtn.grid(row=2, column=1, pady=10, padx=5)
+        self.labelInput.grid(row=1, column=2, padx=5)
+        self.labelOutpath.grid(row=2, column=2, padx=5)
+
+        # settings
+        self.methodLabel.grid(row=3, column=1, pady=10, padx=5)
+        self.methodDD.grid(row=3, column=2, pady=10, padx=5)
+        self.threadsLabel.grid(row=4, column=1, pady=10, padx=5)
+        self.threadsEntry.grid(row=4, column=2, pady=10, padx=5)
+        self.refineCB.grid(row=5, column=2, pady=10, padx=5)
+
+        # run button
+        self.runBtn.grid(row=6, column=2, pady=10, padx=5)
+
+    def selInput(self):
+        self.input = fd.askopenfilename()
+        self.labelInput.configure(text=self.input)
+
+    def selOutDir(self):
+        self.outDir = fd.askdirectory()
+        self.labelOutpath.configure(text=self.outDir)
+
+    def runPhylotreeScript(self):
+        # check if all necessary inputs were made
+        if self.input == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Input file missing!")
+            return
+
+        if self.outDir == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Output directory missing!")
+            return
+
+        # producing command line to run R Script
+        buildCommand = partial(pipeline.treeCommand, self.scriptPath,
+                               inputFile=self.input,
+                               outDir=self.outDir,
+                               method=self.methodVar.get(),
+                               refine=self.refineVar.get() == 1)
+
+        # run the R script in the background and show its progress
+        runStage(buildCommand, self.outDir, requested=int(self.threadsVar.get() or 0),
+                 onSuccess=lambda: tk.messagebox.showinfo(title="phylotree.R",
+                                                          message="Phylogenetic tree saved to phyloTree.nwk " +
+                                                                  "and forPhyloseq.RData."),
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                         message="Execution of script phylotree.R failed"))
+
+    def onValidate(self, d, S):
+        if int(d) != 1: return True
+        try:
+            int(S)
+        except ValueError:
+            self.bell()
+            return False
+        else:
+            return True
+
+    def onClose(self):
+        """destructor"""
+        pub.sendMessage('subWindowClosed')
+        self.destroy()
+
+
+class versionComparison(tk.Toplevel):
+    def __init__(self, versions, scriptPath):
+        """Constructor Version Comparison Frame, versions are the registered (version, path, status)"""
+        tk.Toplevel.__init__(self)
+
+        self.versions = versions
+        self.scriptPath = scriptPath
+        self.title('Comparison of DADA2 versions')
+        self.protocol('WM_DELETE_WINDOW', self.onClose)
+        self.filtered = ""
+        self.outDir = ""
+
+        self.initUI()
+
+    def initUI(self):
+        self.Frame = tk.Frame(self)
+        self.Frame.grid()
+
+        # registered versions, stable ones first so the reference is usually a stable version
+        self.labelVersions = tk.Label(self.Frame, text="Versions to compare (the first is the reference):",
+                                      font="Helvetica 12 underline")
+        self.versionBox = tk.Listbox(self.Frame, selectmode=tk.MULTIPLE, width=40, height=6, exportselection=False)
+        for version, path, status in sorted(self.versions, key=lambda v: (v[2] != 'stable',
+                                                                          environment.versionKey(v[0]))):
+            self.versionBox.insert(tk.END, "{} ({})".format(version, status))
+
+        # file selection buttons
+        self.filteredBtn = tk.Button(self.Frame, text="Select filtered reads ...",
+                                     command=self.selFiltered, font="Helvetica 12")
+        self.outpathBtn = tk.Button(self.Frame, text="Select output folder ...",
+                                    command=self.selOutDir, font="Helvetica 12")
+        self.labelFiltered = tk.Label(self.Frame, text="Select folder 'filtered' before continuing",
+                                      font="Helvetica 10")
+        self.labelOutpath = tk.Label(self.Frame, text="Select output directory before continuing",
+                                     font="Helvetica 10")
+
+        # settings passed to inference.R
+        self.poolVar = tk.StringVar()
+        self.poolVar.set("0")
+        self.poolLabel = tk.Label(self.Frame, text="Pseudo-pooling prevalence:", font="Helvetica 12")
+        self.poolEntry = tk.Entry(self.Frame, textvariable=self.poolVar, validate="key",
+                                  validatecommand=(self.register(self.onValidate), '%d', '%S'))
+        self.threadsVar = tk.StringVar()
+        self.threadsVar.set("0")
+        self.threadsLabel = tk.Label(self.Frame, text="Cores shared by the versions: (0 = all cores)",
+                                     font="Helvetica 12")
+        self.threadsEntry = tk.Entry(self.Frame, textvariable=self.threadsVar, validate="key",
+                                     validatecommand=(self.register(self.onValidate), '%d', '%S'))
+
+        # run button
+        self.runBtn = tk.Button(self.Frame, text="RUN", command=self.runComparison, font="Helvetica 12")
+
+        # place elements on Frame
+        self.labelVersions.grid(row=1, column=1, columnspan=2, pady=10, padx=5, sticky=tk.W)
+        self.versionBox.grid(row=2, column=1, columnspan=2, pady=5, padx=5)
+        self.filteredBtn.grid(row=3, column=1, pady=10, padx=5)
+        self.labelFiltered.grid(row=3, column=2, padx=5)
+        self.outpathBtn.grid(row=4, column=1, pady=10, padx=5)
+        self.labelOutpath.grid(row=4, column=2, padx=5)
+        self.poolLabel.grid(row=5, column=1, pady=10, padx=5)
+        self.poolEntry.grid(row=5, column=2, pady=10, padx=5)
+        self.threadsLabel.grid(row=6, column=1, pady=10, padx=5)
+        self.threadsEntry.grid(row=6, column=2, pady=10, padx=5)
+        self.runBtn.grid(row=7, column=2, pady=10, padx=5)
+
+    def selFiltered(self):
+        self.filtered = fd.askdirectory()
+        self.labelFiltered.configure(text=self.filtered)
+
+    def selOutDir(self):
+        self.outDir = fd.askdirectory()
+        self.labelOutpath.configure(text=self.outDir)
+
+    def runComparison(self):
+        # check if all necessary inputs were made
+        versions = [self.versionBox.get(idx).split()[0] for idx in self.versionBox.curselection()]
+        if len(versions) < 2:
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Select at least two DADA2 versions!")
+            return
+
+        if self.filtered == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Folder with filtered reads missing!")
+            return
+
+        if self.outDir == "":
+            tk.messagebox.showinfo(title="Data missing",
+                                   message="Output directory missing!")
+            return
+
+        # filtered reads dereplicated by filtering.R (--derep) are shared as well
+        derep = os.path.join(os.path.dirname(os.path.normpath(self.filtered)), 'derep')
+        buildCommand = partial(pipeline.compareCommand, self.scriptPath, versions,
+                               filtered=self.filtered,
+                               outDir=self.outDir,
+                               pool=self.poolVar.get() or "0",
+                               derep=derep if pipeline.isDerepFolder(derep) else "")
+
+        # run the comparison in the background and show its progress
+        runStage(buildCommand, self.outDir, requested=int(self.threadsVar.get() or 0),
+                 onSuccess=self.showComparison,
+                 onError=lambda: tk.messagebox.showerror(title="Error in calling script",
+                                                         message="Execution of script compareVersions.py failed"))
+
+    def showComparison(self):
+        """Shows runtime, memory and differences to the reference of every version"""
+        import compareVersions
+        lines = []
+        for row in compareVersions.readSummary(self.outDir):
+            lines.append("{}: {} s, {} kB, {} ASVs ({} new, {} lost), mean Bray-Curtis {}".format(
+                row['version'], row['wall time [s]'], row['peak memory [kB]'], row['ASVs'], row['new ASVs'],
+                row['lost ASVs'], row['mean Bray-Curtis']))
+        tk.messagebox.showinfo(title="compareVersions.py",
+                               message="Comparison of DADA2 versions finished.\n\n" + "\n".join(lines) +
+                                       "\n\nDetails: " + os.path.join(self.outDir, compareVersions.SUMMARY_NAME))
+
+    def onValidate(self, d, S):
+        if int(d) != 1: return True
+        try:
+            int(S)
+        except ValueError:
+            self.bell()
+            return False
+        else:
+            return True
+
+    def onClose(self):
+        """destructor"""
+        pub.sendMessage('subWindowClosed')
+        self.destroy()
+
+
+class mainFrame(tk.Frame):
+
+    def __init__(self, parent):
+        """Constructor Main Frame"""
+        super().__init__()
+
+        self.root = parent
+
+        # start from the cached environment profile (or the versions file alone),
+        # any detection runs in the background once the window is shown
+        self.profile = environment.loadProfile(self.getScriptDirectory())
+        self.versionFile = self.getScriptDirectory() + '/' + environment.VERSION_FILE
+
+        self.initUI()
+
+        if self.profile is not None:
+            self.setVersions(self.profile['versions'])
+        else:
+            if os.path.isfile(self.versionFile):
+                self.setVersions(environment.readVersions(self.getScriptDirectory()))
+            self.root.after(100, self.refreshEnvironment)
+
+        # queued pipeline runs, processed in the background and kept across restarts,
+        # the job database is opened on first use
+        self.jobs = None
+        self.workers = None
+        self.root.after(500, self.resumeJobs)
+
+        pub.subscribe(self.listener, 'subWindowClosed')
+
+    def initUI(self):
+        self.root.title('DADA2 startup')
         self.frame = tk.Frame()
         self.frame.pack()
         self.versionSelection = tk.StringVar()
+        self.versionSelection.set("detecting DADA2 ...")
 
-        # choices for version selection
-        # check which DADA2 installations are available
+        # choices for version selection are filled in by setVersions
         self.versionsStable = {}
         self.versionsDev = {}
-        with open(self.versionFile, 'r') as f:
-            next(f)  # skip headers
-            reader = csv.reader(f, delimiter='\t')
-            for version, path, status in reader:
-                if status == 'stable':
-                    self.versionsStable[version + ' (stable)'] = (version, path, status)
-                elif status == 'experimental':
-                    self.versionsDev[version + ' (experimental)'] = (version, path, status)
-
-        # create list with all possible choices
-        self.choices = [str(x) for x in self.versionsStable.keys()] + [str(y) for y in self.versionsDev.keys()]
 
         selBtn = tk.Button(self.frame, text='File selection and quality plots',
                            command=self.selectFrame)
+        trimBtn = tk.Button(self.frame, text='Primer trimming of reads',
+                            command=self.trimFrame)
         filtBtn = tk.Button(self.frame, text='Quality filtering of reads',
                             command=self.filterFrame)
         denoiseBtn = tk.Button(self.frame, text='Start denoising of reads',
                                command=self.denoiseFrame)
+        chimeraBtn = tk.Button(self.frame, text='Chimera removal',
+                               command=self.chimeraFrame)
+        mergeBtn = tk.Button(self.frame, text='Merge sequence tables of runs',
+                             command=self.mergeFrame)
         taxnonmyBtn = tk.Button(self.frame, text='Taxonomic annotation',
                                 command=self.taxonomyFrame)
-        treeBtn = tk.Button(self.frame, text='Phylogenetic tree calculation\n(coming soon)',
-                            command=self.phyloFrame, state=tk.DISABLED)
+        treeBtn = tk.Button(self.frame, text='Phylogenetic tree calculation',
+                            command=self.phyloFrame)
+        resultsBtn = tk.Button(self.frame, text='Browse results',
+                               command=self.resultsFrame)
+        queueBtn = tk.Button(self.frame, text='Job queue',
+                             command=self.queueFrame)
+        # comparing needs at least two registered versions, enabled by setVersions
+        self.compareBtn = tk.Button(self.frame, text='Compare DADA2 versions',
+                                    command=self.compareFrame, state=tk.DISABLED)
+        # stages need a DADA2 version and stay disabled until one is known
+        self.stageBtns = [selBtn, trimBtn, filtBtn, denoiseBtn, chimeraBtn, mergeBtn, taxnonmyBtn, queueBtn]
+        for btn in self.stageBtns:
+            btn.configure(state=tk.DISABLED)
 
         versionLabel = tk.Label(self.frame, text="DADA2 version used:", font="Helvetica 10", )
-        versionDD = tk.OptionMenu(self.frame, self.versionSelection, *self.choices)
+        self.versionDD = tk.OptionMenu(self.frame, self.versionSelection, "")
 
         selBtn.pack(fill=tk.X, pady=10, expand=True)
+        trimBtn.pack(fill=tk.X, pady=10, expand=True)
         filtBtn.pack(fill=tk.X, pady=10, expand=True)
         denoiseBtn.pack(fill=tk.X, pady=10, expand=True)
+        chimeraBtn.pack(fill=tk.X, pady=10, expand=True)
+        mergeBtn.pack(fill=tk.X, pady=10, expand=True)
         taxnonmyBtn.pack(fill=tk.X, pady=10, expand=True)
         treeBtn.pack(fill=tk.X, pady=10, expand=True)
+        resultsBtn.pack(fill=tk.X, pady=10, expand=True)
+        queueBtn.pack(fill=tk.X, pady=10, expand=True)
+        self.compareBtn.pack(fill=tk.X, pady=10, expand=True)
         # trackerBtn.pack(fill=tk.X, pady=10, expand=True)
         versionLabel.pack(fill=tk.X, pady=10, expand=True)
-        versionDD.pack(fill=tk.X, pady=10, expand=True)
+        self.versionDD.pack(fill=tk.X, pady=10, expand=True)
 
-        # set default version to latest stable
-        self.versionSelection.set(max(self.versionsStable.keys()))
+    def setVersions(self, versions):
+        """Fills the version selection with the DADA2 installations (version, path, status)"""
+        self.versionsStable = {}
+        self.versionsDev = {}
+        for version, path, status in versions:
+            if status == 'stable':
+                self.versionsStable[version + ' (stable)'] = (version, path, status)
+            elif status == 'experimental':
+                self.versionsDev[version + ' (experimental)'] = (version, path, status)
 
-    def checkVersionFile(self):
+        # create list with all possible choices
+        self.choices = [str(x) for x in self.versionsStable.keys()] + [str(y) for y in self.versionsDev.keys()]
+
+        menu = self.versionDD['menu']
+        menu.delete(0, 'end')
+        for choice in self.choices:
+            menu.add_command(label=choice, command=tk._setit(self.versionSelection, choice))
+
+        # keep a valid selection, default to latest stable
+        if self.versionSelection.get() not in self.choices and self.versionsStable:
+            self.versionSelection.set(max(self.versionsStable.keys(),
+                                          key=lambda x: environment.versionKey(x.split()[0])))
+        for btn in self.stageBtns:
+            btn.configure(state=tk.NORMAL if self.versionsStable else tk.DISABLED)
+        self.compareBtn.configure(state=tk.NORMAL if len(self.choices) > 1 else tk.DISABLED)
+
+    def refreshEnvironment(self):
+        """Detects the environment in a background thread. If no versions file exists yet,
+        R is called and checked for an DADA2 installation, which is then written to a new versions file."""
+        found = queue.Queue()
+
+        def worker():
+            try:
+                found.put(environment.detectEnvironment(self.getScriptDirectory()))
+            except (OSError, ValueError):
+                found.put(None)
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.pollEnvironment(found)
+
+    def pollEnvironment(self, found):
+        try:
+            profile = found.get_nowait()
+        except queue.Empty:
+            self.root.after(200, self.pollEnvironment, found)
+            return
+        if profile is not None:
+            self.checkProfile(profile)
+
+    def checkProfile(self, profile):
         """
-        Checks if a text file containing information about installed DADA2 versions is available.
-        If none is available, R is called and checked for an DADA2 installation, which is then written
-        to a new versions file. If DADA2 was not found, an error message is shown and the program closes.
+        Shows the detected DADA2 installations. If R could not be called or DADA2 was not found,
+        an error message is shown and the program closes.
         """
-
-        if not os.path.isfile(self.versionFile):
-            checkData = str(
-                    sp.check_output(
-                    'Rscript ' + self.getScriptDirectory() + '/checkDADAVersion.R; exit 0',
-                    stderr=sp.STDOUT,
-                    shell=True
-                ))
-
-            if "not found" in checkData:
-                tk.messagebox.showerror(title="Something went wrong",
-                                        message="It seems that your R installation could not be called.\n\n" +
-                                                "Please, make sure R is properly installed with all the\n" +
-                                                "necessary packages as mention in the documentation.")
-                exit(0)
-
-            if "none installed" in checkData:
-                tk.messagebox.showerror(title="DADA2 not installed",
-                                        message="No DADA2 installation was found on your system.\n\n" +
-                                                "Manual installations need to be filled manually " +
-                                                "into versionsDADA2.txt in the program directory.")
-                exit(0)
-
-            version = re.search("[0-9]+\.[0-9]+\.[0-9]+", checkData).group()
-
-            with open(self.versionFile, 'w', newline='') as csvfile:
-                versionWriter = csv.writer(csvfile, dialect=csv.excel_tab)
-                versionWriter.writerow(["version", "path", "status"])
-                versionWriter.writerow([version, "[default]", "stable"])
+        if profile['status'] == "no R":
+            tk.messagebox.showerror(title="Something went wrong",
+                                    message="It seems that your R installation could not be called.\n\n" +
+                                            "Please, make sure R is properly installed with all the\n" +
+                                            "necessary packages as mention in the documentation.")
+            exit(0)
+
+        if profile['status'] == "none installed":
+            tk.messagebox.showerror(title="DADA2 not installed",
+                                    message="No DADA2 installation was found on your system.\n\n" +
+                                            "Manual installations need to be filled manually " +
+                                            "into versionsDADA2.txt in the program directory.")
+            exit(0)
+
+        self.profile = profile
+        self.setVersions(profile['versions'])
 
     def getScriptDirectory(self):
-        filename = getframeinfo(currentframe()).filename
-        directory = Path(filename).resolve().parent
-
-        return str(directory)
+        return environment.SCRIPT_DIRECTORY
 
     def show(self):
         """shows main frame"""
@@ -1074,6 +2259,20 @@ class mainFrame(tk.Frame):
             tk.messagebox.showerror(title="DADA2 version unknown",
                                     message="Selected DADA2 version not available.")
 
+    def trimFrame(self):
+        """opens trimReads window"""
+        self.hide()
+        if self.versionSelection.get() in self.versionsStable:
+            subFrame = trimReads(version=self.versionsStable[self.versionSelection.get()],
+                                 scriptPath=self.getScriptDirectory())
+        elif self.versionSelection.get() in self.versionsDev:
+            subFrame = trimReads(version=self.versionsDev[self.versionSelection.get()],
+                                 scriptPath=self.getScriptDirectory())
+        else:
+            pub.sendMessage('subWindowClosed')
+            tk.messagebox.showerror(title="DADA2 version unknown",
+                                    message="Selected DADA2 version not available.")
+
     def filterFrame(self):
         """opens filterReads window"""
         self.hide()
@@ -1102,6 +2301,34 @@ class mainFrame(tk.Frame):
             tk.messagebox.showerror(title="DADA2 version unknown",
                                     message="Selected DADA2 version not available.")
 
+    def chimeraFrame(self):
+        """opens chimeraReads window"""
+        self.hide()
+        if self.versionSelection.get() in self.versionsStable:
+            subFrame = chimeraReads(version=self.versionsStable[self.versionSelection.get()],
+                                    scriptPath=self.getScriptDirectory())
+        elif self.versionSelection.get() in self.versionsDev:
+            subFrame = chimeraReads(version=self.versionsDev[self.versionSelection.get()],
+                                    scriptPath=self.getScriptDirectory())
+        else:
+            pub.sendMessage('subWindowClosed')
+            tk.messagebox.showerror(title="DADA2 version unknown",
+                                    message="Selected DADA2 version not available.")
+
+    def mergeFrame(self):
+        """opens mergeTables window"""
+        self.hide()
+        if self.versionSelection.get() in self.versionsStable:
+            subFrame = mergeTables(version=self.versionsStable[self.versionSelection.get()],
+                                   scriptPath=self.getScriptDirectory())
+        elif self.versionSelection.get() in self.versionsDev:
+            subFrame = mergeTables(version=self.versionsDev[self.versionSelection.get()],
+                                   scriptPath=self.getScriptDirectory())
+        else:
+            pub.sendMessage('subWindowClosed')
+            tk.messagebox.showerror(title="DADA2 version unknown",
+                                    message="Selected DADA2 version not available.")
+
     def taxonomyFrame(self):
         """opens taxonomyReads window"""
         self.hide()
@@ -1116,14 +2343,65 @@ class mainFrame(tk.Frame):
             tk.messagebox.showerror(title="DADA2 version unknown",
                                     message="Selected DADA2 version not available.")
 
+    def resultsFrame(self):
+        """opens resultsBrowser window"""
+        self.hide()
+        subFrame = resultsBrowser(self.getScriptDirectory())
+
+    def openJobs(self, create=True):
+        """Opens the job database and its workers on first use, returns None if it cannot be opened"""
+        if self.jobs is None:
+            self.jobs = jobQueue.openQueue(create)
+            if self.jobs is not None:
+                self.workers = jobQueue.workerPool(self.jobs)
+        return self.jobs
+
+    def queueFrame(self):
+        """opens jobQueueWindow window"""
+        if self.openJobs() is None:
+            tk.messagebox.showerror(title="Job queue not available",
+                                    message="The job database could not be created in the installation " +
+                                            "directory or in " + os.path.dirname(jobQueue.USER_DATABASE))
+            return
+        self.hide()
+        if self.versionSelection.get() in self.versionsStable:
+            subFrame = jobQueueWindow(version=self.versionsStable[self.versionSelection.get()],
+                                      scriptPath=self.getScriptDirectory(),
+                                      queue=self.jobs, workers=self.workers)
+        elif self.versionSelection.get() in self.versionsDev:
+            subFrame = jobQueueWindow(version=self.versionsDev[self.versionSelection.get()],
+                                      scriptPath=self.getScriptDirectory(),
+                                      queue=self.jobs, workers=self.workers)
+        else:
+            pub.sendMessage('subWindowClosed')
+            tk.messagebox.showerror(title="DADA2 version unknown",
+                                    message="Selected DADA2 version not available.")
+
+    def resumeJobs(self):
+        """Starts the workers again if jobs are still queued or were interrupted by closing
+        the program, without a job database there is nothing to resume"""
+        if self.openJobs(create=False) is None:
+            return
+        pending = [job for job in self.jobs.jobs()
+                   if job['status'] == 'queued' or
+                   (job['status'] == 'running' and not jobQueue.processAlive(job['worker']))]
+        if pending:
+            self.workers.start()
+
+    def compareFrame(self):
+        """opens versionComparison window"""
+        self.hide()
+        versions = list(self.versionsStable.values()) + list(self.versionsDev.values())
+        subFrame = versionComparison(versions, self.getScriptDirectory())
+
     def phyloFrame(self):
-        """opens taxonomyReads window"""
+        """opens phyloTree window"""
         self.hide()
         subFrame = phyloTree(self.getScriptDirectory())
 
 
 if __name__ == '__main__':
     root = tk.Tk()
-    root.geometry('250x400')
+    root.geometry('250x700')
     app = mainFrame(root)
     root.mainloop()
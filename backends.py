@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+"""
+Execution backends for the pipeline stages.
+Stages run as local processes by default. Stages listed in backends.json
+in the installation directory are submitted to a batch scheduler instead:
+the command line is written into a job script, submitted, and the job is
+polled until it wrote its exit code. Its log is followed while it runs, so
+progress events of the R scripts reach the GUI like those of local stages.
+Output folders and the installation directory have to be on a file system
+shared with the compute nodes.
+
+Example backends.json for a SLURM cluster:
+{
+  "stages": {"inference": "cluster", "taxonomy": "cluster"},
+  "backends": {
+    "cluster": {
+      "type": "batch",
+      "submit": ["sbatch", "--parsable"],
+      "status": ["squeue", "-h", "-j", "{job}", "-o", "%T"],
+      "cancel": ["scancel", "{job}"],
+      "threads": 16,
+      "directives": ["#SBATCH --cpus-per-task={threads}", "#SBATCH --mem=64G"],
+      "prelude": ["module load R"]
+    }
+  }
+}
+
+The job id is taken as the first number in the output of the submit
+command, "jobId" sets a regular expression for other formats (its first
+group is used if it has one).
+
+fakeScheduler.py provides submit, status and cancel commands running jobs
+on the local machine, to test the batch backend without a cluster.
+"""
+
+import os
+import re
+import json
+import time
+import inspect
+import shlex
+import subprocess as sp
+from datetime import datetime
+
+import pipeline
+
+
+SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+CONFIG_NAME = 'backends.json'
+
+
+class localBackend(object):
+    """Runs stages as child processes of the launcher, sharing the local core budget"""
+
+    name = 'local'
+
+    def call(self, buildCommand, ledger=None, onEvent=None, requested=0):
+        return pipeline.scheduledCall(buildCommand, ledger, onEvent, requested=requested)
+
+
+class batchBackend(object):
+    """Submits stages as jobs to a batch scheduler. Commands are lists of arguments,
+    {job} is replaced by the job id of the scheduler."""
+
+    def __init__(self, name, submit, status, cancel=None, threads=1, directives=(), prelude=(), poll=10.0,
+                 grace=3, jobId=r'\d+'):
+        """Constructor for batchBackend class. A job whose id is no longer listed by the status
+        command and that did not write its exit code after grace polls has failed. jobId is the
+        regular expression finding the job id in the output of the submit command, its first
+        group if it has one (e.g. "^(\\d+)" for sbatch --parsable on a federation)."""
+        self.name = name
+        self.jobId = re.compile(jobId)
+        self.submit = list(submit)
+        self.status = list(status)
+        self.cancel = list(cancel) if cancel else None
+        self.threads = int(threads)
+        self.directives = list(directives)
+        self.prelude = list(prelude)
+        self.poll = float(poll)
+        self.grace = int(grace)
+
+    def jobScript(self, commandLine, logFile, exitFile):
+        """Text of the job script running the command line on a node"""
+        lines = ['#!/bin/sh']
+        lines += [d.format(threads=self.threads) for d in self.directives]
+        lines += self.prelude
+        lines += ['cd ' + shlex.quote(os.getcwd()),
+                  '{} > {} 2>&1'.format(' '.join(shlex.quote(x) for x in commandLine), shlex.quote(logFile)),
+                  'echo $? > {}.tmp && mv {}.tmp {}'.format(*[shlex.quote(exitFile)] * 3)]
+        return '\n'.join(lines) + '\n'
+
+    def command(self, template, jobId):
+        return [x.format(job=jobId) for x in template]
+
+    def submitJob(self, script):
+        """Submits a job script and returns the job id of the scheduler"""
+        output = sp.check_output(self.submit + [script], stderr=sp.STDOUT).decode(errors='replace')
+        match = self.jobId.search(output)
+        if match is None:
+            raise RuntimeError('No job id ({}) in output of {}: {}'.format(self.jobId.pattern, ' '.join(self.submit),
+                                                                          output.strip()))
+        return match.group(1) if self.jobId.groups else match.group(0)
+
+    def jobListed(self, jobId):
+        """Checks if the scheduler still lists a job"""
+        try:
+            output = sp.check_output(self.command(self.status, jobId), stderr=sp.DEVNULL)
+        except sp.CalledProcessError:
+            return False
+        return output.strip() != b''
+
+    def cancelJob(self, jobId):
+        if self.cancel:
+            sp.call(self.command(self.cancel, jobId), stdout=sp.DEVNULL, stderr=sp.DEVNULL)
+
+    def followLog(self, logFile, position, onEvent):
+        """Passes the complete lines written to the log since position on, returns the new position"""
+        if not os.path.isfile(logFile):
+            return position
+        with open(logFile, 'rb') as f:
+            f.seek(position)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        for raw in data[:end].splitlines():
+            line = raw.decode(errors='replace').rstrip('\r')
+            event = pipeline.parseProgress(line)
+            if onEvent:
+                onEvent(event if event is not None else {'event': 'log', 'line': line})
+        return position + end
+
+    def call(self, buildCommand, ledger=None, onEvent=None, requested=0):
+        """Runs a stage as batch job and waits for it like pipeline.checkCall"""
+        threads = min(requested, self.threads) if requested > 0 else self.threads
+        commandLine = buildCommand(threads=threads)
+        stage = pipeline.stageName(commandLine)
+
+        batchDir = os.path.join(os.path.dirname(ledger) if ledger else os.getcwd(), 'batchJobs')
+        os.makedirs(batchDir, exist_ok=True)
+        base = os.path.join(batchDir, '{}_{}'.format(stage, datetime.now().strftime('%Y%m%d_%H%M%S_%f')))
+        script, logFile, exitFile = base + '.sh', base + '.log', base + '.exit'
+        with open(script, 'w') as f:
+            f.write(self.jobScript(commandLine, logFile, exitFile))
+        os.chmod(script, 0o755)
+
+        started = datetime.now().isoformat(timespec='milliseconds')
+        start = time.perf_counter()
+        jobId = self.submitJob(script)
+        if ledger:
+            pipeline.appendLedger(ledger, 'submitted', stage=stage, backend=self.name, job=jobId,
+                                  threads=threads, script=script, command=commandLine)
+        if onEvent:
+            onEvent({'event': 'log', 'line': 'Submitted {} as job {} to {}'.format(stage, jobId, self.name)})
+
+        position, missing = 0, 0
+        try:
+            while not os.path.isfile(exitFile):
+                time.sleep(self.poll)
+                position = self.followLog(logFile, position, onEvent)
+                if os.path.isfile(exitFile) or self.jobListed(jobId):
+                    missing = 0
+                    continue
+                # the exit code may reach a shared file system later than the scheduler drops the job
+                missing += 1
+                if missing > self.grace:
+                    break
+        except BaseException:
+            self.cancelJob(jobId)
+            raise
+        self.followLog(logFile, position, onEvent)
+
+        returncode = -1
+        if os.path.isfile(exitFile):
+            with open(exitFile) as f:
+                returncode = int(f.read().strip() or -1)
+        result = pipeline.stageResult(returncode, time.perf_counter() - start, None, None)
+        if ledger:
+            pipeline.appendLedger(ledger, 'end', stage=stage, backend=self.name, job=jobId, start=started,
+                                  returncode=returncode, wallTime=round(result.wallTime, 3), log=logFile)
+        if returncode != 0:
+            raise sp.CalledProcessError(returncode, commandLine)
+        return result
+
+
+# settings of batch backends in backends.json, the parameters of batchBackend
+BATCH_SETTINGS = set(inspect.signature(batchBackend).parameters) - {'name'}
+
+
+def loadBackends(scriptPath=SCRIPT_PATH):
+    """Returns the backends configured in backends.json and the backend name of each stage"""
+    backends = {'local': localBackend()}
+    configFile = os.path.join(scriptPath, CONFIG_NAME)
+    if not os.path.isfile(configFile):
+        return backends, {}
+    with open(configFile) as f:
+        try:
+            config = json.load(f)
+        except ValueError as e:
+            raise ValueError('{} is not valid JSON: {}'.format(configFile, e))
+    for name, settings in config.get('backends', {}).items():
+        settings = dict(settings)
+        kind = settings.pop('type', 'batch')
+        if kind == 'local':
+            backends[name] = localBackend()
+        elif kind == 'batch':
+            unknown = sorted(set(settings) - BATCH_SETTINGS)
+            if unknown:
+                raise ValueError('Backend {} has unknown settings: {}'.format(name, ', '.join(unknown)))
+            missing = sorted(x for x in ('submit', 'status') if x not in settings)
+            if missing:
+                raise ValueError('Backend {} misses settings: {}'.format(name, ', '.join(missing)))
+            backends[name] = batchBackend(name, **settings)
+        else:
+            raise ValueError('Unknown backend type: ' + kind)
+    stages = config.get('stages', {})
+    for stage, name in stages.items():
+        if name not in backends:
+            raise ValueError('Stage {} uses unknown backend {}'.format(stage, name))
+    return backends, stages
+
+
+def dispatch(buildCommand, ledger=None, onEvent=None, requested=0, scriptPath=SCRIPT_PATH):
+    """Runs a stage on the backend configured for it, like pipeline.scheduledCall"""
+    backends, stages = loadBackends(scriptPath)
+    stage = pipeline.stageName(buildCommand(threads=0))
+    return backends[stages.get(stage, 'local')].call(buildCommand, ledger, onEvent, requested=requested)
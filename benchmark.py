@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark harness for the DADA2 pipeline.
+Synthetic paired FASTQ files are generated from the bundled test data set,
+then every stage is run through the same functions the GUI uses (see pipeline.py).
+Wall time, CPU time, peak memory and reads per second of each stage are appended
+to a JSON lines results file and compared with the previous run of the same size.
+
+Without an R installation (or with --stub) benchmarkStub.py stands in for Rscript.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import random
+import argparse
+import tempfile
+import resource
+import subprocess as sp
+from datetime import datetime
+
+import fastq
+import pipeline
+
+
+SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+SEED_PATH = os.path.join(SCRIPT_PATH, 'test data set')
+BASES = b'ACGT'
+
+
+def loadSeeds():
+    """Returns the read pairs of the bundled test data set"""
+    seeds = []
+    for fwd in sorted(x for x in os.listdir(SEED_PATH) if 'pair1' in x):
+        rev = os.path.join(SEED_PATH, fwd.replace('pair1', 'pair2'))
+        seeds.extend(zip(fastq.readFastq(os.path.join(SEED_PATH, fwd)), fastq.readFastq(rev)))
+    return seeds
+
+
+def mutate(rng, sequence, rate):
+    """Introduces random substitutions at the given per-base rate"""
+    if rate <= 0:
+        return sequence
+    seq = bytearray(sequence)
+    for pos in range(len(seq)):
+        if rng.random() < rate:
+            seq[pos] = BASES[rng.randrange(4)]
+    return bytes(seq)
+
+
+def generateData(outDir, nSamples, nReads, compress=False, errorRate=0.002, seed=42):
+    """Writes nSamples paired FASTQ files with nReads read pairs each, drawn from the seeds"""
+    rng = random.Random(seed)
+    seeds = loadSeeds()
+    os.makedirs(outDir, exist_ok=True)
+    suffix = '.fastq.gz' if compress else '.fastq'
+
+    for k in range(nSamples):
+        name = 'synth{:04d}'.format(k + 1)
+        with fastq.openFastq(os.path.join(outDir, name + '_.pair1' + suffix), 'wb') as outF, \
+                fastq.openFastq(os.path.join(outDir, name + '_.pair2' + suffix), 'wb') as outR:
+            for i in range(nReads):
+                recF, recR = seeds[rng.randrange(len(seeds))]
+                readId = '@SYNTH:{}:{}'.format(k + 1, i + 1).encode()
+                fastq.writeRecord(outF, fastq.fastqRecord(readId + b' 1:N:0:1',
+                                                          mutate(rng, recF.sequence, errorRate), recF.quality))
+                fastq.writeRecord(outR, fastq.fastqRecord(readId + b' 2:N:0:1',
+                                                          mutate(rng, recR.sequence, errorRate), recR.quality))
+
+
+def stubEnvironment(workDir):
+    """Creates an Rscript wrapper calling benchmarkStub.py and returns the environment using it"""
+    binDir = os.path.join(workDir, 'bin')
+    os.makedirs(binDir, exist_ok=True)
+    wrapper = os.path.join(binDir, 'Rscript')
+    with open(wrapper, 'w') as f:
+        f.write('#!/bin/sh\nexec "{}" "{}" "$@"\n'.format(sys.executable,
+                                                         os.path.join(SCRIPT_PATH, 'benchmarkStub.py')))
+    os.chmod(wrapper, 0o755)
+    env = dict(os.environ)
+    env['PATH'] = binDir + os.pathsep + env.get('PATH', '')
+    env['PYTHONPATH'] = SCRIPT_PATH + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+
+def installedVersion():
+    """Returns the latest stable DADA2 version of versionsDADA2.txt, if there is one"""
+    versionFile = os.path.join(SCRIPT_PATH, 'versionsDADA2.txt')
+    if not os.path.isfile(versionFile):
+        return None
+    with open(versionFile) as f:
+        next(f)
+        versions = [line.split('\t') for line in f if line.strip()]
+    stable = [v[0] for v in versions if v[-1].strip() == 'stable']
+    return max(stable, key=lambda v: [int(x) for x in v.split('.')]) if stable else None
+
+
+def stageRecord(stage, result, reads):
+    return {
+        'stage': stage,
+        'returncode': result.returncode,
+        'wallTime': round(result.wallTime, 4),
+        'cpuTime': None if result.cpuTime is None else round(result.cpuTime, 4),
+        'maxRSS': result.maxRSS,
+        'reads': reads,
+        'readsPerSec': round(reads / result.wallTime, 1) if result.wallTime > 0 else None,
+    }
+
+
+def runStages(workDir, dataDir, nReadsTotal, version, stages):
+    """Runs the selected stages in pipeline order and returns their records"""
+    records = []
+    outDir = os.path.join(workDir, 'output')
+    os.makedirs(outDir, exist_ok=True)
+
+    def run(stage, commandLine):
+        result = pipeline.runCommand(commandLine)
+        records.append(stageRecord(stage, result, nReadsTotal))
+        if result.returncode != 0:
+            raise sp.CalledProcessError(result.returncode, commandLine)
+
+    # sample discovery runs in-process, as in the file selection window
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    samples = pipeline.discoverSamples(dataDir)
+    inputFile = pipeline.writeInputFile(samples, outDir)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpuTime = usage.ru_utime + usage.ru_stime - before.ru_utime - before.ru_stime
+    records.append(stageRecord('discovery', pipeline.stageResult(0, time.perf_counter() - start,
+                                                                  cpuTime, usage.ru_maxrss), nReadsTotal))
+
+    if 'profile' in stages:
+        run('profile', pipeline.inputCommand(SCRIPT_PATH, version, inputFile, outDir, 2))
+    if 'filter' in stages:
+        run('filter', pipeline.filterCommand(SCRIPT_PATH, version,
+                                             forward=os.path.join(outDir, 'selectedFilesF.txt'),
+                                             reverse=os.path.join(outDir, 'selectedFilesR.txt'),
+                                             outDir=outDir, truncRfwd=240, truncRrev=200,
+                                             maxError=2, verbose=False))
+    if 'derep' in stages:
+        run('derep', pipeline.derepCommand(SCRIPT_PATH, os.path.join(outDir, 'filtered'), outDir))
+    if 'denoise' in stages:
+        run('denoise', pipeline.denoiseCommand(SCRIPT_PATH, version, os.path.join(outDir, 'filtered'),
+                                               outDir, plots=0,
+                                               derep=os.path.join(outDir, 'derep') if 'derep' in stages else ""))
+    if 'taxonomy' in stages:
+        run('taxonomy', pipeline.taxonomyCommand(SCRIPT_PATH, version,
+                                                 os.path.join(outDir, 'seqTabClean.RData'),
+                                                 os.path.join(outDir, 'taxonomy'), phyloseq=False))
+    return records
+
+
+def gitCommit():
+    try:
+        return sp.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_PATH,
+                               stderr=sp.DEVNULL).decode().strip()
+    except (OSError, sp.CalledProcessError):
+        return None
+
+
+def previousRun(resultsFile, config):
+    """Returns the last recorded run with the same configuration"""
+    if not os.path.isfile(resultsFile):
+        return None
+    last = None
+    with open(resultsFile) as f:
+        for line in f:
+            run = json.loads(line)
+            if run.get('config') == config:
+                last = run
+    return last
+
+
+def compareRuns(run, previous, tolerance):
+    """Prints the stages of a run next to the previous run, returns the names of regressed stages"""
+    before = {s['stage']: s for s in previous['stages']} if previous else {}
+    regressions = []
+    print('{:<10} {:>10} {:>10} {:>12} {:>12} {:>8}'.format('stage', 'wall [s]', 'cpu [s]', 'RSS [kB]',
+                                                            'reads/s', 'vs. last'))
+    for s in run['stages']:
+        ratio = ''
+        if s['stage'] in before and before[s['stage']]['wallTime'] > 0:
+            r = s['wallTime'] / before[s['stage']]['wallTime']
+            ratio = '{:.2f}x'.format(r)
+            if r > tolerance and s['wallTime'] - before[s['stage']]['wallTime'] > 0.05:
+                regressions.append(s['stage'])
+                ratio += ' !'
+        print('{:<10} {:>10} {:>10} {:>12} {:>12} {:>8}'.format(s['stage'], s['wallTime'], s['cpuTime'] or '',
+                                                                s['maxRSS'] or '', s['readsPerSec'] or '', ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--samples', type=int, default=4, help='number of synthetic samples [%(default)s]')
+    parser.add_argument('--reads', type=int, default=10000, help='read pairs per sample [%(default)s]')
+    parser.add_argument('--gzip', action='store_true', help='write gzip compressed FASTQs')
+    parser.add_argument('--stages', default='profile,filter,denoise,taxonomy',
+                        help='comma separated stages to run, add derep for derep.py [%(default)s]')
+    parser.add_argument('--stub', action='store_true', help='use benchmarkStub.py instead of Rscript')
+    parser.add_argument('--workdir', default=None, help='working directory, kept after the run')
+    parser.add_argument('--results', default=os.path.join(SCRIPT_PATH, 'benchmark_results.jsonl'),
+                        help='results file [%(default)s]')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='wall time ratio to the last run reported as regression [%(default)s]')
+    args = parser.parse_args()
+
+    stages = args.stages.split(',')
+    version = installedVersion()
+    stub = args.stub or shutil.which('Rscript') is None or version is None
+    if 'taxonomy' in stages and not stub and not os.path.isdir(os.path.join(SCRIPT_PATH, 'taxonomy', 'silva')):
+        print('No SILVA database installed, skipping taxonomy stage.')
+        stages.remove('taxonomy')
+
+    workDir = args.workdir or tempfile.mkdtemp(prefix='dada2bench_')
+    dataDir = os.path.join(workDir, 'data')
+    if stub:
+        os.environ.update(stubEnvironment(workDir))
+        version = 'stub'
+
+    start = time.perf_counter()
+    generateData(dataDir, args.samples, args.reads, compress=args.gzip)
+    print('Generated {} x {} read pairs in {:.1f} s'.format(args.samples, args.reads, time.perf_counter() - start))
+
+    config = {'samples': args.samples, 'reads': args.reads, 'gzip': args.gzip, 'stub': stub, 'version': version}
+    run = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': gitCommit(),
+           'host': socket.gethostname(), 'cpus': os.cpu_count(), 'config': config}
+    try:
+        run['stages'] = runStages(workDir, dataDir, args.samples * args.reads, version, stages)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workDir, ignore_errors=True)
+
+    previous = previousRun(args.results, config)
+    regressions = compareRuns(run, previous, args.tolerance)
+    with open(args.results, 'a') as f:
+        f.write(json.dumps(run) + '\n')
+
+    if regressions:
+        print('Slower than the last run: ' + ', '.join(regressions))
+        sys.exit(1)
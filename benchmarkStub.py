@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+Stand-in for Rscript used by benchmark.py on machines without R.
+It is called with the path of a pipeline script followed by that
+script's options and writes outputs of the same names and layout,
+doing comparable streaming work (reading, trimming, dereplicating
+and writing reads) so the launcher and file handling are exercised.
+"""
+
+import os
+import sys
+import argparse
+from collections import Counter
+
+import fastq
+
+
+def parseOptions(args):
+    parser = argparse.ArgumentParser(add_help=False)
+    for opt in ['-i', '-o', '-f', '-r', '-x', '-y', '-p', '-d', '-t', '-V', '-e', '-q',
+                '--path', '--pool', '--truncLfwd', '--truncLrev', '--minLenF', '--minLenR',
+                '--maxLenF', '--maxLenR', '--minSampleFraction', '--minFoldParentOverAbundance']:
+        parser.add_argument(opt)
+    opts, unknown = parser.parse_known_args(args)
+    return opts
+
+
+def sampleName(path):
+    return os.path.basename(path).split('_')[0]
+
+
+def stubInput(opts):
+    """input.R: writes the selected file lists and reads the plotted files once"""
+    with open(opts.i) as f:
+        fns = [line.strip() for line in f if line.strip()]
+    fnFs = sorted(x for x in fns if 'pair1' in x)
+    fnRs = sorted(x for x in fns if 'pair2' in x)
+    with open(os.path.join(opts.o, 'selectedFilesF.txt'), 'w') as f:
+        f.write('\n'.join(fnFs) + '\n')
+    with open(os.path.join(opts.o, 'selectedFilesR.txt'), 'w') as f:
+        f.write('\n'.join(fnRs) + '\n')
+
+    # quality profile: mean quality per position
+    for path in (fnFs + fnRs)[:2 * int(opts.p or 0)]:
+        sums = Counter()
+        for record in fastq.readFastq(path):
+            for pos, q in enumerate(record.quality):
+                sums[pos] += q - 33
+
+
+def stubFiltering(opts):
+    """filtering.R: truncates reads, drops reads with N and writes filtered/ and filterReport.txt"""
+    with open(opts.f) as f:
+        fnFs = [line.strip() for line in f if line.strip()]
+    fnRs = []
+    if opts.r:
+        with open(opts.r) as f:
+            fnRs = [line.strip() for line in f if line.strip()]
+    truncF, truncR = int(opts.x), int(opts.y or 0)
+    filtPath = os.path.join(opts.o, 'filtered')
+    os.makedirs(filtPath, exist_ok=True)
+
+    report = []
+    for idx, fnF in enumerate(fnFs):
+        name = sampleName(fnF)
+        readsIn = readsOut = 0
+        outF = fastq.openFastq(os.path.join(filtPath, name + '_F_filt.fastq.gz'), 'wb')
+        outR = fastq.openFastq(os.path.join(filtPath, name + '_R_filt.fastq.gz'), 'wb') if fnRs else None
+        recordsR = fastq.readFastq(fnRs[idx]) if fnRs else None
+        for recF in fastq.readFastq(fnF):
+            recR = next(recordsR) if recordsR else None
+            readsIn += 1
+            seqF = recF.sequence[:truncF]
+            if len(seqF) < truncF or b'N' in seqF:
+                continue
+            if recR:
+                seqR = recR.sequence[:truncR]
+                if len(seqR) < truncR or b'N' in seqR:
+                    continue
+                fastq.writeRecord(outR, fastq.fastqRecord(recR.header, seqR, recR.quality[:truncR]))
+            fastq.writeRecord(outF, fastq.fastqRecord(recF.header, seqF, recF.quality[:truncF]))
+            readsOut += 1
+        outF.close()
+        if outR:
+            outR.close()
+        report.append((os.path.basename(fnF), readsIn, readsOut))
+
+    with open(os.path.join(opts.o, 'filterReport.txt'), 'w') as f:
+        f.write('reads.in\treads.out\n')
+        for name, readsIn, readsOut in report:
+            f.write('{}\t{}\t{}\n'.format(name, readsIn, readsOut))
+
+
+def writeSparseTable(outDir, samples, tables):
+    """writes the sparse export of seqTables.R for a list of Counters"""
+    totals = Counter()
+    for table in tables:
+        totals.update(table)
+    seqs = [seq for seq, count in totals.most_common()]
+    index = {seq: j for j, seq in enumerate(seqs)}
+    entries = [(i + 1, index[seq] + 1, c) for i, table in enumerate(tables) for seq, c in table.items()]
+    with open(os.path.join(outDir, 'seqTabClean_counts.mtx'), 'w') as f:
+        f.write('%%MatrixMarket matrix coordinate real general\n')
+        f.write('{} {} {}\n'.format(len(samples), len(seqs), len(entries)))
+        for entry in sorted(entries, key=lambda e: (e[1], e[0])):
+            f.write('{} {} {}\n'.format(*entry))
+    with open(os.path.join(outDir, 'seqTabClean_samples.txt'), 'w') as f:
+        f.write('\n'.join(samples) + '\n')
+    with open(os.path.join(outDir, 'seqTabClean_ASVs.fasta'), 'w') as f:
+        for j, seq in enumerate(seqs):
+            f.write('>ASV{}\n{}\n'.format(j + 1, seq.decode()))
+
+
+def stubInference(opts):
+    """inference.R: dereplicates filtered reads and writes tables and readReport.txt"""
+    files = sorted(os.listdir(opts.f))
+    filtFs = [os.path.join(opts.f, x) for x in files if '_F_' in x]
+    filtRs = [os.path.join(opts.f, x) for x in files if '_R_' in x]
+    samples = [sampleName(x) for x in filtFs]
+
+    tables, report = [], []
+    for idx, filtF in enumerate(filtFs):
+        derepF = Counter(record.sequence for record in fastq.readFastq(filtF))
+        if filtRs:
+            derepR = Counter(record.sequence for record in fastq.readFastq(filtRs[idx]))
+        merged = Counter()
+        records = zip(fastq.readFastq(filtF), fastq.readFastq(filtRs[idx])) if filtRs else \
+            ((record, None) for record in fastq.readFastq(filtF))
+        for recF, recR in records:
+            merged[recF.sequence + (recR.sequence[:10] if recR else b'')] += 1
+        tables.append(merged)
+        counts = [sum(derepF.values())] + ([sum(derepR.values())] if filtRs else [])
+        report.append(counts + [sum(merged.values())] * 2)
+
+    for name in ('mergedReads.RData', 'seqTabRaw.RData', 'seqTabClean.RData', 'errorRates.RData'):
+        open(os.path.join(opts.o, name), 'w').close()
+    writeSparseTable(opts.o, samples, tables)
+    with open(os.path.join(opts.o, 'readReport.txt'), 'w') as f:
+        header = ['denoisedF', 'denoisedR', 'merged', 'non-chimeras'] if filtRs else \
+            ['denoisedF', 'merged', 'non-chimeras']
+        f.write('\t'.join(header) + '\n')
+        for name, counts in zip(samples, report):
+            f.write('\t'.join([name] + [str(c) for c in counts]) + '\n')
+
+
+def stubTaxonomy(opts):
+    """taxonomy.R: writes a taxonomy table for the ASVs next to the input table"""
+    inDir = os.path.dirname(opts.i)
+    os.makedirs(opts.o, exist_ok=True)
+    with open(os.path.join(inDir, 'seqTabClean_ASVs.fasta')) as f:
+        asvs = [line[1:].strip() for line in f if line.startswith('>')]
+    with open(os.path.join(opts.o, 'seqTabClean_taxonomy.tsv'), 'w') as f:
+        f.write('ASV\tKingdom\tPhylum\tClass\tOrder\tFamily\tGenus\tSpecies\n')
+        for asv in asvs:
+            f.write(asv + '\tBacteria\tFirmicutes\tBacilli\t\t\t\t\n')
+    open(os.path.join(opts.o, 'taxonomyTable.RData'), 'w').close()
+
+
+STUBS = {
+    'input.R': stubInput,
+    'filtering.R': stubFiltering,
+    'inference.R': stubInference,
+    'taxonomy.R': stubTaxonomy,
+}
+
+
+if __name__ == '__main__':
+    script = os.path.basename(sys.argv[1])
+    if script == 'checkDADAVersion.R':
+        print('1.10.0')
+    elif script in STUBS:
+        STUBS[script](parseOptions(sys.argv[2:]))
+    else:
+        sys.exit('benchmarkStub: no stub for ' + script)
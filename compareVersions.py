@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+"""
+Comparison of DADA2 versions registered in versionsDADA2.txt.
+The same filtered reads (output of filtering.R, shared by all versions)
+are denoised by inference.R with each version, the versions run at the
+same time with an equal share of the cores. Each version writes into
+<output>/dada2_<version>. Runtime, CPU time and peak memory of each run
+and the differences of its sequence table and read report to the first
+version (the reference) are written to versionComparison.tsv; the
+per-sample differences go to versionComparison_samples.tsv.
+
+Usage:
+    python3 compareVersions.py -f <filtered folder> -o <output folder> -V 1.10.1,1.12.0
+                               [--pool 0] [--derep <folder>] [--compareOnly] [-t threads]
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import subprocess as sp
+from functools import partial
+
+import environment
+import pipeline
+import results
+
+
+SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+SUMMARY_NAME = 'versionComparison.tsv'
+SAMPLES_NAME = 'versionComparison_samples.tsv'
+
+
+def versionDir(outDir, version):
+    return os.path.join(outDir, 'dada2_' + version)
+
+
+def lastRun(ledger):
+    """Events of the last run of inference.R recorded in a ledger"""
+    events = pipeline.readLedger(ledger)
+    starts = [k for k, event in enumerate(events)
+              if event.get('event') == 'start' and event.get('stage') == 'inference']
+    return events[starts[-1]:] if starts else []
+
+
+def runResult(ledger):
+    """stageResult of the last run recorded in a ledger, for comparing the outputs of an earlier run"""
+    ends = [event for event in lastRun(ledger) if event.get('event') == 'end' and event.get('stage') == 'inference']
+    if not ends:
+        return None
+    return pipeline.stageResult(ends[-1]['returncode'], ends[-1]['wallTime'], ends[-1].get('cpuTime'),
+                                ends[-1].get('maxRSS'))
+
+
+def peakMemory(result, ledger):
+    """Peak resident memory (kB) of a run: of the child process where the platform
+    reports it, otherwise of the R steps recorded in the ledger"""
+    peaks = [event.get('maxRSS') for event in lastRun(ledger) if event.get('event') == 'step']
+    peaks = [x for x in peaks + [result.maxRSS if result else None] if x is not None]
+    return max(peaks) if peaks else None
+
+
+def runVersions(scriptPath, versions, filtered, outDir, threads=0, pool="0", derep=""):
+    """Denoises the filtered reads with every version concurrently and returns
+    a dict version: stageResult (None if the run failed)"""
+    budget = pipeline.coreBudget(threads or None)
+    share = max(1, budget.cores // len(versions))
+    runs = {}
+
+    def forward(version, event):
+        # progress of all versions is passed on, steps are told apart by version
+        if event['event'] == 'progress':
+            event = {k: v for k, v in event.items() if k not in ('event', 'received')}
+            event['step'] = '{} {}'.format(version, event.get('step'))
+            print(pipeline.PROGRESS_TAG + json.dumps(event), file=sys.stderr, flush=True)
+
+    def run(version):
+        buildCommand = partial(pipeline.denoiseCommand, scriptPath, version, filtered, versionDir(outDir, version),
+                               plots="0", pool=pool, derep=derep)
+        os.makedirs(versionDir(outDir, version), exist_ok=True)
+        try:
+            runs[version] = pipeline.scheduledCall(buildCommand, pipeline.ledgerPath(versionDir(outDir, version)),
+                                                   onEvent=partial(forward, version), requested=share,
+                                                   budget=budget)
+        except (sp.CalledProcessError, OSError) as e:
+            print('DADA2 {} failed: {}'.format(version, e), file=sys.stderr)
+            runs[version] = None
+
+    workers = [threading.Thread(target=run, args=(version,)) for version in versions]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return runs
+
+
+def sampleCounts(outDir):
+    """Sequence table of an output folder as dict sample: {sequence: count}"""
+    table = results.seqTable(outDir)
+    indptr, rows, counts = table.load()
+    samples, sequences = table.samples, table.sequences
+    tab = {sample: {} for sample in samples}
+    for j, seq in enumerate(sequences):
+        for i, c in zip(rows[indptr[j]:indptr[j + 1]], counts[indptr[j]:indptr[j + 1]]):
+            tab[samples[i]][seq] = c
+    table.close()
+    return tab
+
+
+def brayCurtis(a, b):
+    """Bray-Curtis dissimilarity of two samples given as {sequence: count}"""
+    total = sum(a.values()) + sum(b.values())
+    if total == 0:
+        return 0.0
+    return sum(abs(a.get(seq, 0) - b.get(seq, 0)) for seq in set(a) | set(b)) / total
+
+
+def compareTables(reference, other):
+    """Differences of the sequence table of other to reference (dicts of sampleCounts),
+    returns the summary and a dict sample: Bray-Curtis dissimilarity"""
+    totals = [{}, {}]
+    for tab, total in zip((reference, other), totals):
+        for counts in tab.values():
+            for seq, c in counts.items():
+                total[seq] = total.get(seq, 0) + c
+    refTotal, otherTotal = totals
+    shared = set(refTotal) & set(otherTotal)
+    reads = sum(otherTotal.values())
+
+    dissimilarity = {sample: brayCurtis(reference.get(sample, {}), other.get(sample, {}))
+                     for sample in sorted(set(reference) | set(other))}
+    summary = {
+        'samples': len(other),
+        'ASVs': len(otherTotal),
+        'reads': reads,
+        'shared ASVs': len(shared),
+        'new ASVs': len(otherTotal) - len(shared),
+        'lost ASVs': len(refTotal) - len(shared),
+        'reads in new ASVs': round(sum(c for seq, c in otherTotal.items() if seq not in shared) / reads, 4)
+        if reads else 0.0,
+        'mean Bray-Curtis': round(sum(dissimilarity.values()) / len(dissimilarity), 4) if dissimilarity else 0.0,
+        'max Bray-Curtis': round(max(dissimilarity.values()), 4) if dissimilarity else 0.0,
+    }
+    return summary, dissimilarity
+
+
+def compareReports(reference, other):
+    """Differences of the read reports (readReport.txt) of two output folders as
+    dict sample: {column: difference}, only columns found in both are compared and
+    counts missing in either report (NA) give no difference (None)"""
+    refHeader, refRows = results.projectResults(reference).readReport()
+    header, rows = results.projectResults(other).readReport()
+    columns = [x for x in header if x in refHeader]
+    differences = {}
+    for sample, counts in rows.items():
+        refCounts = refRows.get(sample, [0] * len(refHeader))
+        differences[sample] = {}
+        for col in columns:
+            count, refCount = counts[header.index(col)], refCounts[refHeader.index(col)]
+            differences[sample][col] = None if count is None or refCount is None else count - refCount
+    return differences
+
+
+def compareVersions(outDir, versions, runs=None):
+    """Compares the outputs of the versions to the first one and writes the reports,
+    returns the rows of the summary"""
+    reference = versions[0]
+    refCounts = sampleCounts(versionDir(outDir, reference))
+    summary, samples = [], {}
+    for version in versions:
+        folder = versionDir(outDir, version)
+        result = runs[version] if runs else runResult(pipeline.ledgerPath(folder))
+        row = {'version': version,
+               'wall time [s]': round(result.wallTime, 1) if result else None,
+               'CPU time [s]': round(result.cpuTime, 1) if result and result.cpuTime is not None else None,
+               'peak memory [kB]': peakMemory(result, pipeline.ledgerPath(folder))}
+        tableSummary, dissimilarity = compareTables(refCounts, refCounts if version == reference
+                                                    else sampleCounts(folder))
+        row.update(tableSummary)
+        reportDiff = compareReports(versionDir(outDir, reference), folder)
+        for col in sorted({c for diff in reportDiff.values() for c in diff}):
+            row['reads ' + col + ' diff'] = sum(diff.get(col) or 0 for diff in reportDiff.values())
+        summary.append(row)
+        for sample, value in dissimilarity.items():
+            samples.setdefault(sample, {})[version] = value
+
+    columns = list(dict.fromkeys(key for row in summary for key in row))
+    with open(os.path.join(outDir, SUMMARY_NAME), 'w') as f:
+        print('\t'.join(columns), file=f)
+        for row in summary:
+            print('\t'.join('NA' if row.get(col) is None else str(row[col]) for col in columns), file=f)
+    with open(os.path.join(outDir, SAMPLES_NAME), 'w') as f:
+        print('\t'.join(['sample'] + ['Bray-Curtis ' + v for v in versions[1:]]), file=f)
+        for sample in sorted(samples):
+            print('\t'.join([sample] + ['{:.4f}'.format(samples[sample].get(v, 1.0)) for v in versions[1:]]),
+                  file=f)
+    return summary
+
+
+def readSummary(outDir):
+    """Rows of the comparison summary of an output folder as list of dicts"""
+    with open(os.path.join(outDir, SUMMARY_NAME)) as f:
+        header = f.readline().rstrip('\n').split('\t')
+        return [dict(zip(header, line.rstrip('\n').split('\t'))) for line in f if line.strip()]
+
+
+def registeredVersions(scriptPath):
+    return [version for version, path, status in environment.readVersions(scriptPath)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-f', '--filtered', required=True, help='folder with filtered FASTQs')
+    parser.add_argument('-o', '--output', required=True, help='output folder')
+    parser.add_argument('-V', '--versions', required=True,
+                        help='comma separated DADA2 versions, the first is the reference')
+    parser.add_argument('--pool', default='0', help='pseudo-pooling prevalence passed to inference.R [%(default)s]')
+    parser.add_argument('--derep', default='', help='folder of dereplicated samples passed to inference.R')
+    parser.add_argument('--compareOnly', action='store_true', help='compare the outputs of an earlier run')
+    parser.add_argument('-t', '--threads', type=int, default=0, help='cores shared by the versions, 0 uses all')
+    args = parser.parse_args()
+
+    versions = list(dict.fromkeys(v.strip() for v in args.versions.split(',') if v.strip()))
+    unknown = [v for v in versions if v not in registeredVersions(SCRIPT_PATH)]
+    if len(versions) < 2:
+        sys.exit('At least two DADA2 versions are needed')
+    if unknown:
+        sys.exit('DADA2 versions not registered in versionsDADA2.txt: ' + ', '.join(unknown))
+
+    runs = None
+    if not args.compareOnly:
+        runs = runVersions(SCRIPT_PATH, versions, args.filtered, args.output, args.threads, args.pool, args.derep)
+        failed = [v for v in versions if runs[v] is None]
+        if failed:
+            sys.exit('Denoising failed with DADA2 ' + ', '.join(failed))
+
+    rows = compareVersions(args.output, versions, runs)
+    for row in rows:
+        print(', '.join('{}: {}'.format(key, value) for key, value in row.items()))
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+"""
+Dereplication of filtered FASTQ files for inference.R (--derep).
+The reads of a file are hashed into a compact store: unique sequences are
+keyed by their 2-bit encoding, abundances are kept in an array and the
+quality scores of each unique sequence are summed position by position.
+Every read is mapped to its unique sequence, as mergePairs needs the map.
+Files are dereplicated in parallel processes and written as
+<sample>_F_derep.bin / <sample>_R_derep.bin next to each other; derep.R
+reads them as derep-class objects of dada2 (uniques, quals, map).
+
+Usage:
+    python3 derep.py -i <folder with filtered FASTQs> -o <output folder> [-t threads]
+
+File layout (little endian):
+    8 bytes      magic DADADRP1
+    int32 x 3    number of unique sequences (U), reads (R), max. sequence length (L)
+    int32 x U    sequence lengths, by decreasing abundance
+    int32 x U    abundances
+    bytes        sequences (ASCII), concatenated
+    float64 x UL mean quality scores, column-major U x L matrix, NaN past the sequence end
+    int32 x R    unique sequence (1-based) of each read, in file order
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import struct
+import argparse
+import multiprocessing
+from array import array
+
+import fastq
+import pipeline
+
+
+MAGIC = b'DADADRP1'
+SUFFIX = '_derep.bin'
+ENCODE = bytes.maketrans(b'ACGTacgt', b'01230123')
+BASES = [''.join('ACGT'[(x >> shift) & 3] for shift in (6, 4, 2, 0)) for x in range(256)]
+LANE = 4  # bytes per position of the quality sums, enough for 34 million reads of one sequence
+PHRED_OFFSET = 33
+
+
+def encode(sequence):
+    """2-bit encoding of a sequence as int, a leading 1 marks its length.
+    Sequences with other letters than ACGT are kept as they are."""
+    try:
+        return int(b'1' + sequence.translate(ENCODE), 4)
+    except ValueError:
+        return sequence
+
+
+def decode(key):
+    """Sequence of a key returned by encode"""
+    if isinstance(key, bytes):
+        return key.decode()
+    length = (key.bit_length() - 1) // 2
+    if length == 0:
+        return ''
+    value = key - (1 << 2 * length)
+    bases = ''.join(BASES[x] for x in value.to_bytes((2 * length + 7) // 8, 'big'))
+    return bases[-length:]
+
+
+def qualityLanes(quality):
+    """Quality string as int with one LANE-byte lane per position, so sums of these
+    ints are sums of the quality scores at each position"""
+    lanes = bytearray(LANE * len(quality))
+    lanes[LANE - 1::LANE] = quality
+    return int.from_bytes(lanes, 'big')
+
+
+class derepStore(object):
+    """Unique sequences of a FASTQ file with their abundances, quality sums and the read map"""
+
+    def __init__(self):
+        """Constructor for derepStore class"""
+        self.index = {}
+        self.keys = []
+        self.lengths = array('i')
+        self.abundances = array('i')
+        self.qualSums = []
+        self.map = array('i')
+
+    def add(self, sequence, quality):
+        key = encode(sequence)
+        idx = self.index.get(key)
+        if idx is None:
+            idx = len(self.keys)
+            self.index[key] = idx
+            self.keys.append(key)
+            self.lengths.append(len(sequence))
+            self.abundances.append(0)
+            self.qualSums.append(0)
+        self.abundances[idx] += 1
+        self.qualSums[idx] += qualityLanes(quality)
+        self.map.append(idx)
+
+    def meanQualities(self, idx):
+        """Mean quality score at each position of a unique sequence"""
+        length, abundance = self.lengths[idx], self.abundances[idx]
+        sums = struct.unpack('>{}I'.format(length), self.qualSums[idx].to_bytes(LANE * length, 'big'))
+        return [s / abundance - PHRED_OFFSET for s in sums]
+
+    def write(self, path):
+        """Writes the store sorted by decreasing abundance, ties keep the order of first occurrence"""
+        n = len(self.keys)
+        order = sorted(range(n), key=lambda i: -self.abundances[i])
+        rank = array('i', bytes(4 * n))
+        for newIdx, idx in enumerate(order):
+            rank[idx] = newIdx + 1
+        maxLen = max(self.lengths) if n else 0
+
+        lengths = array('i', (self.lengths[i] for i in order))
+        abundances = array('i', (self.abundances[i] for i in order))
+        quals = array('d', [math.nan]) * (n * maxLen)
+        for newIdx, idx in enumerate(order):
+            length = self.lengths[idx]
+            quals[newIdx:newIdx + n * length:n] = array('d', self.meanQualities(idx))
+        readMap = array('i', (rank[i] for i in self.map))
+
+        for values in (lengths, abundances, quals, readMap):
+            if sys.byteorder == 'big':
+                values.byteswap()
+        with open(path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<3i', n, len(self.map), maxLen))
+            f.write(lengths.tobytes())
+            f.write(abundances.tobytes())
+            f.write(''.join(decode(self.keys[i]) for i in order).encode())
+            f.write(quals.tobytes())
+            f.write(readMap.tobytes())
+
+
+def outputName(fastqPath):
+    """<sample>_F_filt.fastq.gz -> <sample>_F_derep.bin"""
+    name = os.path.basename(fastqPath)
+    return re.sub(r'(_filt)?\.(fastq|fq)(\.gz)?$', '', name) + SUFFIX
+
+
+def derepFile(task):
+    """Dereplicates one FASTQ file, returns its number of reads"""
+    fastqPath, outPath = task
+    store = derepStore()
+    for record in fastq.readFastq(fastqPath):
+        store.add(record.sequence, record.quality)
+    store.write(outPath)
+    return len(store.map)
+
+
+def derepFolder(inDir, outDir, threads=0):
+    """Dereplicates all FASTQ files of a folder in parallel processes and reports progress"""
+    os.makedirs(outDir, exist_ok=True)
+    files = sorted(x for x in os.listdir(inDir) if re.search(r'\.(fastq|fq)(\.gz)?$', x))
+    tasks = [(os.path.join(inDir, x), os.path.join(outDir, outputName(x))) for x in files]
+    processes = max(1, min(threads or os.cpu_count() or 1, len(tasks)))
+
+    def progress(i, reads):
+        print(pipeline.PROGRESS_TAG + json.dumps({'stage': 'derep', 'step': 'derep', 'i': i, 'n': len(tasks),
+                                                  'reads': reads}), file=sys.stderr, flush=True)
+
+    progress(0, 0)
+    with multiprocessing.Pool(processes) as pool:
+        for i, reads in enumerate(pool.imap_unordered(derepFile, tasks)):
+            progress(i + 1, reads)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-i', '--input', required=True, help='folder with filtered FASTQ files')
+    parser.add_argument('-o', '--output', required=True, help='output folder')
+    parser.add_argument('-t', '--threads', type=int, default=0, help='parallel processes, 0 uses all cores')
+    args = parser.parse_args()
+    derepFolder(args.input, args.output, args.threads)
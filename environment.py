@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+"""
+Detection of the environment the pipeline runs in: location of Rscript,
+registered DADA2 installations (versionsDADA2.txt) and installed taxonomy
+databases. The result is cached as environmentProfile.json in the
+installation directory and reused as long as the modification times
+of the inspected files and directories are unchanged.
+"""
+
+import os
+import re
+import csv
+import json
+import shutil
+import subprocess as sp
+
+
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+PROFILE_NAME = 'environmentProfile.json'
+VERSION_FILE = 'versionsDADA2.txt'
+
+# files a database folder has to contain (matched as part of the file names)
+DATABASES = {
+    'silva': ('train_set', 'species'),
+    'rdp': ('train_set', 'species'),
+    'gg': ('train_set',),
+    'unite': ('general_release',),
+}
+
+
+def versionKey(version):
+    """Sort key for version strings like 1.10.0"""
+    return tuple(int(x) if x.isdigit() else 0 for x in re.split(r'[.-]', version))
+
+
+def watchedPaths(scriptPath, rscript):
+    """Paths whose modification times decide whether a cached profile is still valid"""
+    paths = [os.path.join(scriptPath, VERSION_FILE), os.path.join(scriptPath, 'taxonomy')]
+    paths += [os.path.join(scriptPath, 'taxonomy', db) for db in DATABASES]
+    if rscript:
+        paths.append(rscript)
+    return paths
+
+
+def fingerprint(paths):
+    """Modification times of paths, None for missing paths"""
+    stamps = {}
+    for path in paths:
+        try:
+            stamps[path] = os.stat(path).st_mtime
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+def checkDatabases(scriptPath):
+    """Checks if database folders exist and if they contain the necessary files"""
+    installed = {}
+    for db, patterns in DATABASES.items():
+        dbPath = os.path.join(scriptPath, 'taxonomy', db)
+        files = os.listdir(dbPath) if os.path.isdir(dbPath) else []
+        installed[db] = all(any(pattern in file for file in files) for pattern in patterns)
+    return installed
+
+
+def readVersions(scriptPath):
+    """Returns the registered DADA2 installations as list of (version, path, status)"""
+    with open(os.path.join(scriptPath, VERSION_FILE), 'r') as f:
+        next(f)  # skip headers
+        return [tuple(row) for row in csv.reader(f, delimiter='\t') if len(row) == 3]
+
+
+def writeVersionFile(scriptPath, rscript):
+    """
+    Calls R to check for a DADA2 installation and writes it to a new versions file.
+    Returns "no R" if R could not be called, "none installed" if DADA2 was not found
+    and the detected version otherwise.
+    """
+    if rscript is None:
+        return "no R"
+    try:
+        checkData = sp.check_output([rscript, os.path.join(scriptPath, 'checkDADAVersion.R')],
+                                    stderr=sp.STDOUT).decode(errors='replace')
+    except (OSError, sp.CalledProcessError):
+        return "no R"
+
+    if "none installed" in checkData:
+        return "none installed"
+    match = re.search(r"[0-9]+\.[0-9]+\.[0-9]+", checkData)
+    if match is None:
+        return "no R"
+
+    with open(os.path.join(scriptPath, VERSION_FILE), 'w', newline='') as csvfile:
+        versionWriter = csv.writer(csvfile, dialect=csv.excel_tab)
+        versionWriter.writerow(["version", "path", "status"])
+        versionWriter.writerow([match.group(), "[default]", "stable"])
+    return match.group()
+
+
+def detectEnvironment(scriptPath=SCRIPT_DIRECTORY):
+    """Inspects the environment, writes the profile cache and returns the profile.
+    The versions file is created by calling R if it is missing."""
+    rscript = shutil.which('Rscript')
+    profile = {'rscript': rscript, 'status': 'ok'}
+
+    if not os.path.isfile(os.path.join(scriptPath, VERSION_FILE)):
+        status = writeVersionFile(scriptPath, rscript)
+        if status in ("no R", "none installed"):
+            profile['status'] = status
+            return profile
+
+    profile['versions'] = readVersions(scriptPath)
+    profile['databases'] = checkDatabases(scriptPath)
+    profile['fingerprint'] = fingerprint(watchedPaths(scriptPath, rscript))
+
+    try:
+        tmpPath = os.path.join(scriptPath, PROFILE_NAME + '.tmp')
+        with open(tmpPath, 'w') as f:
+            json.dump(profile, f, indent=1)
+        os.replace(tmpPath, os.path.join(scriptPath, PROFILE_NAME))
+    except OSError:
+        pass  # read-only installations work without cache
+    return profile
+
+
+def loadProfile(scriptPath=SCRIPT_DIRECTORY):
+    """Returns the cached profile if it is still valid, None otherwise"""
+    try:
+        with open(os.path.join(scriptPath, PROFILE_NAME), 'r') as f:
+            profile = json.load(f)
+        stamps = profile['fingerprint']
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if fingerprint(stamps.keys()) != stamps:
+        return None
+    # Rscript moved or was installed since the profile was written
+    if profile['rscript'] is None or profile['rscript'] not in stamps:
+        return None
+    profile['versions'] = [tuple(v) for v in profile['versions']]
+    return profile
+
+
+def getProfile(scriptPath=SCRIPT_DIRECTORY):
+    """Returns the cached profile, detecting the environment again if the cache is stale"""
+    return loadProfile(scriptPath) or detectEnvironment(scriptPath)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Minimal stand-in for a batch scheduler, used to test the batch backend
+of backends.py without a cluster. Jobs are run as detached processes of
+the local machine, their ids and process ids are kept in the folder given
+by FAKE_SCHEDULER_DIR (default: fakeScheduler in the temporary directory).
+
+    python3 fakeScheduler.py submit <job script>   prints the job id
+    python3 fakeScheduler.py status <job id>       prints RUNNING while the job runs
+    python3 fakeScheduler.py cancel <job id>
+
+backends.json for the fake scheduler:
+    "submit": ["python3", "fakeScheduler.py", "submit"],
+    "status": ["python3", "fakeScheduler.py", "status", "{job}"],
+    "cancel": ["python3", "fakeScheduler.py", "cancel", "{job}"]
+"""
+
+import os
+import sys
+import signal
+import tempfile
+import subprocess as sp
+
+
+STATE_DIR = os.environ.get('FAKE_SCHEDULER_DIR', os.path.join(tempfile.gettempdir(), 'fakeScheduler'))
+
+
+def pidFile(jobId):
+    return os.path.join(STATE_DIR, '{}.pid'.format(jobId))
+
+
+def submit(script):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    # job ids are taken by creating the pid file exclusively
+    jobId = len(os.listdir(STATE_DIR)) + 1
+    while True:
+        try:
+            fd = os.open(pidFile(jobId), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            jobId += 1
+    process = sp.Popen(['/bin/sh', script], stdin=sp.DEVNULL, stdout=sp.DEVNULL, stderr=sp.DEVNULL,
+                       start_new_session=True)
+    os.write(fd, str(process.pid).encode())
+    os.close(fd)
+    print('Submitted batch job {}'.format(jobId))
+
+
+def running(jobId):
+    """Process id of a running job, None if it finished"""
+    try:
+        with open(pidFile(jobId)) as f:
+            pid = int(f.read())
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return None
+    # finished jobs stay zombies until reaped by init, these count as finished
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            if f.read().rsplit(')', 1)[1].split()[0] == 'Z':
+                return None
+    except OSError:
+        pass
+    return pid
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] not in ('submit', 'status', 'cancel'):
+        sys.exit(__doc__)
+    command, argument = sys.argv[1:]
+    if command == 'submit':
+        submit(argument)
+    elif command == 'status':
+        if running(argument):
+            print('RUNNING')
+    elif command == 'cancel':
+        pid = running(argument)
+        if pid:
+            os.killpg(pid, signal.SIGTERM)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+"""
+Helper functions for streaming FASTQ files.
+Plain and gzip compressed files are supported, compression
+is detected from the file content rather than the file name.
+"""
+
+import gzip
+from collections import namedtuple
+
+
+fastqRecord = namedtuple('fastqRecord', ['header', 'sequence', 'quality'])
+
+
+def isGzip(path):
+    with open(path, 'rb') as f:
+        return f.read(2) == b'\x1f\x8b'
+
+
+def openFastq(path, mode='rb'):
+    """Opens a FASTQ file for reading ('rb') or writing ('wb'),
+    written files are compressed if their name ends with .gz"""
+    if 'r' in mode:
+        return gzip.open(path, mode) if isGzip(path) else open(path, mode)
+    return gzip.open(path, mode, compresslevel=4) if str(path).endswith('.gz') else open(path, mode)
+
+
+def readFastq(path):
+    """Yields fastqRecord tuples of bytes (without line breaks) from a FASTQ file"""
+    with openFastq(path) as f:
+        while True:
+            header = f.readline()
+            if not header:
+                return
+            sequence = f.readline()
+            f.readline()
+            quality = f.readline()
+            yield fastqRecord(header.rstrip(b'\r\n'), sequence.rstrip(b'\r\n'), quality.rstrip(b'\r\n'))
+
+
+def writeRecord(f, record):
+    f.write(record.header + b'\n' + record.sequence + b'\n+\n' + record.quality + b'\n')
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+
+"""
+Record-offset index for FASTQ files, for random access to reads.
+The index is built in one pass and kept as sidecar file <FASTQ>.fqi,
+it is rebuilt when size or modification time of the FASTQ changed.
+It holds the uncompressed offset of every STRIDE-th read and, for gzip
+files, the start of each gzip member. Plain files and multi-member gzip
+files (BGZF as written by bgzip, or by bgzipFile here) are seekable, so
+reading read k, n random reads or a chunk of reads costs time in proportion
+to the reads returned. Single-member gzip files are decompressed from the
+start up to the requested reads, but not parsed.
+
+Usage from the command line:
+    python3 fastqIndex.py index <FASTQ files>
+    python3 fastqIndex.py subsample (-n reads | --bases bases) -o <folder> [-t threads] <FASTQ files>
+    python3 fastqIndex.py bgzip -o <folder> <FASTQ files>
+"""
+
+import os
+import sys
+import json
+import math
+import zlib
+import random
+import struct
+import argparse
+import multiprocessing
+from array import array
+from bisect import bisect_right
+
+import fastq
+import pipeline
+
+
+MAGIC = b'DADAFQI1'
+SUFFIX = '.fqi'
+STRIDE = 32
+HEADER = struct.Struct('<8sQdQIQQ')
+READ_SIZE = 1 << 20
+BGZF_BLOCK = 65280  # uncompressed bytes per BGZF block, as used by htslib
+BGZF_EOF = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def inflateMembers(path, coffset=0):
+    """Yields (compressed offset of the member, decompressed data) of the gzip members
+    of a file from coffset on, in pieces"""
+    inflater = zlib.decompressobj(31)
+    memberStart = consumed = coffset
+    with open(path, 'rb') as f:
+        f.seek(coffset)
+        for chunk in iter(lambda: f.read(READ_SIZE), b''):
+            while chunk:
+                data = inflater.decompress(chunk)
+                if data:
+                    yield memberStart, data
+                if inflater.eof:
+                    consumed += len(chunk) - len(inflater.unused_data)
+                    chunk = inflater.unused_data
+                    memberStart = consumed
+                    inflater = zlib.decompressobj(31)
+                else:
+                    consumed += len(chunk)
+                    chunk = b''
+
+
+def readPlain(path, offset=0):
+    """Yields (0, data) pieces of a plain file from offset on"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for data in iter(lambda: f.read(READ_SIZE), b''):
+            yield 0, data
+
+
+class pieceReader(object):
+    """readline() over (member, data) pieces starting at uncompressed offset position"""
+
+    def __init__(self, pieces, skip=0, position=0):
+        """Constructor for pieceReader class, the first skip bytes are dropped"""
+        self.pieces = pieces
+        self.buffer = b''
+        self.pos = 0
+        self.position = position - skip
+        self.skip(skip)
+
+    def fill(self):
+        try:
+            member, data = next(self.pieces)
+        except StopIteration:
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def skip(self, n):
+        """Drops n bytes without parsing them"""
+        while n > 0:
+            if self.pos == len(self.buffer) and not self.fill():
+                break
+            dropped = min(n, len(self.buffer) - self.pos)
+            self.pos += dropped
+            self.position += dropped
+            n -= dropped
+
+    def readline(self):
+        while True:
+            end = self.buffer.find(b'\n', self.pos)
+            if end >= 0:
+                line = self.buffer[self.pos:end + 1]
+            elif not self.fill():
+                line = self.buffer[self.pos:]
+            else:
+                continue
+            self.pos += len(line)
+            self.position += len(line)
+            return line
+
+    def readRecord(self):
+        """Next record, raises ValueError if the reader is not at the start of a complete record
+        (e.g. at an offset of a stale or damaged index)"""
+        start = self.position
+        header = self.readline()
+        if not header:
+            return None
+        sequence, plus, quality = (self.readline().rstrip(b'\r\n') for k in range(3))
+        if not header.startswith(b'@') or not plus.startswith(b'+') or len(sequence) != len(quality):
+            raise ValueError('No FASTQ record at offset {}'.format(start))
+        return fastq.fastqRecord(header.rstrip(b'\r\n'), sequence, quality)
+
+
+class fastqIndex(object):
+    """Random access to the reads of a FASTQ file through its index"""
+
+    def __init__(self, path, nReads, stride, members, offsets):
+        """Constructor for fastqIndex class, use loadIndex or buildIndex to get one"""
+        self.path = path
+        self.nReads = nReads
+        self.stride = stride
+        self.gzip = len(members) > 0
+        self.coffsets = members[0::2]
+        self.ustarts = members[1::2]
+        self.offsets = offsets
+
+    def __len__(self):
+        return self.nReads
+
+    def seekable(self):
+        """True if reads can be reached without decompressing the file from its start"""
+        return not self.gzip or len(self.coffsets) > 1
+
+    def open(self, uoffset):
+        """Returns a pieceReader positioned at an uncompressed offset"""
+        if not self.gzip:
+            return pieceReader(readPlain(self.path, uoffset), position=uoffset)
+        member = max(0, bisect_right(self.ustarts, uoffset) - 1)
+        return pieceReader(inflateMembers(self.path, self.coffsets[member]), uoffset - self.ustarts[member],
+                           uoffset)
+
+    def reads(self, start=0, count=None):
+        """Yields count reads (all remaining by default) from read start on"""
+        count = self.nReads - start if count is None else min(count, self.nReads - start)
+        if count <= 0:
+            return
+        block = start // self.stride
+        reader = self.open(self.offsets[block])
+        for skipped in range(start - block * self.stride):
+            reader.readRecord()
+        for k in range(count):
+            yield reader.readRecord()
+
+    def getRead(self, k):
+        """Read k (0-based) as fastqRecord"""
+        if not 0 <= k < self.nReads:
+            raise IndexError('read {} of {} reads'.format(k, self.nReads))
+        return next(self.reads(k, 1))
+
+    def subsample(self, n, seed=None):
+        """n reads drawn at random without replacement, in file order"""
+        picks = sorted(random.Random(seed).sample(range(self.nReads), min(n, self.nReads)))
+        records = []
+        reader, position = None, None
+        seekable = self.seekable()
+        for k in picks:
+            block = k // self.stride
+            # continue reading if the pick lies in the current or the next block
+            if reader is None:
+                reader = self.open(self.offsets[block])
+                position = block * self.stride
+            elif block > position // self.stride + 1:
+                if seekable:
+                    reader = self.open(self.offsets[block])
+                else:
+                    reader.skip(self.offsets[block] - reader.position)
+                position = block * self.stride
+            while position < k:
+                reader.readRecord()
+                position += 1
+            records.append(reader.readRecord())
+            position += 1
+        return records
+
+    def chunks(self, n):
+        """Splits the reads into at most n ranges (start, count) starting at indexed reads,
+        each of them can be read on its own with reads(start, count)"""
+        bounds = sorted(set(min(self.nReads, round(i * self.nReads / n) // self.stride * self.stride)
+                            for i in range(n + 1)) | {self.nReads})
+        return [(a, b - a) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def indexPath(path):
+    return str(path) + SUFFIX
+
+
+def buildIndex(path, stride=STRIDE):
+    """Scans a FASTQ file, writes its index next to it (if possible) and returns it"""
+    gzip = fastq.isGzip(path)
+    stat = os.stat(path)
+    members = array('Q')
+    offsets = array('Q')
+    lines, uabs, lastMember, lastByte = 0, 0, None, b'\n'
+    recordLines = 4 * stride
+
+    for member, data in (inflateMembers(path) if gzip else readPlain(path)):
+        if gzip and member != lastMember:
+            members.extend((member, uabs))
+            lastMember = member
+        if lines % recordLines == 0 and lastByte == b'\n':
+            offsets.append(uabs)
+        pos = data.find(b'\n')
+        while pos >= 0:
+            lines += 1
+            if lines % recordLines == 0 and pos + 1 < len(data):
+                offsets.append(uabs + pos + 1)
+            pos = data.find(b'\n', pos + 1)
+        uabs += len(data)
+        lastByte = data[-1:]
+
+    if uabs > 0 and lastByte != b'\n':
+        lines += 1  # last line without line break
+    nReads = (lines + 3) // 4
+    del offsets[(nReads + stride - 1) // stride:]
+
+    index = fastqIndex(path, nReads, stride, members, offsets)
+    try:
+        with open(indexPath(path), 'wb') as f:
+            f.write(HEADER.pack(MAGIC, stat.st_size, stat.st_mtime, nReads, stride, len(members) // 2,
+                                len(offsets)))
+            for values in (members, offsets):
+                if sys.byteorder == 'big':
+                    values = array('Q', values)
+                    values.byteswap()
+                f.write(values.tobytes())
+    except OSError:
+        pass  # read-only folders work without sidecar
+    return index
+
+
+def loadIndex(path, stride=STRIDE):
+    """Returns the index of a FASTQ file, built if there is no valid sidecar"""
+    try:
+        with open(indexPath(path), 'rb') as f:
+            magic, size, mtime, nReads, fileStride, nMembers, nOffsets = HEADER.unpack(f.read(HEADER.size))
+            stat = os.stat(path)
+            if magic != MAGIC or size != stat.st_size or mtime != stat.st_mtime:
+                raise ValueError('index outdated')
+            members, offsets = array('Q'), array('Q')
+            members.frombytes(f.read(16 * nMembers))
+            offsets.frombytes(f.read(8 * nOffsets))
+    except (OSError, ValueError, struct.error):
+        return buildIndex(path, stride)
+    if sys.byteorder == 'big':
+        members.byteswap()
+        offsets.byteswap()
+    return fastqIndex(path, nReads, fileStride, members, offsets)
+
+
+def bgzipFile(path, outPath):
+    """Writes a FASTQ file as BGZF (blocked gzip readable by any gzip reader) so it is seekable"""
+    with fastq.openFastq(path) as f, open(outPath, 'wb') as out:
+        while True:
+            data = f.read(BGZF_BLOCK)
+            if not data:
+                break
+            deflater = zlib.compressobj(4, zlib.DEFLATED, -15)
+            payload = deflater.compress(data) + deflater.flush()
+            out.write(b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' +
+                      struct.pack('<H', len(payload) + 25) + payload +
+                      struct.pack('<II', zlib.crc32(data), len(data)))
+        out.write(BGZF_EOF)
+
+
+def subsampleName(path):
+    """Name of the subsample of a FASTQ file: the file name without .gz"""
+    name = os.path.basename(path)
+    return name[:-3] if name.endswith('.gz') else name
+
+
+def subsampleFile(task):
+    """Writes the random subsample of one FASTQ file, returns its number of reads"""
+    path, outDir, reads, bases, seed = task
+    def draw(index):
+        count = reads
+        if count is None:
+            meanLength = len(index.getRead(0).sequence) if len(index) else 1
+            count = math.ceil(bases / max(1, meanLength))
+        return index.subsample(count, seed)
+
+    try:
+        records = draw(loadIndex(path))
+    except ValueError:
+        # offsets of a stale index do not point at records, the index is built again
+        records = draw(buildIndex(path))
+    with open(os.path.join(outDir, subsampleName(path)), 'wb') as out:
+        for record in records:
+            fastq.writeRecord(out, record)
+    return len(records)
+
+
+def subsampleFiles(paths, outDir, reads=None, bases=None, seed=42, threads=0):
+    """Writes random subsamples of FASTQ files as plain FASTQ files into outDir, drawing
+    either a number of reads or of bases (estimated from the first read) from each file.
+    Files are indexed and sampled in parallel processes."""
+    os.makedirs(outDir, exist_ok=True)
+    tasks = [(path, outDir, reads, bases, seed) for path in paths]
+    processes = max(1, min(threads or os.cpu_count() or 1, len(tasks)))
+
+    def progress(i, count):
+        print(pipeline.PROGRESS_TAG + json.dumps({'stage': 'subsample', 'step': 'subsample', 'i': i, 'n': len(tasks),
+                                                  'reads': count}), file=sys.stderr, flush=True)
+
+    progress(0, 0)
+    with multiprocessing.Pool(processes) as pool:
+        for i, count in enumerate(pool.imap_unordered(subsampleFile, tasks)):
+            progress(i + 1, count)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    commands = parser.add_subparsers(dest='command')
+    indexParser = commands.add_parser('index', help='build the indexes of FASTQ files')
+    indexParser.add_argument('files', nargs='+')
+    sampleParser = commands.add_parser('subsample', help='write random subsamples of FASTQ files')
+    sampleParser.add_argument('files', nargs='+')
+    sampleParser.add_argument('-o', '--output', required=True, help='output folder')
+    amount = sampleParser.add_mutually_exclusive_group(required=True)
+    amount.add_argument('-n', '--reads', type=int, help='reads per file')
+    amount.add_argument('--bases', type=float, help='bases per file')
+    sampleParser.add_argument('--seed', type=int, default=42, help='random seed [%(default)s]')
+    sampleParser.add_argument('-t', '--threads', type=int, default=0, help='parallel processes, 0 uses all cores')
+    bgzipParser = commands.add_parser('bgzip', help='write FASTQ files as seekable BGZF')
+    bgzipParser.add_argument('files', nargs='+')
+    bgzipParser.add_argument('-o', '--output', required=True, help='output folder')
+    args = parser.parse_args()
+
+    if args.command == 'index':
+        for path in args.files:
+            print('{}\t{}'.format(path, len(buildIndex(path))))
+    elif args.command == 'subsample':
+        subsampleFiles(args.files, args.output, args.reads, args.bases, args.seed, args.threads)
+    elif args.command == 'bgzip':
+        os.makedirs(args.output, exist_ok=True)
+        for path in args.files:
+            name = subsampleName(path) + '.gz'
+            bgzipFile(path, os.path.join(args.output, name))
+    else:
+        parser.print_help()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+
+"""
+Persistent queue of pipeline runs.
+Each job is a complete run of the pipeline on one project (folder with the
+paired FASTQ files, output folder, DADA2 version and the settings of each
+stage). Jobs are stored in an SQLite database in the installation directory
+(in ~/.dada2manager if the installation is read-only), so queued and
+unfinished jobs survive restarts of the GUI. Workers take jobs
+first come, first served and run their stages in order on the backend
+configured for each stage (backends.py), local stages of concurrently
+running jobs share the core budget.
+Stages finished before a restart are not run again.
+
+Usage from the command line:
+    python3 jobQueue.py add <FASTQ folder> <output folder> [-V version] [--settings file.json]
+    python3 jobQueue.py list
+    python3 jobQueue.py work [--workers 2]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import subprocess as sp
+from datetime import datetime
+
+import backends
+import pipeline
+
+
+SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+DATABASE_NAME = 'jobQueue.sqlite'
+USER_DATABASE = os.path.join(os.path.expanduser('~'), '.dada2manager', DATABASE_NAME)
+
+STAGES = ['input', 'trimming', 'filtering', 'derep', 'inference', 'chimera', 'taxonomy', 'tree']
+
+# settings used for stage options not given when adding a job
+DEFAULTS = {
+    'input': {'plots': 2},
+    'trimming': {'errorRate': 0.1, 'discardUntrimmed': True},
+    'filtering': {'truncRfwd': 240, 'truncRrev': 200, 'maxError': 2},
+    'inference': {'plots': 0, 'pool': 0, 'sparse': False},
+    'derep': {},
+    'chimera': {},
+    'taxonomy': {'database': 'silva', 'phyloseq': True},
+    'tree': {'method': 'auto', 'refine': False},
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    inputDir TEXT NOT NULL,
+    outDir TEXT NOT NULL,
+    version TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    created TEXT NOT NULL,
+    started TEXT,
+    finished TEXT
+);
+CREATE TABLE IF NOT EXISTS stages (
+    job INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    detail TEXT,
+    started TEXT,
+    finished TEXT,
+    returncode INTEGER,
+    PRIMARY KEY (job, stage)
+);
+"""
+
+
+def now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def workerId():
+    """Identifies the workers of this process: host and pid"""
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+def processAlive(worker):
+    """Checks if the process of a worker id of this host is still running"""
+    host, _, pid = (worker or '').rpartition(':')
+    if host != workerId().rpartition(':')[0]:
+        return True  # workers of other hosts cannot be checked
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def stageCommand(stage, scriptPath, job, threads):
+    """Command line of a stage of a job, paths between stages are the defaults of the GUI"""
+    outDir = job['outDir']
+    settings = dict(DEFAULTS[stage], **job['settings'].get(stage, {}))
+    if stage == 'input':
+        return pipeline.inputCommand(scriptPath, job['version'], os.path.join(outDir, 'inputPaths.txt'),
+                                     outDir, settings['plots'])
+    if stage == 'trimming':
+        # the primers (primerF, primerR) have no defaults and are part of the job settings
+        return pipeline.trimCommand(scriptPath,
+                                    forward=os.path.join(outDir, 'selectedFilesF.txt'),
+                                    reverse=os.path.join(outDir, 'selectedFilesR.txt'),
+                                    outDir=outDir, threads=threads, **settings)
+    if stage == 'filtering':
+        # with a trimming stage, its trimmed reads are filtered
+        lists = 'trimmedFiles' if 'trimming' in job['stages'] else 'selectedFiles'
+        return pipeline.filterCommand(scriptPath, job['version'],
+                                      forward=os.path.join(outDir, lists + 'F.txt'),
+                                      reverse=os.path.join(outDir, lists + 'R.txt'),
+                                      outDir=outDir, threads=threads, **settings)
+    if stage == 'inference':
+        # with a chimera stage of its own, inference.R skips chimera removal
+        derep = 'derep' in job['stages'] or job['settings'].get('filtering', {}).get('derep', False)
+        return pipeline.denoiseCommand(scriptPath, job['version'], os.path.join(outDir, 'filtered'), outDir,
+                                       chimera='chimera' in job['stages'], threads=threads,
+                                       derep=os.path.join(outDir, 'derep') if derep else "", **settings)
+    if stage == 'derep':
+        return pipeline.derepCommand(scriptPath, os.path.join(outDir, 'filtered'), outDir, threads=threads)
+    if stage == 'chimera':
+        return pipeline.chimeraCommand(scriptPath, job['version'], os.path.join(outDir, 'seqTabRaw.RData'),
+                                       outDir, threads=threads, **settings)
+    if stage == 'taxonomy':
+        return pipeline.taxonomyCommand(scriptPath, job['version'], os.path.join(outDir, 'seqTabClean.RData'),
+                                        os.path.join(outDir, 'taxonomy'), threads=threads, **settings)
+    if stage == 'tree':
+        # the tree is added to the phyloseq object of the taxonomy stage
+        return pipeline.treeCommand(scriptPath, os.path.join(outDir, 'seqTabClean.RData'),
+                                    os.path.join(outDir, 'taxonomy'), threads=threads, **settings)
+    raise ValueError('Unknown stage: ' + stage)
+
+
+class jobQueue(object):
+    """Access to the job database, every thread uses a connection of its own"""
+
+    def __init__(self, path=None):
+        """Constructor for jobQueue class, the database defaults to the installation directory"""
+        self.path = path or os.path.join(SCRIPT_PATH, DATABASE_NAME)
+        self.local = threading.local()
+        with self.connect() as db:
+            db.executescript(SCHEMA)
+
+    def connect(self):
+        if not hasattr(self.local, 'db'):
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.row_factory = sqlite3.Row
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA foreign_keys=ON')
+            self.local.db = db
+        return self.local.db
+
+    def add(self, inputDir, outDir, version, settings=None, stages=None, name=None):
+        """Queues a pipeline run and returns its job id"""
+        stages = [s for s in STAGES if s in (stages or ['input', 'filtering', 'inference', 'taxonomy'])]
+        settings = dict(settings or {}, stages=stages)
+        db = self.connect()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            jobId = db.execute('INSERT INTO jobs (name, inputDir, outDir, version, settings, created) '
+                               'VALUES (?, ?, ?, ?, ?, ?)',
+                               (name or os.path.basename(os.path.normpath(outDir)), os.path.abspath(inputDir),
+                                os.path.abspath(outDir), version, json.dumps(settings), now())).lastrowid
+            db.executemany('INSERT INTO stages (job, position, stage) VALUES (?, ?, ?)',
+                           [(jobId, k, stage) for k, stage in enumerate(stages)])
+        return jobId
+
+    def jobs(self):
+        """Returns all jobs as list of dicts, each with the list of its stages"""
+        db = self.connect()
+        stages = {}
+        for row in db.execute('SELECT * FROM stages ORDER BY job, position'):
+            stages.setdefault(row['job'], []).append(dict(row))
+        return [dict(row, stages=stages.get(row['id'], [])) for row in db.execute('SELECT * FROM jobs ORDER BY id')]
+
+    def job(self, jobId):
+        row = self.connect().execute('SELECT * FROM jobs WHERE id = ?', (jobId,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['settings'] = json.loads(job['settings'])
+        job['stages'] = job['settings'].pop('stages')
+        return job
+
+    def claim(self, worker):
+        """Marks the oldest queued job as running by worker and returns its id, None if there is none"""
+        db = self.connect()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'running', worker = ?, started = COALESCE(started, ?) "
+                       "WHERE id = ?", (worker, now(), row['id']))
+        return row['id']
+
+    def setJob(self, jobId, status):
+        db = self.connect()
+        finished = now() if status in ('done', 'failed', 'cancelled') else None
+        db.execute('UPDATE jobs SET status = ?, finished = ? WHERE id = ?', (status, finished, jobId))
+
+    def setStage(self, jobId, stage, status, **fields):
+        db = self.connect()
+        fields['status'] = status
+        if status == 'running':
+            fields['started'] = now()
+        elif status in ('done', 'failed'):
+            fields['finished'] = now()
+        db.execute('UPDATE stages SET ' + ', '.join(key + ' = ?' for key in fields) + ' WHERE job = ? AND stage = ?',
+                   list(fields.values()) + [jobId, stage])
+
+    def stageStates(self, jobId):
+        """Returns the status of each stage of a job as dict"""
+        return {row['stage']: row['status'] for row in
+                self.connect().execute('SELECT stage, status FROM stages WHERE job = ?', (jobId,))}
+
+    def status(self, jobId):
+        row = self.connect().execute('SELECT status FROM jobs WHERE id = ?', (jobId,)).fetchone()
+        return None if row is None else row['status']
+
+    def cancel(self, jobId):
+        """Cancels a queued job, running jobs stop after their current stage"""
+        self.connect().execute("UPDATE jobs SET status = 'cancelled', finished = ? "
+                               "WHERE id = ? AND status IN ('queued', 'running')", (now(), jobId))
+
+    def retry(self, jobId):
+        """Queues a failed or cancelled job again, finished stages are kept"""
+        db = self.connect()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute("UPDATE jobs SET status = 'queued', worker = NULL, finished = NULL "
+                       "WHERE id = ? AND status IN ('failed', 'cancelled')", (jobId,))
+            db.execute("UPDATE stages SET status = 'queued', detail = NULL "
+                       "WHERE job = ? AND status IN ('failed', 'running')", (jobId,))
+
+    def remove(self, jobId):
+        """Removes a job that is not running from the queue"""
+        self.connect().execute("DELETE FROM jobs WHERE id = ? AND status != 'running'", (jobId,))
+
+    def recover(self):
+        """Queues jobs again whose worker process ended without finishing them"""
+        db = self.connect()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            for row in db.execute("SELECT id, worker FROM jobs WHERE status = 'running'").fetchall():
+                if not processAlive(row['worker']):
+                    db.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE id = ?", (row['id'],))
+                    db.execute("UPDATE stages SET status = 'queued', detail = NULL "
+                               "WHERE job = ? AND status = 'running'", (row['id'],))
+
+
+def openQueue(create=True):
+    """Opens the job database of the installation directory, or of the user if the installation
+    is read-only. Returns None if neither can be opened, or with create=False, if none exists yet."""
+    for path in (os.path.join(SCRIPT_PATH, DATABASE_NAME), USER_DATABASE):
+        if not create and not os.path.isfile(path):
+            continue
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            return jobQueue(path)
+        except (sqlite3.Error, OSError):
+            continue
+    return None
+
+
+def runJob(queue, jobId, scriptPath=SCRIPT_PATH, runner=None):
+    """Runs the stages of a job that are not done yet, returns True if all of them succeeded.
+    runner(buildCommand, ledger, onEvent) defaults to the backend configured for the stage."""
+    runner = runner or (lambda buildCommand, ledger, onEvent:
+                        backends.dispatch(buildCommand, ledger, onEvent, scriptPath=scriptPath))
+    job = queue.job(jobId)
+    states = queue.stageStates(jobId)
+    ledger = pipeline.ledgerPath(job['outDir'])
+
+    for stage in job['stages']:
+        if states.get(stage) == 'done':
+            continue
+        if queue.status(jobId) == 'cancelled':
+            return False
+        queue.setStage(jobId, stage, 'running')
+
+        def onEvent(event, stage=stage):
+            if event['event'] == 'progress':
+                queue.setStage(jobId, stage, 'running', detail='{} ({} of {})'.format(event['step'], event['i'],
+                                                                                   event['n']))
+
+        try:
+            if stage == 'input':
+                samples = pipeline.discoverSamples(job['inputDir'])
+                if not samples:
+                    raise FileNotFoundError('No paired FASTQ files found in ' + job['inputDir'])
+                pipeline.writeInputFile(samples, job['outDir'])
+            runner(lambda threads: stageCommand(stage, scriptPath, job, threads), ledger, onEvent)
+        except sp.CalledProcessError as e:
+            queue.setStage(jobId, stage, 'failed', returncode=e.returncode)
+            return False
+        except (OSError, ValueError, TypeError, RuntimeError) as e:
+            queue.setStage(jobId, stage, 'failed', detail=str(e))
+            return False
+        queue.setStage(jobId, stage, 'done', returncode=0, detail=None)
+    return True
+
+
+class workerPool(object):
+    """Worker threads taking jobs from the queue until stopped"""
+
+    def __init__(self, queue, workers=1, scriptPath=SCRIPT_PATH, poll=5.0):
+        """Constructor for workerPool class"""
+        self.queue = queue
+        self.workers = workers
+        self.scriptPath = scriptPath
+        self.poll = poll
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        self.queue.recover()
+        self.stopping.clear()
+        self.threads = [t for t in self.threads if t.is_alive()]
+        for k in range(len(self.threads), self.workers):
+            thread = threading.Thread(target=self.work, name='jobWorker{}'.format(k + 1), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Workers finish their current job and stop"""
+        self.stopping.set()
+
+    def running(self):
+        return any(t.is_alive() for t in self.threads)
+
+    def work(self):
+        while not self.stopping.is_set():
+            try:
+                jobId = self.queue.claim(workerId())
+            except sqlite3.Error:
+                jobId = None  # database locked for longer than the timeout, tried again later
+            if jobId is None:
+                self.stopping.wait(self.poll)
+                continue
+            # unexpected errors fail the job instead of ending the worker with the job left running
+            try:
+                succeeded = runJob(self.queue, jobId, self.scriptPath)
+                if self.queue.status(jobId) == 'running':
+                    self.queue.setJob(jobId, 'done' if succeeded else 'failed')
+            except Exception as e:
+                self.failJob(jobId, e)
+
+    def failJob(self, jobId, error):
+        """Marks a job failed by an unexpected error, which is kept as detail of its running stage"""
+        detail = '{}: {}'.format(type(error).__name__, error)
+        try:
+            for stage, status in self.queue.stageStates(jobId).items():
+                if status == 'running':
+                    self.queue.setStage(jobId, stage, 'failed', detail=detail)
+            self.queue.setJob(jobId, 'failed')
+        except sqlite3.Error:
+            print('Job {} failed ({}) and could not be marked as failed'.format(jobId, detail), file=sys.stderr)
+
+
+def stageSummary(job):
+    """Short text of the stage states of a job, e.g. 'input done, filtering running'"""
+    return ', '.join('{} {}'.format(s['stage'], s['status']) + (' - ' + s['detail'] if s['detail'] else '')
+                     for s in job['stages'] if s['status'] != 'queued')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--database', default=None, help='job database [installation directory]')
+    commands = parser.add_subparsers(dest='command')
+    addParser = commands.add_parser('add', help='queue a pipeline run')
+    addParser.add_argument('inputDir', help='folder with the paired FASTQ files')
+    addParser.add_argument('outDir', help='output folder')
+    addParser.add_argument('-V', '--version', required=True, help='DADA2 version to use')
+    addParser.add_argument('--stages', default='input,filtering,inference,taxonomy',
+                           help='comma separated stages [%(default)s]')
+    addParser.add_argument('--settings', default=None,
+                           help='JSON file with the settings of each stage, e.g. {"filtering": {"truncRfwd": 250}}')
+    addParser.add_argument('--name', default=None, help='job name [output folder name]')
+    commands.add_parser('list', help='show all jobs')
+    workParser = commands.add_parser('work', help='process queued jobs until interrupted')
+    workParser.add_argument('--workers', type=int, default=1, help='jobs run at the same time [%(default)s]')
+    args = parser.parse_args()
+
+    queue = jobQueue(args.database) if args.database else openQueue()
+    if queue is None:
+        sys.exit('The job database could not be opened in the installation directory or in ' +
+                 os.path.dirname(USER_DATABASE))
+    if args.command == 'add':
+        settings = {}
+        if args.settings:
+            with open(args.settings) as f:
+                settings = json.load(f)
+        print(queue.add(args.inputDir, args.outDir, args.version, settings, args.stages.split(','), args.name))
+    elif args.command == 'list':
+        for job in queue.jobs():
+            print('{:>4} {:<20} {:<10} {}'.format(job['id'], job['name'], job['status'], stageSummary(job)))
+    elif args.command == 'work':
+        pool = workerPool(queue, args.workers)
+        pool.start()
+        try:
+            while pool.running():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            sys.exit(1)
+    else:
+        parser.print_help()
@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+
+"""
+Functions for launching the DADA2 pipeline scripts.
+The command lines built here are shared by the GUI and
+by the benchmark harness, so both run the same code paths.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import threading
+import subprocess as sp
+from collections import namedtuple, deque
+from datetime import datetime
+
+
+LEDGER_NAME = "runLedger.jsonl"
+PROGRESS_TAG = "@@PROGRESS "
+PROFILE_READS = 100000  # reads per file in the random subsets plotted by input.R
+ERROR_BASES = 1e8  # bases in the random subsets learnErrors uses, as its nbases
+
+stageResult = namedtuple('stageResult', ['returncode', 'wallTime', 'cpuTime', 'maxRSS'])
+
+
+class sample(object):
+    """This class is a data class to hold file references to
+    forward and reverse sequence FASTQ files"""
+
+    def __init__(self, name, forward, reverse, currPath):
+        """Constructor for Sample Class"""
+        self.name = str(name)
+        currPath = os.path.normpath(currPath)
+        if (os.path.isfile(os.path.join(currPath, forward)) &
+                os.path.isfile(os.path.join(currPath, reverse))):
+            self.forwardPath = os.path.join(currPath, forward)
+            self.reversePath = os.path.join(currPath, reverse)
+        else:
+            raise FileNotFoundError
+
+    def __repr__(self):
+        return self.name
+
+    def __str__(self):
+        return self.name
+
+    def __eq__(self, other):
+        """Override the default Equals behavior"""
+        if (isinstance(other, self.__class__)):
+            return self.name == other.name
+        elif (isinstance(other, str)):
+            return self.name == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        """Define a non-equality test"""
+        if isinstance(other, self.__class__):
+            return not self.__eq__(other)
+        return NotImplemented
+
+
+def discoverSamples(directory):
+    """Lists paired FASTQ files (pair1 / pair2) in a directory and returns them as samples"""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        files.extend(filenames)
+        break
+    # index sidecars of fastqIndex.py are not samples
+    files = [x for x in files if not x.endswith('.fqi')]
+    samplesF = sorted(list(filter(lambda x: 'pair1' in x, files)))
+    samplesR = sorted(list(filter(lambda x: 'pair2' in x, files)))
+    sampleNames = [i.split('_')[0] for i in samplesF]
+    sampleNames = sorted(list(set(sampleNames)))
+
+    return [sample(name, fw, rv, directory) for name, fw, rv in zip(sampleNames, samplesF, samplesR)]
+
+
+def writeInputFile(samples, outDir):
+    """Writes the input file for input.R and returns its path"""
+    if not os.path.isdir(outDir):
+        os.mkdir(outDir)
+    inputFilePath = os.path.join(outDir, "inputPaths.txt")
+    with open(inputFilePath, 'w') as inputFile:
+        for s in samples:
+            print(s.forwardPath, file=inputFile)
+            print(s.reversePath, file=inputFile)
+
+    return inputFilePath
+
+
+def validateCommand(scriptPath, inputFile, outDir, threads="0"):
+    """Command line for validation.py, checking the FASTQ pairs of an input file of input.R"""
+    return [sys.executable, scriptPath + "/validation.py",
+            "-i", inputFile,
+            "-o", outDir,
+            "-t", str(threads)
+            ]
+
+
+def inputCommand(scriptPath, version, inputFile, outDir, plots, subsets=""):
+    """Command line for input.R (quality profiles), subsets is a folder of random
+    subsamples (subsampleCommand) plotted instead of the complete FASTQs"""
+    commandLine = ["Rscript", scriptPath + "/input.R",
+                   "-i", inputFile,
+                   "-o", outDir,
+                   "-p", str(plots),
+                   "-V", version,
+                   "--path", scriptPath
+                   ]
+
+    if not subsets == "": commandLine.append("--subsets"), commandLine.append(subsets)
+
+    return commandLine
+
+
+def plottedSamples(samples, plots):
+    """Samples input.R plots quality profiles of, spread evenly over the samples
+    sorted by their forward reads as in input.R"""
+    samples = sorted(samples, key=lambda x: x.forwardPath)
+    n, m = len(samples), min(len(samples), int(plots))
+    if m <= 1:
+        return samples[:m]
+    return [samples[math.ceil(1 + k * ((n - 1) / (m - 1))) - 1] for k in range(m)]
+
+
+def fastqFiles(directory):
+    """Sorted paths of the FASTQ files in a folder"""
+    return sorted(os.path.join(directory, x) for x in os.listdir(directory)
+                  if re.search(r'\.(fastq|fq)(\.gz)?$', x))
+
+
+def subsampleCommand(scriptPath, files, outDir, reads="", bases="", threads="0"):
+    """Command line for fastqIndex.py, writing random subsamples of reads or bases per file
+    into outDir. Files are indexed once, later subsamples only read the drawn reads."""
+    commandLine = [sys.executable, scriptPath + "/fastqIndex.py", "subsample",
+                   "-o", outDir,
+                   "-t", str(threads)]
+
+    if not reads == "": commandLine.append("-n"), commandLine.append(str(reads))
+    if not bases == "": commandLine.append("--bases"), commandLine.append(str(int(bases)))
+
+    return commandLine + list(files)
+
+
+def trimCommand(scriptPath, forward, outDir, primerF, reverse="", primerR="", errorRate="0.1",
+                discardUntrimmed=False, readThrough=False, threads="0"):
+    """Command line for trimming.py, writing primer trimmed FASTQs into outDir/trimmed
+    and their paths into trimmedFilesF.txt / trimmedFilesR.txt for filterCommand"""
+    commandLine = [sys.executable, scriptPath + "/trimming.py",
+                   "-f", forward,
+                   "-o", outDir,
+                   "--primerF", primerF,
+                   "-e", str(errorRate),
+                   "-t", str(threads)]
+
+    if not reverse == "": commandLine.append("-r"), commandLine.append(reverse)
+    if not primerR == "": commandLine.append("--primerR"), commandLine.append(primerR)
+    if discardUntrimmed: commandLine.append("--discardUntrimmed")
+    if readThrough: commandLine.append("--readThrough")
+
+    return commandLine
+
+
+def filterCommand(scriptPath, version, forward, outDir, truncRfwd, truncRrev="", reverse="",
+                  truncLfwd="0", truncLrev="0", minLenF="", minLenR="", maxLenF="", maxLenR="",
+                  maxError="", quality="2", compress=True, verbose=True, derep=False, keepFiltered=False,
+                  threads="0"):
+    """Command line for filtering.R, empty strings leave optional settings unset"""
+    commandLine = ["Rscript", scriptPath + "/filtering.R",
+                   "-f", forward,
+                   "-t", str(threads),
+                   "--truncLfwd", str(truncLfwd),
+                   "--truncLrev", str(truncLrev),
+                   "-x", str(truncRfwd),
+                   "-y", str(truncRrev),
+                   "-o", outDir,
+                   "-q", str(quality),
+                   "-V", version,
+                   "--path", scriptPath]
+
+    if not reverse == "": commandLine.append('-r'), commandLine.append(reverse)
+    if not maxError == "": commandLine.append("-e"), commandLine.append(str(maxError))
+    if not minLenF == "": commandLine.append("--minLenF"), commandLine.append(str(minLenF))
+    if not minLenR == "": commandLine.append("--minLenR"), commandLine.append(str(minLenR))
+    if not maxLenF == "": commandLine.append("--maxLenF"), commandLine.append(str(maxLenF))
+    if not maxLenR == "": commandLine.append("--maxLenR"), commandLine.append(str(maxLenR))
+    if not compress: commandLine.append("-c")
+    if not verbose: commandLine.append("-v")
+    if derep: commandLine.append("--derep")
+    if derep and keepFiltered: commandLine.append("--keepFiltered")
+
+    return commandLine
+
+
+def denoiseCommand(scriptPath, version, filtered, outDir, plots="5", pool="0",
+                   seqtab=False, chimera=False, concat=False, sparse=False, derep="", errorSubsets="",
+                   threads="0"):
+    """Command line for inference.R (denoising), derep is a folder of samples
+    dereplicated by filtering.R and replaces the filtered FASTQs, errorSubsets is
+    a folder of random subsamples (subsampleCommand) the error rates are learned from"""
+    commandLine = ["Rscript", scriptPath + "/inference.R",
+                   "-f", filtered,
+                   "-t", str(threads),
+                   "-p", str(plots),
+                   "-o", outDir,
+                   "-V", version,
+                   "--pool", str(pool),
+                   "--path", scriptPath
+                   ]
+
+    if seqtab: commandLine.append("--seqtab")
+    if chimera: commandLine.append("--chimera")
+    if concat: commandLine.append("--concat")
+    if sparse: commandLine.append("--sparse")
+    if not derep == "": commandLine.append("--derep"), commandLine.append(derep)
+    if not errorSubsets == "": commandLine.append("--errorSubsets"), commandLine.append(errorSubsets)
+
+    return commandLine
+
+
+def compareCommand(scriptPath, versions, filtered, outDir, pool="0", derep="", threads="0"):
+    """Command line for compareVersions.py, denoising the filtered FASTQs with each of
+    the DADA2 versions into outDir/dada2_<version>, the first version is the reference"""
+    commandLine = [sys.executable, scriptPath + "/compareVersions.py",
+                   "-f", filtered,
+                   "-o", outDir,
+                   "-V", ",".join(versions),
+                   "--pool", str(pool),
+                   "-t", str(threads)]
+
+    if not derep == "": commandLine.append("--derep"), commandLine.append(derep)
+
+    return commandLine
+
+
+def derepCommand(scriptPath, filtered, outDir, threads="0"):
+    """Command line for derep.py, dereplicating filtered FASTQs into outDir/derep"""
+    return [sys.executable, scriptPath + "/derep.py",
+            "-i", filtered,
+            "-o", os.path.join(outDir, "derep"),
+            "-t", str(threads)
+            ]
+
+
+def isDerepFolder(path):
+    """Checks if a folder holds samples dereplicated by filtering.R (--derep) or derep.py"""
+    return os.path.isdir(path) and any(x.endswith(('_derep.rds', '_derep.bin')) for x in os.listdir(path))
+
+
+def chimeraCommand(scriptPath, version, inputFile, outDir, threads="0", minSampleFraction="0.9",
+                   minFoldParentOverAbundance="1.5", restart=False):
+    """Command line for chimera.R"""
+    commandLine = ["Rscript", scriptPath + "/chimera.R",
+                   "-i", inputFile,
+                   "-o", outDir,
+                   "-t", str(threads),
+                   "--minSampleFraction", str(minSampleFraction),
+                   "--minFoldParentOverAbundance", str(minFoldParentOverAbundance),
+                   "-V", version,
+                   "--path", scriptPath
+                   ]
+
+    if restart: commandLine.append("--restart")
+
+    return commandLine
+
+
+def mergeCommand(scriptPath, version, inputFile, outDir, repeats="error", chimera=False, sparse=False,
+                 threads="0"):
+    """Command line for mergeTables.R, merging the sequence tables listed in inputFile"""
+    commandLine = ["Rscript", scriptPath + "/mergeTables.R",
+                   "-i", inputFile,
+                   "-o", outDir,
+                   "-t", str(threads),
+                   "--repeats", repeats,
+                   "-V", version,
+                   "--path", scriptPath
+                   ]
+
+    if chimera: commandLine.append("--chimera")
+    if sparse: commandLine.append("--sparse")
+
+    return commandLine
+
+
+def writeTableList(tables, outDir):
+    """Writes the input file for mergeTables.R and returns its path"""
+    os.makedirs(outDir, exist_ok=True)
+    tableListPath = os.path.join(outDir, "mergeInputs.txt")
+    with open(tableListPath, 'w') as tableList:
+        for table in tables:
+            print(table, file=tableList)
+
+    return tableListPath
+
+
+def taxonomyCommand(scriptPath, version, inputFile, outDir, database="silva", phyloseq=True, threads="0"):
+    """Command line for taxonomy.R"""
+    commandLine = ["Rscript", scriptPath + "/taxonomy.R",
+                   "-i", inputFile,
+                   "-o", outDir,
+                   "-d", database,
+                   "-t", str(threads),
+                   "-V", version,
+                   "--path", scriptPath
+                   ]
+
+    if not phyloseq: commandLine.append("--noPS")
+
+    return commandLine
+
+
+def treeCommand(scriptPath, inputFile, outDir, method="auto", refine=False, threads="0"):
+    """Command line for phylotree.R, writing the tree next to the phyloseq object in outDir"""
+    commandLine = ["Rscript", scriptPath + "/phylotree.R",
+                   "-i", inputFile,
+                   "-o", outDir,
+                   "-m", method,
+                   "-t", str(threads),
+                   "--path", scriptPath
+                   ]
+
+    if refine: commandLine.append("--refine")
+
+    return commandLine
+
+
+def ledgerPath(outDir):
+    """Path of the run ledger in an output directory"""
+    return os.path.join(outDir, LEDGER_NAME)
+
+
+def appendLedger(ledger, event, **fields):
+    """Appends an event as JSON line to the run ledger"""
+    entry = {'time': datetime.now().isoformat(timespec='milliseconds'), 'source': 'launcher', 'event': event}
+    entry.update(fields)
+    os.makedirs(os.path.dirname(ledger) or '.', exist_ok=True)
+    with open(ledger, 'a') as f:
+        f.write(json.dumps(entry) + '\n')
+
+
+def stageName(commandLine):
+    """Name of the stage started by a command line, e.g. 'inference' for inference.R"""
+    return os.path.splitext(os.path.basename(commandLine[1]))[0] if len(commandLine) > 1 else commandLine[0]
+
+
+def parseProgress(line):
+    """Returns the progress event of an output line of an R script, or None for other lines"""
+    if not line.startswith(PROGRESS_TAG):
+        return None
+    try:
+        event = json.loads(line[len(PROGRESS_TAG):])
+    except ValueError:
+        return None
+    event['event'] = 'progress'
+    event['received'] = time.monotonic()
+    return event
+
+
+def runCommand(commandLine, ledger=None, onEvent=None):
+    """Runs a stage and returns its stageResult. Wall time is measured around the child,
+    CPU time (user + system) and peak resident memory (kB) are taken from its resource usage
+    where the platform reports them. If a ledger path is given, start and end of the stage
+    are appended to it. If onEvent is given, it is called with a dict for every progress event
+    ({'event': 'progress', ...}) and every other line ({'event': 'log', 'line': ...}) the
+    stage writes to stderr; the log lines are passed on to stderr as well."""
+    stage = stageName(commandLine)
+    started = datetime.now().isoformat(timespec='milliseconds')
+    start = time.perf_counter()
+    process = sp.Popen(commandLine, stderr=sp.PIPE if onEvent else None)
+    if ledger:
+        appendLedger(ledger, 'start', stage=stage, pid=process.pid, command=commandLine)
+    if onEvent:
+        for raw in process.stderr:
+            line = raw.decode(errors='replace').rstrip('\r\n')
+            event = parseProgress(line)
+            if event is None:
+                print(line, file=sys.stderr)
+                event = {'event': 'log', 'line': line}
+            onEvent(event)
+        process.stderr.close()
+    if hasattr(os, 'wait4'):
+        pid, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        cpuTime, maxRSS = usage.ru_utime + usage.ru_stime, usage.ru_maxrss
+        if sys.platform == 'darwin':
+            maxRSS //= 1024
+    else:
+        process.wait()
+        cpuTime, maxRSS = None, None
+
+    result = stageResult(process.returncode, time.perf_counter() - start, cpuTime, maxRSS)
+    if ledger:
+        appendLedger(ledger, 'end', stage=stage, pid=process.pid, start=started,
+                     returncode=result.returncode, wallTime=round(result.wallTime, 3),
+                     cpuTime=None if cpuTime is None else round(cpuTime, 3), maxRSS=maxRSS)
+    return result
+
+
+def checkCall(commandLine, ledger=None, onEvent=None):
+    """Runs a stage like subprocess.check_call and returns its stageResult"""
+    result = runCommand(commandLine, ledger, onEvent)
+    if result.returncode != 0:
+        raise sp.CalledProcessError(result.returncode, commandLine)
+    return result
+
+
+class coreBudget(object):
+    """Shares the cores of the machine between concurrently running stages.
+    Stages are served first come, first served and wait while all cores are in use.
+    The budget only covers the stages of one process: the GUI and a worker started
+    with 'jobQueue.py work' each use all cores, so on a shared server DADA2_CORES
+    should split the cores between them."""
+
+    def __init__(self, cores=None):
+        """Constructor for coreBudget class, cores defaults to all cores of the machine"""
+        self.cores = cores or os.cpu_count() or 1
+        self.free = self.cores
+        self.waiting = deque()
+        self.condition = threading.Condition()
+
+    def acquire(self, requested=0, minimum=1):
+        """Blocks until at least minimum cores are free and returns the number of cores granted,
+        at most requested (0 requests all cores)"""
+        wanted = min(requested, self.cores) if requested > 0 else self.cores
+        minimum = max(1, min(minimum, wanted))
+        ticket = object()
+        with self.condition:
+            self.waiting.append(ticket)
+            while self.waiting[0] is not ticket or self.free < minimum:
+                self.condition.wait()
+            self.waiting.popleft()
+            granted = min(wanted, self.free)
+            self.free -= granted
+            self.condition.notify_all()
+        return granted
+
+    def release(self, granted):
+        """Returns cores granted by acquire"""
+        with self.condition:
+            self.free += granted
+            self.condition.notify_all()
+
+
+# budget shared by all stages started from this process (not across processes),
+# DADA2_CORES limits it
+CORES = coreBudget(int(os.environ.get('DADA2_CORES', 0) or 0) or None)
+
+
+def scheduledCall(buildCommand, ledger=None, onEvent=None, requested=0, budget=None):
+    """Waits for cores of the budget, then runs the command line buildCommand(threads)
+    returns for the granted number of threads like checkCall"""
+    budget = budget or CORES
+    queued = time.perf_counter()
+    if onEvent and budget.free == 0:
+        onEvent({'event': 'log', 'line': 'Waiting for free cores ...'})
+    threads = budget.acquire(requested)
+    try:
+        commandLine = buildCommand(threads=threads)
+        if ledger:
+            appendLedger(ledger, 'scheduled', stage=stageName(commandLine), threads=threads,
+                         cores=budget.cores, waited=round(time.perf_counter() - queued, 3))
+        return checkCall(commandLine, ledger, onEvent)
+    finally:
+        budget.release(threads)
+
+
+def readLedger(ledger):
+    """Returns all events of a run ledger as list of dicts, unreadable lines are skipped"""
+    events = []
+    if not os.path.isfile(ledger):
+        return events
+    with open(ledger) as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+class progressTracker(object):
+    """Turns the progress events of a stage into fraction done, throughput and ETA of each step"""
+
+    def __init__(self):
+        """Constructor for progressTracker class"""
+        self.steps = {}
+        self.lastEvent = time.monotonic()
+
+    def update(self, event, now=None):
+        """Takes a progress event and returns the status of its step as dict"""
+        if now is None:
+            now = event.get('received', time.monotonic())
+        step = self.steps.setdefault(event['step'], {'start': self.lastEvent, 'reads': 0})
+        self.lastEvent = now
+
+        i, n = event.get('i') or 0, event.get('n') or 0
+        step['reads'] += event.get('reads') or 0
+        elapsed = now - step['start']
+
+        return {
+            'stage': event.get('stage'),
+            'step': event['step'],
+            'i': i,
+            'n': n,
+            'fraction': i / n if n else 0.0,
+            'elapsed': elapsed,
+            'readsPerSec': step['reads'] / elapsed if elapsed > 0 and step['reads'] else None,
+            'eta': elapsed / i * (n - i) if i > 0 else None,
+        }
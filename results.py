@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+
+"""
+Reader for the outputs of the DADA2 pipeline scripts.
+The R scripts write plain text copies of their results next to
+the .RData files (see seqTables.R). This module reads those copies
+without starting R. Tables are loaded lazily on first access;
+NumPy, SciPy and pandas are only imported if a conversion asks for them.
+"""
+
+import os
+import csv
+import mmap
+import struct
+from array import array
+
+
+MAGIC = b'DADASPM1'
+HEADER = struct.Struct('<8sQQQ')
+
+
+def readTable(path):
+    """Reads a table written by R's write.table with row names.
+    Returns the column names and a dict of row name -> list of values"""
+    with open(path, 'r', newline='') as f:
+        reader = csv.reader(f, delimiter='\t')
+        header = next(reader)
+        rows = {}
+        for line in reader:
+            if line:
+                rows[line[0]] = line[1:]
+    # write.table omits the header field of the row names column
+    if rows and len(header) > len(next(iter(rows.values()))):
+        header = header[1:]
+    return header, rows
+
+
+def readFasta(path):
+    """Reads a FASTA file into a list of (name, sequence) tuples"""
+    records = []
+    name, seq = None, []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.rstrip()
+            if line.startswith('>'):
+                if name is not None:
+                    records.append((name, ''.join(seq)))
+                name, seq = line[1:], []
+            elif line:
+                seq.append(line)
+    if name is not None:
+        records.append((name, ''.join(seq)))
+    return records
+
+
+def readCount(value):
+    """Read count of a report field, None for steps missing in a sample (NA or empty)"""
+    return None if value in ('NA', '') else int(float(value))
+
+
+class seqTable(object):
+    """Lazy reader for a sparse sequence table (samples x ASVs) written by
+    writeSparseTable() in seqTables.R.
+
+    On first access the Matrix Market file is converted into a binary cache
+    (<prefix>_counts.bin) holding the table in ASV-major order. The cache is
+    memory-mapped, so later reads cost no parsing and only touched pages
+    are loaded into memory."""
+
+    def __init__(self, outDir, prefix="seqTabClean"):
+        """Constructor for seqTable class"""
+        self.outDir = os.path.normpath(outDir)
+        self.prefix = prefix
+        self.mtxPath = self.path('_counts.mtx')
+        self.cachePath = self.path('_counts.bin')
+        if not os.path.isfile(self.mtxPath):
+            raise FileNotFoundError(self.mtxPath)
+
+        self._samples = None
+        self._asvs = None
+        self._mmap = None
+        self._shape = None
+        self._arrays = None
+
+    def path(self, suffix):
+        return os.path.join(self.outDir, self.prefix + suffix)
+
+    @property
+    def samples(self):
+        """sample names in row order"""
+        if self._samples is None:
+            with open(self.path('_samples.txt'), 'r') as f:
+                self._samples = [line.rstrip('\n') for line in f if line.strip()]
+        return self._samples
+
+    @property
+    def asvIds(self):
+        """ASV IDs in column order"""
+        return [name for name, seq in self.asvs]
+
+    @property
+    def sequences(self):
+        """ASV sequences in column order"""
+        return [seq for name, seq in self.asvs]
+
+    @property
+    def asvs(self):
+        if self._asvs is None:
+            self._asvs = readFasta(self.path('_ASVs.fasta'))
+        return self._asvs
+
+    @property
+    def shape(self):
+        self.load()
+        return self._shape
+
+    @property
+    def nnz(self):
+        return len(self.load()[2])
+
+    def load(self):
+        """Memory-maps the binary cache, building it first if it is missing or stale.
+        Returns (indptr, rows, counts) with the entries of ASV j in indptr[j]:indptr[j + 1]"""
+        if self._arrays is None:
+            if (not os.path.isfile(self.cachePath) or
+                    os.path.getmtime(self.cachePath) < os.path.getmtime(self.mtxPath)):
+                self.buildCache()
+            with open(self.cachePath, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, nrow, ncol, nnz = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError("Unknown sequence table cache format: " + self.cachePath)
+            view = memoryview(self._mmap)
+            start = HEADER.size
+            indptr = view[start:start + 8 * (ncol + 1)].cast('Q')
+            start += 8 * (ncol + 1)
+            rows = view[start:start + 4 * nnz].cast('I')
+            start += 4 * nnz
+            counts = view[start:start + 4 * nnz].cast('I')
+            self._shape = (nrow, ncol)
+            self._arrays = (indptr, rows, counts)
+        return self._arrays
+
+    def close(self):
+        """Releases the memory map. While views of the arrays returned by load() are still
+        in use (e.g. numpy arrays made from them), the map is left to be closed once they are freed"""
+        if self._arrays is not None:
+            arrays, self._arrays = self._arrays, None
+            cache, self._mmap = self._mmap, None
+            try:
+                for a in arrays:
+                    a.release()
+                cache.close()
+            except BufferError:
+                pass
+
+    def buildCache(self):
+        """Converts the Matrix Market file into the binary ASV-major cache"""
+        with open(self.mtxPath, 'r') as f:
+            line = f.readline()
+            if not line.startswith('%%MatrixMarket matrix coordinate'):
+                raise ValueError("Not a sparse Matrix Market file: " + self.mtxPath)
+            for line in f:
+                if not line.startswith('%'):
+                    break
+            nrow, ncol, nnz = (int(x) for x in line.split())
+
+            rows = array('I', bytes(4 * nnz))
+            cols = array('I', bytes(4 * nnz))
+            counts = array('I', bytes(4 * nnz))
+            colSizes = array('Q', bytes(8 * (ncol + 1)))
+            n = 0
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+                col = int(fields[1]) - 1
+                rows[n] = int(fields[0]) - 1
+                cols[n] = col
+                counts[n] = int(float(fields[2]))
+                colSizes[col + 1] += 1
+                n += 1
+            if n != nnz:
+                raise ValueError("Truncated Matrix Market file: " + self.mtxPath)
+
+        # counting sort of entries by ASV
+        indptr = array('Q', colSizes)
+        for j in range(ncol):
+            indptr[j + 1] += indptr[j]
+        pos = array('Q', indptr[:-1])
+        sortedRows = array('I', bytes(4 * nnz))
+        sortedCounts = array('I', bytes(4 * nnz))
+        for k in range(nnz):
+            col = cols[k]
+            sortedRows[pos[col]] = rows[k]
+            sortedCounts[pos[col]] = counts[k]
+            pos[col] += 1
+
+        tmpPath = self.cachePath + '.tmp'
+        with open(tmpPath, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, nrow, ncol, nnz))
+            indptr.tofile(f)
+            sortedRows.tofile(f)
+            sortedCounts.tofile(f)
+        os.replace(tmpPath, self.cachePath)
+
+    def asvCounts(self, j):
+        """Returns a dict of sample index -> count for ASV j"""
+        indptr, rows, counts = self.load()
+        start, end = indptr[j], indptr[j + 1]
+        return dict(zip(rows[start:end], counts[start:end]))
+
+    def asvTotals(self):
+        """Returns total read counts per ASV"""
+        indptr, rows, counts = self.load()
+        return [sum(counts[indptr[j]:indptr[j + 1]]) for j in range(self.shape[1])]
+
+    def asvPrevalence(self):
+        """Returns the number of samples each ASV occurs in"""
+        indptr = self.load()[0]
+        return [indptr[j + 1] - indptr[j] for j in range(self.shape[1])]
+
+    def sampleTotals(self):
+        """Returns total read counts per sample"""
+        indptr, rows, counts = self.load()
+        totals = [0] * self.shape[0]
+        for i, c in zip(rows, counts):
+            totals[i] += c
+        return totals
+
+    def toSparse(self):
+        """Returns the table as scipy.sparse.csc_matrix (samples x ASVs). All arrays are copied
+        (the unsigned index arrays into scipy's signed index type), so the matrix stays valid after close()"""
+        import numpy as np
+        from scipy import sparse
+
+        indptr, rows, counts = self.load()
+        return sparse.csc_matrix((np.array(np.frombuffer(counts, dtype=np.uint32)),
+                                  np.frombuffer(rows, dtype=np.uint32),
+                                  np.frombuffer(indptr, dtype=np.uint64)),
+                                 shape=self.shape)
+
+    def toDataFrame(self):
+        """Returns the table as sparse pandas.DataFrame with samples as rows and ASV IDs as columns"""
+        import pandas as pd
+
+        return pd.DataFrame.sparse.from_spmatrix(self.toSparse(), index=self.samples,
+                                                 columns=self.asvIds)
+
+
+class projectResults(object):
+    """Gives access to all pipeline outputs found in an output directory"""
+
+    def __init__(self, outDir):
+        """Constructor for projectResults class"""
+        self.outDir = os.path.normpath(outDir)
+        self._seqTable = None
+
+    def path(self, name):
+        return os.path.join(self.outDir, name)
+
+    @property
+    def seqTable(self):
+        """the chimera-free sequence table"""
+        if self._seqTable is None:
+            self._seqTable = seqTable(self.outDir, "seqTabClean")
+        return self._seqTable
+
+    def hasSeqTable(self):
+        return os.path.isfile(self.path('seqTabClean_counts.mtx'))
+
+    def readReport(self):
+        """Returns the read report as (columns, {sample: [counts]}), counts of steps
+        missing in a sample (reports of merged runs) are None"""
+        header, rows = readTable(self.path('readReport.txt'))
+        return header, {k: [readCount(x) for x in v] for k, v in rows.items()}
+
+    def filterReport(self):
+        """Returns the filter report as (columns, {file: [counts]})"""
+        header, rows = readTable(self.path('filterReport.txt'))
+        return header, {k: [readCount(x) for x in v] for k, v in rows.items()}
+
+    def taxonomy(self):
+        """Returns the taxonomy table as (ranks, {ASV ID: [assignments]})"""
+        with open(self.path('seqTabClean_taxonomy.tsv'), 'r', newline='') as f:
+            reader = csv.reader(f, delimiter='\t')
+            header = next(reader)
+            taxa = {line[0]: line[1:] for line in reader if line}
+        return header[1:], taxa
+
+    def errorRates(self, direction="F"):
+        """Returns the error rates of forward ("F") or reverse ("R") reads
+        as (quality scores, {transition: [rates]})"""
+        header, rows = readTable(self.path('errorRates_' + direction + '.tsv'))
+        return header, {k: [float(x) if x != 'NA' else None for x in v] for k, v in rows.items()}
+
+    def readReportFrame(self):
+        """Returns the read report as pandas.DataFrame"""
+        import pandas as pd
+
+        return pd.read_csv(self.path('readReport.txt'), sep='\t')
+
+    def taxonomyFrame(self):
+        """Returns the taxonomy table as pandas.DataFrame indexed by ASV ID"""
+        import pandas as pd
+
+        return pd.read_csv(self.path('seqTabClean_taxonomy.tsv'), sep='\t', index_col=0,
+                           keep_default_na=False, na_values=[''])
+
+    def summary(self):
+        """Returns a short dict summary of the results available in the output directory"""
+        info = {}
+        if self.hasSeqTable():
+            table = self.seqTable
+            info['samples'], info['ASVs'] = table.shape
+            info['non-zero entries'] = table.nnz
+            info['reads'] = sum(table.asvTotals())
+        if os.path.isfile(self.path('readReport.txt')):
+            header, report = self.readReport()
+            if 'non-chimeras' in header and 'merged' in header:
+                # samples missing one of the steps are left out
+                pairs = [(v[header.index('merged')], v[header.index('non-chimeras')]) for v in report.values()]
+                pairs = [(m, n) for m, n in pairs if m is not None and n is not None]
+                merged = sum(m for m, n in pairs)
+                nochim = sum(n for m, n in pairs)
+                if merged > 0:
+                    info['fraction non-chimeric'] = round(nochim / merged, 4)
+        return info
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+"""
+Primer trimming of (paired) FASTQ files, run before filtering.R.
+The forward primer is searched at the start of the forward reads and the
+reverse primer at the start of the reverse reads (anchored), IUPAC codes
+are allowed and a fraction of the primer positions may mismatch. Reads are
+handled in pairs, so both files stay in sync, and pairs without primer can
+be discarded. With --readThrough, reads running into the opposite primer
+(amplicons shorter than the reads) are cut before its reverse complement.
+Samples are trimmed in parallel processes. Trimmed files keep their names
+and are written into <output>/trimmed, trimmedFilesF.txt / trimmedFilesR.txt
+list them for filtering.R and trimSummary.tsv counts the reads of each sample
+(by its forward file, as samples may share a name prefix).
+
+Usage:
+    python3 trimming.py -f <selectedFilesF.txt> [-r <selectedFilesR.txt>] -o <output folder>
+                        --primerF <primer> [--primerR <primer>] [-e 0.1] [--discardUntrimmed]
+                        [--readThrough] [-t threads]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import multiprocessing
+
+import fastq
+import pipeline
+
+
+IUPAC = {'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T', 'U': 'T', 'R': 'AG', 'Y': 'CT', 'S': 'CG', 'W': 'AT',
+         'K': 'GT', 'M': 'AC', 'B': 'CGT', 'D': 'AGT', 'H': 'ACT', 'V': 'ACG', 'N': 'ACGT'}
+COMPLEMENT = str.maketrans('ACGTURYSWKMBDHVN', 'TGCAAYRSWMKVHDBN')
+SUMMARY_NAME = 'trimSummary.tsv'
+
+
+def reverseComplement(primer):
+    return primer.upper().translate(COMPLEMENT)[::-1]
+
+
+def primerPattern(primer):
+    """Regular expression (bytes) matching a primer with IUPAC codes exactly"""
+    try:
+        return b''.join(b'[' + IUPAC[x].encode() + b']' for x in primer.upper())
+    except KeyError as e:
+        raise ValueError('Invalid base {} in primer {}'.format(e, primer))
+
+
+class primerMatcher(object):
+    """Anchored search of a primer at the start of reads, allowing mismatches"""
+
+    def __init__(self, primer, errorRate=0.1):
+        """Constructor for primerMatcher class, up to errorRate * primer length positions may mismatch"""
+        self.length = len(primer)
+        self.exact = re.compile(primerPattern(primer), re.IGNORECASE)
+        self.allowed = [frozenset(IUPAC[x].encode() + IUPAC[x].lower().encode()) for x in primer.upper()]
+        self.maxMismatches = int(errorRate * self.length)
+
+    def match(self, sequence):
+        """Checks if a read (bytes) starts with the primer"""
+        if self.exact.match(sequence):
+            return True
+        if self.maxMismatches == 0 or len(sequence) < self.length:
+            return False
+        # only reads without exact primer are compared position by position
+        mismatches = 0
+        for base, allowed in zip(sequence, self.allowed):
+            if base not in allowed:
+                mismatches += 1
+                if mismatches > self.maxMismatches:
+                    return False
+        return True
+
+
+def trimRecord(record, matcher, readThrough=None):
+    """Returns the record without primer (None if it has none) and cut before readThrough"""
+    if not matcher.match(record.sequence):
+        return None
+    end = len(record.sequence)
+    if readThrough is not None:
+        hit = readThrough.search(record.sequence, matcher.length)
+        if hit:
+            end = hit.start()
+    return fastq.fastqRecord(record.header, record.sequence[matcher.length:end], record.quality[matcher.length:end])
+
+
+def trimSample(task):
+    """Trims the primers of one sample, returns the name of its forward file and read counts"""
+    forward, reverse, outDir, settings = task
+    matcherF = primerMatcher(settings['primerF'], settings['errorRate'])
+    matcherR = primerMatcher(settings['primerR'], settings['errorRate']) if reverse else None
+    readThroughF = readThroughR = None
+    if settings['readThrough'] and reverse:
+        readThroughF = re.compile(primerPattern(reverseComplement(settings['primerR'])), re.IGNORECASE)
+        readThroughR = re.compile(primerPattern(reverseComplement(settings['primerF'])), re.IGNORECASE)
+
+    counts = {'reads': 0, 'primerF': 0, 'primerR': 0, 'written': 0}
+    outF = fastq.openFastq(os.path.join(outDir, os.path.basename(forward)), 'wb')
+    outR = fastq.openFastq(os.path.join(outDir, os.path.basename(reverse)), 'wb') if reverse else None
+    recordsR = fastq.readFastq(reverse) if reverse else None
+    try:
+        for recF in fastq.readFastq(forward):
+            recR = next(recordsR) if reverse else None
+            counts['reads'] += 1
+            trimmedF = trimRecord(recF, matcherF, readThroughF)
+            trimmedR = trimRecord(recR, matcherR, readThroughR) if reverse else None
+            counts['primerF'] += trimmedF is not None
+            counts['primerR'] += trimmedR is not None
+            if settings['discardUntrimmed'] and (trimmedF is None or (reverse and trimmedR is None)):
+                continue
+            trimmedF = trimmedF or recF
+            trimmedR = trimmedR or recR
+            # reads trimmed to nothing would be written as invalid records
+            if not trimmedF.sequence or (reverse and not trimmedR.sequence):
+                continue
+            fastq.writeRecord(outF, trimmedF)
+            if reverse:
+                fastq.writeRecord(outR, trimmedR)
+            counts['written'] += 1
+        # the pairs are out of sync like in a reverse file with more reads
+        if reverse and next(recordsR, None) is not None:
+            raise ValueError('More reverse than forward reads in ' + reverse)
+    except StopIteration:
+        raise ValueError('Fewer reverse than forward reads in ' + reverse)
+    finally:
+        outF.close()
+        if outR:
+            outR.close()
+    return os.path.basename(forward), counts
+
+
+def readSummary(outDir):
+    """Totals of the read counts in the trim summary of an output folder"""
+    totals = {}
+    with open(os.path.join(outDir, SUMMARY_NAME)) as f:
+        header = f.readline().rstrip('\n').split('\t')[1:]
+        for line in f:
+            for key, value in zip(header, line.rstrip('\n').split('\t')[1:]):
+                totals[key] = totals.get(key, 0) + int(value)
+    return totals
+
+
+def readList(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def trimFiles(forwardList, outDir, primerF, reverseList="", primerR="", errorRate=0.1, discardUntrimmed=False,
+              readThrough=False, threads=0):
+    """Trims the samples of the path lists in parallel processes and reports progress"""
+    forward = readList(forwardList)
+    reverse = readList(reverseList) if reverseList else [None] * len(forward)
+    if len(reverse) != len(forward):
+        raise ValueError('Different number of samples for forward and reverse reads')
+    if reverseList and not primerR:
+        raise ValueError('Reverse reads need a reverse primer')
+    trimDir = os.path.abspath(os.path.join(outDir, 'trimmed'))
+    os.makedirs(trimDir, exist_ok=True)
+
+    settings = {'primerF': primerF, 'primerR': primerR, 'errorRate': errorRate,
+                'discardUntrimmed': discardUntrimmed, 'readThrough': readThrough}
+    tasks = [(f, r, trimDir, settings) for f, r in zip(forward, reverse)]
+    processes = max(1, min(threads or os.cpu_count() or 1, len(tasks)))
+
+    def progress(i, reads):
+        print(pipeline.PROGRESS_TAG + json.dumps({'stage': 'trimming', 'step': 'trim', 'i': i, 'n': len(tasks),
+                                                  'reads': reads}), file=sys.stderr, flush=True)
+
+    progress(0, 0)
+    summary = {}
+    with multiprocessing.Pool(processes) as pool:
+        for i, (name, counts) in enumerate(pool.imap_unordered(trimSample, tasks)):
+            summary[name] = counts
+            progress(i + 1, counts['reads'])
+
+    for paths, name in ((forward, 'trimmedFilesF.txt'), (reverse if reverseList else [], 'trimmedFilesR.txt')):
+        if paths:
+            with open(os.path.join(outDir, name), 'w') as f:
+                for path in paths:
+                    print(os.path.join(trimDir, os.path.basename(path)), file=f)
+    with open(os.path.join(outDir, SUMMARY_NAME), 'w') as f:
+        print('file\treads\tprimerF\tprimerR\twritten', file=f)
+        for name in sorted(summary):
+            counts = summary[name]
+            print('\t'.join(str(x) for x in [name, counts['reads'], counts['primerF'], counts['primerR'],
+                                             counts['written']]), file=f)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-f', '--forward', required=True, help='file with paths to forward FASTQs')
+    parser.add_argument('-r', '--reverse', default='', help='file with paths to reverse FASTQs')
+    parser.add_argument('-o', '--output', required=True, help='output folder')
+    parser.add_argument('--primerF', required=True, help='forward primer, IUPAC codes allowed')
+    parser.add_argument('--primerR', default='', help='reverse primer, IUPAC codes allowed')
+    parser.add_argument('-e', '--errorRate', type=float, default=0.1,
+                        help='fraction of primer positions allowed to mismatch [%(default)s]')
+    parser.add_argument('--discardUntrimmed', action='store_true', help='discard pairs without primers')
+    parser.add_argument('--readThrough', action='store_true',
+                        help='cut reads before the reverse complement of the opposite primer')
+    parser.add_argument('-t', '--threads', type=int, default=0, help='parallel processes, 0 uses all cores')
+    args = parser.parse_args()
+    try:
+        trimFiles(args.forward, args.output, args.primerF, args.reverse, args.primerR, args.errorRate,
+                  args.discardUntrimmed, args.readThrough, args.threads)
+    except ValueError as e:
+        sys.exit(str(e))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+"""
+Pre-flight check of paired FASTQ files, run before input.R.
+Both files of each sample are streamed side by side: every record has to
+be complete (header starting with @, separator starting with +, as many
+quality scores as bases), gzip files have to be intact, both files have to
+hold the same number of reads and the read IDs (header up to the first
+space, without /1 or /2) have to match pair by pair. Samples are checked
+in parallel processes, the result of each sample is written into
+validation.tsv of the output folder. The exit code is 2 if a sample failed.
+
+Usage:
+    python3 validation.py -i <inputPaths.txt> -o <output folder> [-t threads]
+"""
+
+import os
+import sys
+import json
+import zlib
+import argparse
+import multiprocessing
+from itertools import zip_longest
+
+import fastq
+import pipeline
+
+
+REPORT_NAME = 'validation.tsv'
+FAILED = 2
+
+
+class fastqError(Exception):
+    """Malformed record or damaged file"""
+
+    def __init__(self, record, problem):
+        super().__init__('record {}: {}'.format(record, problem))
+
+
+def readId(header):
+    """Read ID of a header (bytes), e.g. @M02975:25:000000000-A1B2C:1:1101:12140:1712 1:N:0:1
+    -> M02975:25:000000000-A1B2C:1:1101:12140:1712"""
+    fields = header[1:].split(None, 1)
+    readName = fields[0] if fields else b''
+    return readName[:-2] if readName.endswith((b'/1', b'/2')) else readName
+
+
+def checkedIds(path):
+    """Yields the read IDs of a FASTQ file, raises fastqError at the first malformed record"""
+    record = 0
+    try:
+        with fastq.openFastq(path) as f:
+            while True:
+                header = f.readline()
+                if not header:
+                    return
+                record += 1
+                sequence, plus, quality = f.readline(), f.readline(), f.readline()
+                if not header.startswith(b'@'):
+                    raise fastqError(record, 'header does not start with @')
+                if not quality:
+                    raise fastqError(record, 'incomplete record at the end of the file')
+                if not plus.startswith(b'+'):
+                    raise fastqError(record, 'separator line does not start with +')
+                if len(sequence.rstrip(b'\r\n')) != len(quality.rstrip(b'\r\n')):
+                    raise fastqError(record, 'sequence and quality scores differ in length')
+                yield readId(header.rstrip(b'\r\n'))
+    except (EOFError, OSError, zlib.error) as e:
+        raise fastqError(record + 1, 'file damaged or truncated ({})'.format(e))
+
+
+def validatePair(task):
+    """Checks the files of one sample, returns its name, number of reads and problems"""
+    name, forward, reverse = task
+    problems = []
+
+    def guarded(ids, label):
+        try:
+            yield from ids
+        except fastqError as e:
+            problems.append('{} reads, {}'.format(label, e))
+
+    reads = readsF = readsR = mismatches = 0
+    firstMismatch = None
+    for idF, idR in zip_longest(guarded(checkedIds(forward), 'forward'), guarded(checkedIds(reverse), 'reverse')):
+        readsF += idF is not None
+        readsR += idR is not None
+        if idF is None or idR is None:
+            continue
+        reads += 1
+        if idF != idR:
+            mismatches += 1
+            if firstMismatch is None:
+                firstMismatch = (reads, idF.decode(errors='replace'), idR.decode(errors='replace'))
+
+    # counts of damaged files are meaningless, their problem is reported instead
+    if not problems and readsF != readsR:
+        problems.append('{} forward but {} reverse reads'.format(readsF, readsR))
+    if mismatches:
+        problems.append('{} read IDs differ, first at read {}: {} / {}'.format(mismatches, *firstMismatch))
+    return name, max(readsF, readsR), problems
+
+
+def readPairs(inputFile):
+    """Samples of an input file of input.R as (name, forward, reverse), paired like in input.R"""
+    with open(inputFile) as f:
+        fastqs = sorted(line.strip() for line in f if 'pair' in line)
+    forward = [x for x in fastqs if 'pair1' in x]
+    reverse = [x for x in fastqs if 'pair2' in x]
+    if len(forward) != len(reverse):
+        raise ValueError('Different number of forward and reverse files')
+    return [(os.path.basename(f).split('_')[0], f, r) for f, r in zip(forward, reverse)]
+
+
+def readReport(outDir):
+    """Results of the last check as dict sample: (reads, list of problems)"""
+    report = {}
+    with open(os.path.join(outDir, REPORT_NAME)) as f:
+        f.readline()
+        for line in f:
+            name, reads, status, problems = line.rstrip('\n').split('\t')
+            report[name] = (int(reads), problems.split('; ') if problems else [])
+    return report
+
+
+def validateFiles(inputFile, outDir, threads=0):
+    """Checks the samples of an input file in parallel processes, reports progress and
+    writes the results, returns the number of failed samples"""
+    tasks = readPairs(inputFile)
+    processes = max(1, min(threads or os.cpu_count() or 1, len(tasks)))
+
+    def progress(i, reads):
+        print(pipeline.PROGRESS_TAG + json.dumps({'stage': 'validation', 'step': 'validate', 'i': i,
+                                                  'n': len(tasks), 'reads': reads}), file=sys.stderr, flush=True)
+
+    progress(0, 0)
+    results = {}
+    with multiprocessing.Pool(processes) as pool:
+        for i, (name, reads, problems) in enumerate(pool.imap_unordered(validatePair, tasks)):
+            results[name] = (reads, problems)
+            progress(i + 1, reads)
+            for problem in problems:
+                print('{}: {}'.format(name, problem))
+
+    os.makedirs(outDir, exist_ok=True)
+    with open(os.path.join(outDir, REPORT_NAME), 'w') as f:
+        print('sample\treads\tstatus\tproblems', file=f)
+        for name in sorted(results):
+            reads, problems = results[name]
+            print('\t'.join([name, str(reads), 'failed' if problems else 'ok', '; '.join(problems)]), file=f)
+    return sum(1 for reads, problems in results.values() if problems)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-i', '--input', required=True, help='input file with paths to FASTQs')
+    parser.add_argument('-o', '--output', required=True, help='output folder')
+    parser.add_argument('-t', '--threads', type=int, default=0, help='parallel processes, 0 uses all cores')
+    args = parser.parse_args()
+    try:
+        failed = validateFiles(args.input, args.output, args.threads)
+    except ValueError as e:
+        sys.exit(str(e))
+    if failed:
+        print('{} sample(s) failed the check'.format(failed))
+        sys.exit(FAILED)